@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the original address regexes vs the linear-time address engine.
+
+The patterns address_from_user used before are kept below verbatim as the
+baseline. The script first checks on random texts built from address-like
+pieces that the engine returns exactly what the old patterns returned, then
+times both on adversarial bios and captions of growing length: the old
+patterns grow quadratically or cubically, the engine linearly.
+
+Usage:
+    python benchmarks/bench_address_engine.py [--sizes 275,550,1100,2200] [--fuzz N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from instagram_place_parser.address_engine import bio_address, caption_address
+
+
+LEGACY_BIO_PATTERNS = [
+    r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}',
+    r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',
+    r'[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}',
+    r'[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',
+    r'[A-Za-z\s°]+,\s*[A-Za-z\s]+',
+]
+
+LEGACY_CAPTION_PATTERNS = [
+    r'📍\s*bar\s+[A-Za-z\s°]+[^\n]*\n[A-Za-z\s,]+,\s*[A-Za-z\s]+',
+    r'bar\s+[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',
+    r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',
+]
+
+def legacy_bio_address(bio):
+    for pattern in LEGACY_BIO_PATTERNS:
+        matches = re.findall(pattern, bio)
+        if matches:
+            return max(matches, key=len)
+    return None
+
+def legacy_caption_address(text):
+    for pattern in LEGACY_CAPTION_PATTERNS:
+        matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
+        if matches:
+            return matches[0]
+    return None
+
+# Pieces of random texts: keywords, separators and characters on the class boundaries
+PIECES = ['📍', 'bar', ' bar', 'bar,', ' ', '  ', '\n', '\t', 'a', 'Zx', ',', ', ', '°', '1', '12345', '.', '-', 'r', 'ba']
+
+def random_text(rng):
+    return ''.join(rng.choice(PIECES) for _ in range(rng.randrange(1, 30)))
+
+# Adversarial inputs: long runs the old patterns rescan from every start position
+ADVERSARIAL = [
+    ('bio: spaces then " bar,"', 'bio', lambda n: ' ' * n + 'bar,'),
+    ('bio: "a " run then comma', 'bio', lambda n: 'a ' * (n // 2) + ','),
+    ('bio: "x bar," repeated', 'bio', lambda n: 'x bar,' * (n // 6)),
+    ('caption: "bar" + spaces + comma', 'caption', lambda n: 'bar' + ' ' * n + ','),
+    ('caption: 📍 bar + n newlines', 'caption', lambda n: '📍 bar ' + 'a\n' * (n // 2) + ','),
+    ('caption: pins on one line', 'caption', lambda n: '📍 bar a' * (n // 16) + '\n' + 'a' * (n // 2) + ','),
+]
+
+def timed(function, text):
+    start = time.perf_counter()
+    function(text)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='275,550,1100,2200', help='Text lengths (default: 275,550,1100,2200)')
+    parser.add_argument('--fuzz', type=int, default=100000, help='Random texts compared for equality (default: 100000)')
+    parser.add_argument('--legacy-budget', type=float, default=2.0,
+                        help='Stop timing the old patterns on a case once one run exceeds this many seconds (default: 2)')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    rng = random.Random(0)
+    for _ in range(args.fuzz):
+        text = random_text(rng)
+        if legacy_bio_address(text) != bio_address(text) or legacy_caption_address(text) != caption_address(text):
+            print(f"❌ Mismatch for {text!r}: bio {legacy_bio_address(text)!r} != {bio_address(text)!r}, "
+                  f"caption {legacy_caption_address(text)!r} != {caption_address(text)!r}")
+            sys.exit(1)
+    print(f"✅ {args.fuzz} random texts matched identically")
+
+    engines = {
+        'bio': (legacy_bio_address, bio_address),
+        'caption': (legacy_caption_address, caption_address),
+    }
+    for label, kind, make_text in ADVERSARIAL:
+        legacy, engine = engines[kind]
+        print(f"\n{label}")
+        over_budget = False
+        for size in sizes:
+            text = make_text(size)
+            new = min(timed(engine, text) for _ in range(5))
+            if over_budget:
+                old_text = '   (skipped)'
+            else:
+                old = timed(legacy, text)
+                over_budget = old > args.legacy_budget
+                old_text = f"{old * 1000:10.2f} ms"
+            print(f"  n={len(text):5d}  old {old_text}   engine {new * 1000:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
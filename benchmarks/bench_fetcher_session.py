@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bare requests.get vs the pooled InstagramFetcher session.
+
+Starts a local stand-in for the web_profile_info endpoint (optionally over TLS
+with a throwaway self-signed certificate) and measures per-profile latency of
+the old one-connection-per-request path against the keep-alive session.
+
+Usage:
+    python benchmarks/bench_fetcher_session.py [--requests N] [--tls]
+"""
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from instagram_place_parser.place_fetcher import DEFAULT_HEADERS, InstagramFetcher
+
+TOKENS = {'csrftoken': 'bench', 'sessionid': 'bench', 'mid': 'bench'}
+
+PROFILE_BODY = json.dumps({
+    "data": {
+        "user": {
+            "username": "boyar.rs",
+            "full_name": "Boyar",
+            "biography": "Pelmeni restaurant in Belgrade",
+            "external_url": "https://pelmeni-belgrade.ru/",
+            "bio_links": [{"url": "https://t.me/PELMENI_RS_BOT", "title": "Telegram Bot"}],
+            "business_address_json": None
+        }
+    },
+    "status": "ok"
+}).encode('utf-8')
+
+
+class ProfileHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler that serves a fixed profile payload."""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(PROFILE_BODY)))
+        self.end_headers()
+        self.wfile.write(PROFILE_BODY)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """Create a throwaway self-signed certificate with the openssl CLI."""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_server(tls_files=None):
+    """Start the stand-in server on a free local port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ProfileHandler)
+    scheme = 'http'
+    if tls_files:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls_files)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def time_calls(call, count):
+    """Return per-call latencies in milliseconds."""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    """Print mean/p50/p95 for a latency series."""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<28} mean {statistics.mean(ordered):7.3f} ms   "
+          f"p50 {statistics.median(ordered):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='Requests per variant (default: 300)')
+    parser.add_argument('--tls', action='store_true', help='Serve over TLS with a self-signed certificate')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tls_files = make_certificate(tmp) if args.tls else None
+        server, base_url = start_server(tls_files)
+        verify = tls_files[0] if tls_files else True
+        
+        def bare_get(i):
+            # The old fetch path: a fresh connection for every profile
+            headers = dict(DEFAULT_HEADERS, **{'x-csrftoken': TOKENS['csrftoken']})
+            response = requests.get(f"{base_url}/api/v1/users/web_profile_info/?username=user{i}",
+                                    headers=headers, cookies=TOKENS, verify=verify)
+            response.json()
+        
+        fetcher = InstagramFetcher(base_url=base_url, **TOKENS)
+        fetcher.session.verify = verify
+        fetcher.session.trust_env = False  # keep REQUESTS_CA_BUNDLE from overriding verify
+        
+        def pooled_get(i):
+            data = fetcher.fetch_profile(f"user{i}")
+            assert 'error' not in data, data
+        
+        # Warm up both paths (imports, first connection)
+        bare_get(0)
+        pooled_get(0)
+        
+        print(f"Stand-in server: {base_url} ({args.requests} sequential requests per variant)")
+        report("requests.get (before)", time_calls(bare_get, args.requests))
+        report("InstagramFetcher (after)", time_calls(pooled_get, args.requests))
+        
+        fetcher.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the four per-field link extractors vs the single-pass classifier.
+
+The previous extract_wolt_url / extract_google_maps / extract_website_url /
+extract_telegram_link each re-checked the response and rescanned (and
+re-lowercased) external_url and every bio link. They are kept below verbatim
+as the baseline. The script first checks on randomized profiles that
+classify_links gives identical results, then times both on a typical and a
+sparse profile, alternating between them so machine load hits both alike.
+Since links are classified by host with url_rules.json, mixed-case hosts
+(https://WOLT.com/...), which the old substring checks dropped, now match too,
+and a Google Maps external_url is no longer ignored; the random profiles
+stick to the cases where both agree. Finally it times one link against rule
+tables of growing size.
+
+Usage:
+    python benchmarks/bench_link_classifier.py [--runs N] [--fuzz N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from instagram_place_parser.place_data_parser import classify_links, get_user, parse_profile_data
+from instagram_place_parser.url_rules import DEFAULT_RULES_FILE, UrlRules
+
+
+def legacy_wolt_url(profile_data):
+    if 'error' in profile_data:
+        return None
+    if 'data' not in profile_data or 'user' not in profile_data['data']:
+        return None
+    user = profile_data['data']['user']
+    if user.get('external_url') and 'wolt.com' in user['external_url']:
+        return user['external_url']
+    if 'bio_links' in user:
+        for link in user['bio_links']:
+            url = link.get('url', '')
+            if 'wolt.com' in url:
+                return url
+    return None
+
+def legacy_google_maps(profile_data):
+    if 'error' in profile_data:
+        return None
+    if 'data' not in profile_data or 'user' not in profile_data['data']:
+        return None
+    user = profile_data['data']['user']
+    if 'bio_links' in user:
+        for link in user['bio_links']:
+            url = link.get('url', '')
+            if 'maps.app.goo.gl' in url or 'google.com/maps' in url:
+                return url
+    return None
+
+def legacy_website_url(profile_data):
+    if 'error' in profile_data:
+        return None
+    if 'data' not in profile_data or 'user' not in profile_data['data']:
+        return None
+    user = profile_data['data']['user']
+    external_url = user.get('external_url')
+    if external_url and external_url.strip():
+        if not any(domain in external_url.lower() for domain in ['maps.app.goo.gl', 'google.com/maps', 'wolt.com', 't.me/']):
+            return external_url
+    if 'bio_links' in user:
+        for link in user['bio_links']:
+            url = link.get('url', '')
+            if url and url.strip():
+                if not any(domain in url.lower() for domain in ['maps.app.goo.gl', 'google.com/maps', 'wolt.com', 't.me/']):
+                    return url
+    return None
+
+def legacy_telegram_link(profile_data):
+    if 'error' in profile_data:
+        return None
+    if 'data' not in profile_data or 'user' not in profile_data['data']:
+        return None
+    user = profile_data['data']['user']
+    external_url = user.get('external_url')
+    if external_url and external_url.strip():
+        if 't.me/' in external_url.lower():
+            return external_url
+    if 'bio_links' in user:
+        for link in user['bio_links']:
+            url = link.get('url', '')
+            if url and 't.me/' in url.lower():
+                return url
+    return None
+
+def legacy_links(profile_data):
+    return {
+        'wolt_url': legacy_wolt_url(profile_data),
+        'google_maps': legacy_google_maps(profile_data),
+        'website_url': legacy_website_url(profile_data),
+        'telegram_link': legacy_telegram_link(profile_data),
+    }
+
+def new_links(profile_data):
+    user = get_user(profile_data)
+    links = classify_links(user)
+    return {field: links[field] for field in ('wolt_url', 'google_maps', 'website_url', 'telegram_link')}
+
+# URLs of every legacy bucket, blank ones and mixed-case paths
+URL_PARTS = [
+    'https://wolt.com/en/srb/belgrade/venue/boyar', 'https://wolt.com/X', 'https://maps.app.goo.gl/6MAJ',
+    'https://www.google.com/maps/place/x', 'https://t.me/PELMENI_RS_BOT', 'https://pelmeni-belgrade.ru/',
+    'https://linktr.ee/boyar', '   ', '',
+]
+
+def random_profile(rng):
+    """A profile with a random external_url and bio links."""
+    user = {'bio_links': [{'url': rng.choice(URL_PARTS), 'title': 'link'} for _ in range(rng.randrange(6))]}
+    if rng.random() < 0.8:
+        user['external_url'] = rng.choice([url for url in URL_PARTS if 'maps' not in url] + [None])
+    return {'data': {'user': user}}
+
+def typical_profile():
+    """A profile with a website, a Telegram bot, Wolt and Google Maps links."""
+    return {'data': {'user': {
+        'username': 'boyar.rs',
+        'full_name': 'Boyar',
+        'biography': 'Pelmeni restaurant in Belgrade',
+        'external_url': 'https://linktr.ee/boyar',
+        'bio_links': [
+            {'url': 'https://linktr.ee/boyar', 'title': 'All links'},
+            {'url': 'https://t.me/PELMENI_RS_BOT', 'title': 'Telegram Bot'},
+            {'url': 'https://wolt.com/en/srb/belgrade/venue/boyar', 'title': 'Delivery'},
+            {'url': 'https://maps.app.goo.gl/6MAJpmSEH3R9qPPTA', 'title': 'Location'},
+        ],
+        'business_address_json': None,
+    }}}
+
+
+def sparse_profile():
+    """A profile with only a website and a Telegram link, so no bucket search stops early."""
+    return {'data': {'user': {
+        'username': 'ruske_palacinke',
+        'full_name': 'Ruske palačinke',
+        'external_url': 'https://ruskepalacinke.rs/',
+        'bio_links': [
+            {'url': 'https://ruskepalacinke.rs/', 'title': 'Site'},
+            {'url': 'https://t.me/ruskepalacinke', 'title': 'Telegram'},
+        ],
+    }}}
+
+
+def substring_classifier(rules):
+    """The old style extended to a rule table: one substring test per pattern until one matches."""
+    domains = [(pattern, field) for field, patterns in rules for pattern in patterns]
+    def classify(url):
+        lowered = url.lower()
+        for domain, field in domains:
+            if domain in lowered:
+                return field
+        return 'website_url'
+    return classify
+
+def grown_rules(size):
+    """The rules of url_rules.json padded with synthetic categories up to `size` rules."""
+    with open(DEFAULT_RULES_FILE, 'r', encoding='utf-8') as f:
+        rules = [(rule['field'], rule['match']) for rule in json.load(f)['rules']]
+    return rules + [(f"category_{i}_url", [f"site{i}.example.com"]) for i in range(size - len(rules))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=200000, help='Classifications per variant (default: 200000)')
+    parser.add_argument('--fuzz', type=int, default=20000, help='Random profiles compared for equality (default: 20000)')
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    for _ in range(args.fuzz):
+        profile = random_profile(rng)
+        if legacy_links(profile) != new_links(profile):
+            print(f"❌ Mismatch for {profile}: {legacy_links(profile)} != {new_links(profile)}")
+            sys.exit(1)
+    print(f"✅ {args.fuzz} random profiles classified identically")
+    
+    # The single pass is timed as parse_profile_data calls it: its dict of every
+    # field goes straight into the result, with no four-field copy
+    for label, profile in (('all four links', typical_profile()), ('website + telegram', sparse_profile())):
+        legacy = single = float('inf')
+        for _ in range(5):
+            legacy = min(legacy, timeit.timeit(lambda: legacy_links(profile), number=args.runs // 5) / (args.runs // 5))
+            single = min(single, timeit.timeit(lambda: classify_links(get_user(profile)), number=args.runs // 5) / (args.runs // 5))
+        print(f"{label:20s} four extractors {legacy * 1e6:5.2f} µs, "
+              f"single pass {single * 1e6:5.2f} µs (speedup {legacy / single:.1f}x)")
+    
+    # A website link is the worst case: substring tests must try every rule before falling back
+    url = 'https://pelmeni-belgrade.ru/menu'
+    for size in (6, 50, 200):
+        rules = grown_rules(size)
+        table, scan = UrlRules(rules, 'website_url'), substring_classifier(rules)
+        indexed = min(timeit.repeat(lambda: table.classify(url), number=args.runs, repeat=3)) / args.runs
+        scanned = min(timeit.repeat(lambda: scan(url), number=args.runs, repeat=3)) / args.runs
+        print(f"{size:3d} rules: substring scan {scanned * 1e6:5.2f} µs per link, host lookup {indexed * 1e6:5.2f} µs per link")
+    
+    profile = typical_profile()
+    full = min(timeit.repeat(lambda: parse_profile_data(profile), number=args.runs // 4, repeat=3)) / (args.runs // 4)
+    print(f"Full parse_profile_data: {full * 1e6:.2f} µs per profile")
+
+
+if __name__ == '__main__':
+    main()
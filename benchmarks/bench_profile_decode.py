@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full json decode vs the field-pruning decoder.
+
+Decodes a web_profile_info payload with json.loads (the old response.json()
+path) and with decode_profile_bytes (json.loads followed by
+prune_profile_data), then reports decode time, peak memory and the size of
+the result, which is what the response cache stores.
+Without --payload a synthetic business profile with the size and shape of a
+real response (12 posts with media metadata, 12 reels, 80 related profiles)
+is used; pass a saved response to measure a real one.
+
+Usage:
+    python benchmarks/bench_profile_decode.py [--payload saved_response.json] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from instagram_place_parser.place_data_parser import parse_profile_data
+from instagram_place_parser.profile_decoder import decode_profile_bytes
+
+
+def media_urls(rng, sizes):
+    """Fake CDN URLs with the length of real ones."""
+    return [{
+        'src': f"https://scontent.cdninstagram.com/v/t51.29350-15/{rng.getrandbits(64)}_n.jpg?stp=dst-jpg_e35_p{size}x{size}"
+               f"&_nc_ht=scontent.cdninstagram.com&_nc_cat=1&_nc_ohc={rng.getrandbits(96):x}&edm=AOQ1c0wBAAAA"
+               f"&ccb=7-5&oh=00_{rng.getrandbits(160):x}&oe=6717{rng.randrange(10000):04d}",
+        'config_width': size,
+        'config_height': size,
+    } for size in sizes]
+
+def make_post(rng, index, owner):
+    """One timeline post node."""
+    return {'node': {
+        '__typename': 'GraphImage',
+        'id': str(rng.getrandbits(62)),
+        'shortcode': f"C{rng.getrandbits(48):x}",
+        'dimensions': {'height': 1350, 'width': 1080},
+        'display_url': media_urls(rng, [1080])[0]['src'],
+        'display_resources': media_urls(rng, [640, 750, 1080]),
+        'thumbnail_src': media_urls(rng, [640])[0]['src'],
+        'thumbnail_resources': media_urls(rng, [150, 240, 320, 480, 640]),
+        'edge_media_to_tagged_user': {'edges': []},
+        'fact_check_overall_rating': None,
+        'fact_check_information': None,
+        'gating_info': None,
+        'sharing_friction_info': {'should_have_sharing_friction': False, 'bloks_app_url': None},
+        'media_overlay_info': None,
+        'media_preview': f"ACoq{rng.getrandbits(1600):x}",
+        'owner': owner,
+        'is_video': False,
+        'has_upcoming_event': False,
+        'accessibility_caption': f"Photo by {owner['username']} on {index + 1} October. May be an image of food.",
+        'edge_media_to_caption': {'edges': [{'node': {
+            'text': (f"Dinner special #{index} 🍽️\n"
+                     "📍 bar Zeleni Venac 12\nBelgrade, Serbia\n"
+                     "Reservations via link in bio. " * 3)
+        }}]},
+        'edge_media_to_comment': {'count': rng.randrange(200)},
+        'comments_disabled': False,
+        'taken_at_timestamp': 1700000000 + index * 86400,
+        'edge_liked_by': {'count': rng.randrange(5000)},
+        'edge_media_preview_like': {'count': rng.randrange(5000)},
+        'location': {'id': str(rng.getrandbits(50)), 'has_public_page': True, 'name': 'Belgrade, Serbia',
+                     'slug': 'belgrade-serbia'},
+        'nft_asset_info': None,
+        'coauthor_producers': [],
+        'pinned_for_users': [],
+        'viewer_can_reshare': True,
+        'product_type': 'feed',
+        'clips_music_attribution_info': None,
+    }}
+
+def make_profile(rng):
+    """A business profile with the shape and size of a real web_profile_info response."""
+    owner = {'id': '1234567890', 'username': 'boyar.rs'}
+    related = [{'node': {
+        'id': str(rng.getrandbits(50)),
+        'full_name': f"Related place {i}",
+        'is_private': False,
+        'is_verified': False,
+        'profile_pic_url': media_urls(rng, [150])[0]['src'],
+        'username': f"related_place_{i}",
+    }} for i in range(80)]
+    
+    user = {
+        'ai_agent_type': None,
+        'biography': "Pelmeni restaurant in Belgrade\nKralja Petra 12, Beograd",
+        'bio_links': [
+            {'title': 'Menu', 'lynx_url': 'https://l.instagram.com/?u=https%3A%2F%2Fpelmeni-belgrade.ru%2F',
+             'url': 'https://pelmeni-belgrade.ru/', 'link_type': 'external'},
+            {'title': 'Telegram Bot', 'lynx_url': 'https://l.instagram.com/?u=https%3A%2F%2Ft.me%2FPELMENI_RS_BOT',
+             'url': 'https://t.me/PELMENI_RS_BOT', 'link_type': 'external'},
+        ],
+        'biography_with_entities': {'raw_text': "Pelmeni restaurant in Belgrade", 'entities': []},
+        'blocked_by_viewer': False,
+        'business_address_json': json.dumps({'city_name': 'Belgrade', 'street_address': 'Kralja Petra 12',
+                                             'zip_code': '11000', 'latitude': 44.8176, 'longitude': 20.4569}),
+        'business_category_name': 'Restaurants',
+        'business_contact_method': 'UNKNOWN',
+        'business_email': None,
+        'business_phone_number': None,
+        'category_name': 'Restaurant',
+        'edge_followed_by': {'count': 15321},
+        'edge_follow': {'count': 120},
+        'external_url': 'https://pelmeni-belgrade.ru/',
+        'fbid': str(rng.getrandbits(60)),
+        'full_name': 'Boyar',
+        'has_clips': True,
+        'highlight_reel_count': 9,
+        'id': owner['id'],
+        'is_business_account': True,
+        'is_private': False,
+        'is_verified': False,
+        'profile_pic_url': media_urls(rng, [150])[0]['src'],
+        'profile_pic_url_hd': media_urls(rng, [320])[0]['src'],
+        'username': owner['username'],
+        'edge_felix_video_timeline': {'count': 12, 'page_info': {'has_next_page': True, 'end_cursor': 'x' * 120},
+                                      'edges': [make_post(rng, i, owner) for i in range(12)]},
+        'edge_owner_to_timeline_media': {'count': 412, 'page_info': {'has_next_page': True, 'end_cursor': 'y' * 120},
+                                         'edges': [make_post(rng, i, owner) for i in range(12)]},
+        'edge_saved_media': {'count': 0, 'edges': []},
+        'edge_media_collections': {'count': 0, 'edges': []},
+        'edge_related_profiles': {'edges': related},
+    }
+    return {'data': {'user': user}, 'status': 'ok'}
+
+def measure(decode, body, runs):
+    """
+    Time a decoder and measure its peak memory.
+    Returns: tuple - (median seconds, peak bytes, result)
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = decode(body)
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    result = decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payload', help='Saved web_profile_info response (default: synthetic real-sized profile)')
+    parser.add_argument('--runs', type=int, default=200, help='Decodes per variant (default: 200)')
+    args = parser.parse_args()
+    
+    if args.payload:
+        with open(args.payload, 'rb') as f:
+            body = f.read()
+    else:
+        body = json.dumps(make_profile(random.Random(42)), ensure_ascii=False).encode('utf-8')
+    
+    print(f"Payload: {len(body) / 1024:.0f} KB")
+    
+    variants = [
+        ('json.loads (old)', lambda b: json.loads(b)),
+        ('json.loads + prune', decode_profile_bytes),
+    ]
+    expected = parse_profile_data(json.loads(body))
+    for label, decode in variants:
+        median, peak, result = measure(decode, body, args.runs)
+        kept = len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        same = parse_profile_data(result) == expected
+        print(f"{label:20s} {median * 1000:7.2f} ms  peak {peak / 1024:7.0f} KB  "
+              f"result {kept / 1024:6.1f} KB  parser output {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CLI startup time and its import budget.
+
+Runs `python -X importtime` over the modules a make_place invocation imports
+before doing any work and checks them against a budget: the cumulative import
+time must stay under --budget milliseconds and none of the heavy modules
+(requests, sqlite3, asyncio, ...) may be loaded. Also reports the wall-clock
+time of `make_place.py --help`. Exits with status 1 if the budget is exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--budget MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+MAKE_PLACE_SCRIPT = os.path.join(SRC_DIR, 'make_place', 'make_place.py')
+
+# Modules whose import time is budgeted
+BUDGETED_MODULES = ['make_place.make_place', 'instagram_place_parser.place_data_parser']
+
+# Modules that only the code paths needing them may import
+HEAVY_MODULES = ['requests', 'urllib3', 'sqlite3', 'asyncio', 'aiohttp', 'http.server']
+
+# Default budget for the cumulative import time of make_place.make_place, in milliseconds
+DEFAULT_BUDGET_MS = 80
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+    
+    Returns:
+        tuple: (cumulative import time of the module in ms, {module: self time in ms}, loaded modules)
+    """
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, check=True)
+    cumulative = 0.0
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(own) / 1000
+        if name.strip() == module:
+            cumulative = int(total) / 1000
+    return cumulative, self_times, set(result.stdout.split())
+
+
+def wall_time(args, runs):
+    """Get the median wall-clock time of a command in ms."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, capture_output=True, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=15, help='Runs per measurement; medians are reported (default: 15)')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f'Import budget of make_place.make_place in ms (default: {DEFAULT_BUDGET_MS})')
+    args = parser.parse_args()
+    
+    failures = []
+    for module in BUDGETED_MODULES:
+        samples = [import_times(module) for _ in range(args.runs)]
+        cumulative = statistics.median(sample[0] for sample in samples)
+        _, self_times, loaded = samples[-1]
+        heavy = [name for name in HEAVY_MODULES if name in loaded]
+        
+        print(f"import {module}: {cumulative:.1f} ms cumulative (median of {args.runs})")
+        slowest = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:8]
+        print("  slowest: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in slowest))
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if module == 'make_place.make_place' and cumulative > args.budget:
+            failures.append(f"{module} takes {cumulative:.1f} ms to import (budget {args.budget:.0f} ms)")
+    
+    baseline = wall_time([sys.executable, '-c', 'pass'], args.runs)
+    help_time = wall_time([sys.executable, MAKE_PLACE_SCRIPT, '--help'], args.runs)
+    print(f"python -c pass: {baseline:.1f} ms; make_place.py --help: {help_time:.1f} ms "
+          f"(+{help_time - baseline:.1f} ms)")
+    
+    if failures:
+        print("Startup budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("Startup budget met")
+
+
+if __name__ == '__main__':
+    main()
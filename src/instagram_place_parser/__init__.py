@@ -0,0 +1,3 @@
+"""
+Instagram profile fetching and parsing into place data.
+"""
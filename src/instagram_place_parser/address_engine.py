@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Linear-time address matching for bios and post captions.
+
+The address patterns used to be plain regexes such as [A-Za-z\\s°]+\\s+bar,
+whose overlapping character classes backtrack polynomially (a bio of 2200
+spaces took seconds). This module keeps their exact results but:
+
+- compiles every pattern once at import time;
+- skips texts that cannot match with cheap substring checks (',', 'bar,', '📍');
+- rewrites each run of a character class as an atomic run anchored on what
+  must follow it, so a failed attempt cannot backtrack (a lookahead capturing
+  the run plus a backreference, the portable spelling of a possessive ++);
+- adds a second alternative that consumes a whole run after a failed attempt,
+  so the scan never restarts inside a run that is already known to fail;
+- replaces the '📍 bar ...' caption pattern, whose search for the end of the
+  first line cannot be made possessive, with a scanner that reads each run once.
+
+Every matcher is linear in the length of the text.
+"""
+
+import itertools
+import re
+
+# Character classes of the original patterns
+_A = r'[A-Za-z\s°]'   # place name: letters, whitespace, degree sign
+_B = r'[A-Za-z\s]'    # city / country: letters and whitespace
+
+# Unique group names of the atomic runs
+_run_names = itertools.count()
+
+def _atomic_run(char_class):
+    """
+    Match the longest run (one or more) of a character class without ever backtracking into it.
+    Returns: str - Regex fragment equivalent to char_class++ on Python 3.11+
+    """
+    name = f'run{next(_run_names)}'
+    # Lookaheads are atomic: the run is fixed once the lookahead succeeds
+    return rf'(?=(?P<{name}>{char_class}+))(?P={name})'
+
+def _run_pattern(address):
+    """
+    Compile an address pattern with a fallback alternative that consumes the rest of a failed run.
+    Only matches of the 'address' group are addresses.
+    """
+    return re.compile(rf'(?P<address>{address})|{_atomic_run(_A)}')
+
+# Bio patterns in order of preference; the longest match of the first matching pattern wins.
+# Equivalent to (in order):
+#   [A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}
+#   [A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+
+#   [A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}
+#   [A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+
+#   [A-Za-z\s°]+,\s*[A-Za-z\s]+
+_BAR_NAME = rf'{_atomic_run(_A)}(?<={_A}\sbar)'
+BIO_PATTERNS = [
+    # (pattern, needs 'bar,', needs a digit)
+    (_run_pattern(rf'{_BAR_NAME},{_atomic_run(_B)},{_atomic_run(_B)}\d{{5}}'), True, True),
+    (_run_pattern(rf'{_BAR_NAME},{_atomic_run(_B)},{_atomic_run(_B)}'), True, False),
+    (_run_pattern(rf'{_atomic_run(_A)},{_atomic_run(_B)},{_atomic_run(_B)}\d{{5}}'), False, True),
+    (_run_pattern(rf'{_atomic_run(_A)},{_atomic_run(_B)},{_atomic_run(_B)}'), False, False),
+    (_run_pattern(rf'{_atomic_run(_A)},{_atomic_run(_B)}'), False, False),
+]
+
+# Caption patterns after the '📍 bar' one; the first match of the first matching pattern wins.
+# Equivalent to:
+#   bar\s+[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+
+#   [A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+
+CAPTION_BAR_PREFIX = re.compile(
+    rf'(?P<address>bar\s{_atomic_run(_A)},{_atomic_run(_B)},{_atomic_run(_B)})|bar\s{_atomic_run(_A)}'
+)
+CAPTION_BAR_SUFFIX = BIO_PATTERNS[1][0]
+
+# Pieces of the '📍 bar' scanner; nothing follows their runs, so they never backtrack
+_PIN = '📍'
+_PIN_PREFIX = re.compile(r'📍\s*bar\s')
+_A_RUN = re.compile(rf'{_A}*')
+_B_RUN = re.compile(rf'{_B}*')
+_C_RUN = re.compile(r'[A-Za-z\s,]*')
+_DIGIT = re.compile(r'\d')
+
+def _addresses(pattern, text):
+    """Yield the address matches of a compiled pattern."""
+    for match in pattern.finditer(text):
+        address = match.group('address')
+        if address is not None:
+            yield address
+
+def bio_address(bio):
+    """
+    Find an address in a biography.
+    Returns: Optional[str] - Longest match of the first matching bio pattern, None if none matches
+    """
+    if ',' not in bio:
+        return None
+    
+    has_bar = 'bar,' in bio
+    has_digit = _DIGIT.search(bio) is not None
+    for pattern, needs_bar, needs_digit in BIO_PATTERNS:
+        if (needs_bar and not has_bar) or (needs_digit and not has_digit):
+            continue
+        matches = list(_addresses(pattern, bio))
+        if matches:
+            return max(matches, key=len)
+    
+    return None
+
+def _last_comma(text, start, end):
+    """
+    Find the last comma in text[start:end] that is followed by a letter or whitespace.
+    Returns: int - Index of the comma, or -1 if there is none
+    """
+    # Trailing commas are followed by another comma or by the end of the run
+    while end > start and text[end - 1] == ',':
+        end -= 1
+    return text.rfind(',', start, end)
+
+def _pin_bar_address(text):
+    """
+    Find the first match of 📍\\s*bar\\s+[A-Za-z\\s°]+[^\\n]*\\n[A-Za-z\\s,]+,\\s*[A-Za-z\\s]+ in linear time.
+    
+    After '📍 bar ' the regex ends the first line at the newline following the
+    name run or, backtracking, at a newline inside the run (from the last one),
+    and takes the first of them after which the 'City, Country' part matches.
+    That part settles on the last comma of the next [A-Za-z\\s,] run that is
+    followed by a letter or whitespace. Each run is scanned once here instead
+    of once per newline and start position.
+    
+    Returns: Optional[str] - The match, or None
+    """
+    newline = comma_after_newline = -1
+    position = text.find(_PIN)
+    while position >= 0:
+        prefix = _PIN_PREFIX.match(text, position)
+        if prefix:
+            name_start = prefix.end() - 1
+            name_end = _A_RUN.match(text, name_start).end()
+            
+            # \s+[A-Za-z\s°]+ needs at least two characters of the run
+            if name_end - name_start >= 2:
+                # The newline after the run, shared by pins on the same line
+                if newline < name_end:
+                    newline = text.find('\n', name_end)
+                    if newline >= 0:
+                        line_start = newline + 1
+                        comma_after_newline = _last_comma(text, line_start, _C_RUN.match(text, line_start).end())
+                comma = comma_after_newline if newline >= 0 and comma_after_newline > newline + 1 else -1
+                
+                # Newlines inside the run: the next line continues to the end of the run (unless a '°'
+                # ends it) and on into the commas right after it
+                if comma < 0:
+                    tail_comma = _last_comma(text, name_end, _C_RUN.match(text, name_end).end())
+                    first = max(name_start + 2, text.rfind('°', name_start, name_end) + 1)
+                    inner = text.rfind('\n', first, name_end) if tail_comma >= 0 else -1
+                    while inner >= 0 and tail_comma <= inner + 1:
+                        inner = text.rfind('\n', first, inner)
+                    if inner >= 0:
+                        comma = tail_comma
+                
+                if comma >= 0:
+                    return text[position:_B_RUN.match(text, comma + 1).end()]
+        
+        position = text.find(_PIN, position + 1)
+    
+    return None
+
+def caption_address(text):
+    """
+    Find an address in a post caption.
+    Returns: Optional[str] - First match of the first matching caption pattern, None if none matches
+    """
+    if ',' not in text or 'bar' not in text:
+        return None
+    
+    if _PIN in text and '\n' in text:
+        address = _pin_bar_address(text)
+        if address is not None:
+            return address
+    
+    for address in _addresses(CAPTION_BAR_PREFIX, text):
+        return address
+    
+    if 'bar,' in text:
+        for address in _addresses(CAPTION_BAR_SUFFIX, text):
+            return address
+    
+    return None
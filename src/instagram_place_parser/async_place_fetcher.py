@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Asyncio Instagram profile data fetcher.
+asyncio-native counterpart of place_fetcher.fetch_profile_with_curl that keeps
+hundreds of profile requests in flight on one event loop.
+
+Requires the optional aiohttp package (pip install aiohttp).
+"""
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from instagram_place_parser.place_fetcher import (
+    API_BASE_URL,
+    DEFAULT_HEADERS,
+    build_auth_headers,
+    canonical_username,
+    get_default_token_cache,
+    has_required_tokens,
+    interpret_response,
+    record_breaker_outcome,
+    record_fetch,
+)
+from instagram_place_parser.single_flight import SingleFlight
+from instrumentation.stage_timings import get_default_timings
+from instagram_place_parser.profile_decoder import decode_profile_bytes
+from instagram_place_parser.retry_policy import (
+    OUTCOME_AUTH,
+    OUTCOME_FAILED,
+    OUTCOME_NETWORK,
+    RetryPolicy,
+    get_default_circuit_breaker,
+)
+
+class AsyncInstagramFetcher:
+    """
+    Async Instagram profile fetcher with a shared aiohttp connection pool.
+    
+    Returns the same data dict or {"error": ...} as fetch_profile_with_curl and
+    refreshes browser tokens through the shared TokenCache on a 401.
+    Use as an async context manager:
+    
+        async with AsyncInstagramFetcher() as fetcher:
+            data = await fetcher.fetch_profile("boyar.rs")
+    """
+    
+    def __init__(self, base_url=API_BASE_URL, max_connections=100, timeout=30,
+                 csrftoken=None, sessionid=None, mid=None, token_cache=None,
+                 response_cache=None, rate_controller=None, retry_policy=None,
+                 circuit_breaker=None, session_pool=None):
+        """
+        Args:
+            base_url: Base URL of the Instagram web API
+            max_connections: Maximum number of simultaneous connections
+            timeout: Request timeout in seconds
+            csrftoken, sessionid, mid: Optional tokens; taken from the token cache if omitted
+            token_cache: Optional TokenCache; defaults to the process-wide cache
+            response_cache: Optional ProfileResponseCache; responses are not cached if omitted
+            rate_controller: Optional AdaptiveController; requests are not rate limited if omitted
+            retry_policy: Optional RetryPolicy for transient failures; defaults to RetryPolicy()
+            circuit_breaker: Optional CircuitBreaker; defaults to the process-wide breaker
+            session_pool: Optional SessionPool; requests are spread over its accounts instead of the token cache
+        """
+        if aiohttp is None:
+            raise ImportError("The async fetcher requires aiohttp. Install it with: pip install aiohttp")
+        
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.token_cache = token_cache or get_default_token_cache()
+        self.response_cache = response_cache
+        self.rate_controller = rate_controller
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or get_default_circuit_breaker()
+        self.session_pool = session_pool
+        self.single_flight = SingleFlight()
+        self.session = None
+        
+        self._fixed_tokens = None
+        if csrftoken and sessionid:
+            self._fixed_tokens = {'csrftoken': csrftoken, 'sessionid': sessionid, 'mid': mid}
+        
+        self._token_lock = None
+        self._tokens = None
+        self._auth_headers = None
+    
+    async def __aenter__(self):
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def open(self):
+        """Create the pooled aiohttp session."""
+        if self.session is None:
+            self._token_lock = asyncio.Lock()
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers=DEFAULT_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                # Authentication is sent as a prebuilt Cookie header
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+    
+    async def close(self):
+        """Close the pooled connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+    
+    def _headers_for(self, tokens):
+        """Get the prebuilt authentication headers, rebuilding them only when the tokens change."""
+        if tokens is not self._tokens:
+            self._tokens = tokens
+            self._auth_headers = build_auth_headers(tokens)
+        return self._auth_headers
+    
+    async def _get_tokens(self):
+        """
+        Get the tokens for the next request without blocking the event loop.
+        Returns: Optional[dict] - Tokens, or None if no tokens could be found
+        """
+        if self._fixed_tokens:
+            return self._fixed_tokens
+        
+        tokens = self.token_cache.get_cached()
+        if tokens:
+            return tokens
+        
+        # Disk and browser reads run in a worker thread, one coroutine at a time
+        async with self._token_lock:
+            return await asyncio.to_thread(self.token_cache.get)
+    
+    async def _refresh_tokens(self, stale_tokens):
+        """Re-read tokens after a 401; concurrent 401s share one browser read."""
+        async with self._token_lock:
+            return await asyncio.to_thread(self.token_cache.refresh, stale_tokens)
+    
+    async def _get(self, username, auth_headers):
+        """
+        Send the web_profile_info request.
+        Returns: tuple - (status code, decoded JSON or None, Retry-After header or None)
+        """
+        api_url = f"{self.base_url}/api/v1/users/web_profile_info/?username={username}"
+        headers = dict(auth_headers)
+        headers['Referer'] = f'https://www.instagram.com/{username}/'
+        
+        controller = self.rate_controller
+        if controller is None:
+            return await self._send(api_url, headers)
+        
+        async with controller.async_slot():
+            await controller.wait_for_rate_async()
+            start = time.monotonic()
+            try:
+                result = await self._send(api_url, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                controller.record(None, time.monotonic() - start)
+                raise
+            controller.record(result[0], time.monotonic() - start)
+            return result
+    
+    async def _send(self, api_url, headers):
+        """Send one GET request and decode the fields the parser needs from the body of a 200 response."""
+        timings = get_default_timings()
+        start = time.monotonic()
+        try:
+            with timings.measure('request'):
+                async with self.session.get(api_url, headers=headers) as response:
+                    retry_after = response.headers.get('Retry-After')
+                    if response.status != 200:
+                        record_fetch(response.status, time.monotonic() - start)
+                        return response.status, None, retry_after
+                    body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            record_fetch(None, time.monotonic() - start)
+            raise
+        record_fetch(response.status, time.monotonic() - start)
+        with timings.measure('decode'):
+            return response.status, decode_profile_bytes(body), retry_after
+    
+    async def fetch_profile(self, username, tokens=None):
+        """
+        Fetch Instagram profile data for a username.
+        Concurrent fetches of the same canonical username share one request.
+        
+        Args:
+            username: Instagram username
+            tokens: Optional token dict used for this request only
+        
+        Returns: dict - Profile data, or {"error": ...} on failure
+        """
+        try:
+            key = canonical_username(username)
+        except ValueError as e:
+            return {"error": str(e)}
+        if has_required_tokens(tokens):
+            return await self._fetch_cached(username, tokens)
+        return await self.single_flight.do_async(key, lambda: self._fetch_cached(username, tokens))
+    
+    async def _fetch_cached(self, username, tokens):
+        """Fetch profile data through the response cache."""
+        # Recently fetched profiles cost no tokens and no network
+        if self.response_cache:
+            cached = await asyncio.to_thread(self.response_cache.get, username)
+            if cached is not None:
+                return cached
+        
+        data = await self._fetch_profile(username, tokens)
+        
+        if self.response_cache and 'error' not in data:
+            await asyncio.to_thread(self.response_cache.put, username, data)
+        
+        return data
+    
+    async def _fetch_profile(self, username, tokens):
+        """Fetch profile data from the API, retrying transient failures with backoff."""
+        breaker_error = self.circuit_breaker.before_request()
+        if breaker_error:
+            return {"error": breaker_error}
+        
+        attempt = 0
+        while True:
+            data, outcome, retry_after = await self._fetch_once(username, tokens)
+            if not self.retry_policy.should_retry(outcome, attempt):
+                break
+            
+            delay = self.retry_policy.delay(attempt, retry_after)
+            print(f"🔁 Retrying @{username} in {delay:.1f}s ({data['error']})")
+            await asyncio.sleep(delay)
+            attempt += 1
+        
+        record_breaker_outcome(self.circuit_breaker, outcome)
+        return data
+    
+    async def _fetch_once(self, username, tokens):
+        """
+        Make one fetch attempt, refreshing tokens once on a 401.
+        Returns: tuple - (data or {"error": ...}, OUTCOME_* constant, Retry-After seconds or None)
+        """
+        await self.open()
+        
+        explicit_tokens = has_required_tokens(tokens)
+        if self.session_pool is not None and not explicit_tokens:
+            return await self._fetch_pooled(username)
+        
+        if not explicit_tokens:
+            tokens = await self._get_tokens()
+            if not has_required_tokens(tokens):
+                return {
+                    "error": "Authentication required. Please log into Instagram in Firefox or Chrome, or provide tokens manually."
+                }, OUTCOME_AUTH, None
+        
+        try:
+            status, data, retry_after = await self._get(username, self._headers_for(tokens))
+            
+            # If we get 401, drop the cached tokens and re-read them from browsers
+            if status == 401:
+                print("Authentication failed (401). Trying to extract fresh tokens from browsers...")
+                stale_tokens = None if explicit_tokens or self._fixed_tokens else tokens
+                tokens = await self._refresh_tokens(stale_tokens)
+                
+                if not has_required_tokens(tokens):
+                    return {"error": "Authentication failed. Please log into Instagram in Firefox or Chrome and try again."}, OUTCOME_AUTH, None
+                
+                # Fixed tokens are no longer valid; use the browser tokens from now on
+                if self._fixed_tokens and not explicit_tokens:
+                    self._fixed_tokens = None
+                
+                print("Retrying with fresh tokens from browser...")
+                status, data, retry_after = await self._get(username, self._headers_for(tokens))
+            
+            return interpret_response(status, lambda: data, retry_after)
+        
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {"error": str(e) or type(e).__name__}, OUTCOME_NETWORK, None
+        except Exception as e:
+            return {"error": str(e) or type(e).__name__}, OUTCOME_FAILED, None
+    
+    async def _fetch_pooled(self, username):
+        """
+        Make one fetch attempt with the next account of the session pool.
+        A 401 removes the account from the pool and the request moves on to the next one.
+        Returns: tuple - (data or {"error": ...}, OUTCOME_* constant, Retry-After seconds or None)
+        """
+        while True:
+            account = await self.session_pool.acquire_async()
+            if account is None:
+                return {"error": "Authentication failed for every account in the session pool."}, OUTCOME_AUTH, None
+            
+            try:
+                status, data, retry_after = await self._get(username, account.auth_headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.session_pool.record(account, None)
+                return {"error": str(e) or type(e).__name__}, OUTCOME_NETWORK, None
+            except Exception as e:
+                return {"error": str(e) or type(e).__name__}, OUTCOME_FAILED, None
+            
+            self.session_pool.record(account, status)
+            if status == 401:
+                continue
+            
+            return interpret_response(status, lambda: data, retry_after)
+    
+    async def fetch_profiles(self, usernames, concurrency=100):
+        """
+        Fetch many profiles with at most `concurrency` requests in flight.
+        
+        Returns: dict - Mapping of username to profile data or {"error": ...}
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch_one(username):
+            async with semaphore:
+                return username, await self.fetch_profile(username)
+        
+        results = await asyncio.gather(*(fetch_one(username) for username in usernames))
+        return dict(results)
+
+
+async def fetch_profile_async(username, csrftoken=None, sessionid=None, mid=None):
+    """
+    Fetches Instagram profile data asynchronously using the same API as the curl command.
+    Automatically extracts tokens from browsers if authentication fails.
+    """
+    tokens = None
+    if csrftoken and sessionid:
+        tokens = {'csrftoken': csrftoken, 'sessionid': sessionid, 'mid': mid}
+    
+    async with AsyncInstagramFetcher() as fetcher:
+        return await fetcher.fetch_profile(username, tokens=tokens)
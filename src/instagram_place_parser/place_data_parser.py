@@ -1,16 +1,71 @@
 #!/usr/bin/env python3
 """
 Instagram profile data parser.
-Extracts specific information from Instagram profile data (Wolt, Google Maps, Website, Telegram, Address).
+Extracts specific information from Instagram profile data (links classified by url_rules.json, Address).
 """
 
-import re
 import json
 
-def extract_wolt_url(profile_data):
+from instagram_place_parser.address_engine import bio_address, caption_address
+from instagram_place_parser.url_rules import get_default_rules
+from instrumentation.stage_timings import get_default_timings
+
+# Number of recent posts whose captions are searched for an address
+MAX_CAPTION_POSTS = 10
+
+# Fields of the web_profile_info response read by the extract_* functions below.
+# True keeps a value whole, a dict keeps only the listed keys and a
+# (limit, spec) tuple keeps the first `limit` items of a list, each pruned by spec.
+REQUIRED_FIELDS = {
+    'status': True,
+    'data': {
+        'user': {
+            'username': True,
+            'full_name': True,
+            'biography': True,
+            'external_url': True,
+            'bio_links': True,
+            'business_address_json': True,
+            'edge_owner_to_timeline_media': {
+                'edges': (MAX_CAPTION_POSTS, {
+                    'node': {
+                        'edge_media_to_caption': True,
+                        'accessibility_caption': True,
+                    },
+                }),
+            },
+        },
+    },
+}
+
+def prune_value(value, spec):
     """
-    Extract Wolt URL from profile data.
-    Returns: Optional[str] - Wolt URL if found, None otherwise
+    Keep only the parts of a decoded JSON value selected by a field spec.
+    Returns: The pruned value (values that do not have the expected shape are kept as-is)
+    """
+    if spec is True:
+        return value
+    if isinstance(spec, dict) and isinstance(value, dict):
+        return {key: prune_value(value[key], spec[key]) for key in spec if key in value}
+    if isinstance(spec, tuple) and isinstance(value, list):
+        limit, item_spec = spec
+        return [prune_value(item, item_spec) for item in value[:limit]]
+    return value
+
+def prune_profile_data(profile_data):
+    """
+    Drop everything from a web_profile_info response that the parser does not read
+    (post media, counters, related profiles, ...).
+    Returns: dict - Profile data with only the REQUIRED_FIELDS
+    """
+    if 'error' in profile_data:
+        return profile_data
+    return prune_value(profile_data, REQUIRED_FIELDS)
+
+def get_user(profile_data):
+    """
+    Get the user object of a profile response.
+    Returns: Optional[dict] - User data, or None for errors and responses without a user
     """
     if 'error' in profile_data:
         return None
@@ -19,114 +74,68 @@ def extract_wolt_url(profile_data):
         return None
     
     user = profile_data['data']['user']
+    return user if isinstance(user, dict) else None
+
+def classify_links(user, rules=None):
+    """
+    Classify every profile link exactly once with the url_rules.json rule table.
     
-    # Check external URL for Wolt
-    if user.get('external_url') and 'wolt.com' in user['external_url']:
-        return user['external_url']
+    external_url is checked before bio_links and the first link of each field wins.
+    Links no rule matches go to website_url.
     
-    # Check bio links for Wolt URL
-    if 'bio_links' in user:
-        for link in user['bio_links']:
-            url = link.get('url', '')
-            if 'wolt.com' in url:
-                return url
+    Args:
+        user: User object of a profile response
+        rules: UrlRules to use (default: url_rules.json)
     
-    return None
+    Returns: dict - One entry per field of the rule table (None if not found)
+    """
+    rules = rules or get_default_rules()
+    urls = [user.get('external_url')]
+    bio_links = user.get('bio_links')
+    if bio_links:
+        urls += [link.get('url') for link in bio_links]
+    return rules.classify_first(urls)
+
+def _link_field(profile_data, field):
+    """Get one link bucket of classify_links for a profile response."""
+    user = get_user(profile_data)
+    if user is None:
+        return None
+    return classify_links(user)[field]
+
+def extract_wolt_url(profile_data):
+    """
+    Extract Wolt URL from profile data.
+    Returns: Optional[str] - Wolt URL if found, None otherwise
+    """
+    return _link_field(profile_data, 'wolt_url')
 
 def extract_google_maps(profile_data):
     """
     Extract Google Maps URL from profile data.
     Returns: Optional[str] - Google Maps URL if found, None otherwise
     """
-    if 'error' in profile_data:
-        return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
-        return None
-    
-    user = profile_data['data']['user']
-    
-    # Check bio links for Google Maps URL
-    if 'bio_links' in user:
-        for link in user['bio_links']:
-            url = link.get('url', '')
-            if 'maps.app.goo.gl' in url or 'google.com/maps' in url:
-                return url
-    
-    return None
+    return _link_field(profile_data, 'google_maps')
 
 def extract_website_url(profile_data):
     """
     Extract website URL from profile data.
     Returns: Optional[str] - Website URL if found, None otherwise
     """
-    if 'error' in profile_data:
-        return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
-        return None
-    
-    user = profile_data['data']['user']
-    
-    # Check external_url in user data (main website link)
-    external_url = user.get('external_url')
-    if external_url and external_url.strip():
-        # Filter out Google Maps, Wolt, and Telegram links
-        if not any(domain in external_url.lower() for domain in ['maps.app.goo.gl', 'google.com/maps', 'wolt.com', 't.me/']):
-            return external_url
-    
-    # Check bio_links for website URLs
-    if 'bio_links' in user:
-        for link in user['bio_links']:
-            url = link.get('url', '')
-            if url and url.strip():
-                # Filter out Google Maps, Wolt, and Telegram links
-                if not any(domain in url.lower() for domain in ['maps.app.goo.gl', 'google.com/maps', 'wolt.com', 't.me/']):
-                    return url
-    
-    return None
+    return _link_field(profile_data, 'website_url')
 
 def extract_telegram_link(profile_data):
     """
     Extract Telegram link from profile data.
     Returns: Optional[str] - Telegram URL if found, None otherwise
     """
-    if 'error' in profile_data:
-        return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
-        return None
-    
-    user = profile_data['data']['user']
-    
-    # Check external_url in user data for Telegram links
-    external_url = user.get('external_url')
-    if external_url and external_url.strip():
-        if 't.me/' in external_url.lower():
-            return external_url
-    
-    # Check bio_links for Telegram links
-    if 'bio_links' in user:
-        for link in user['bio_links']:
-            url = link.get('url', '')
-            if url and 't.me/' in url.lower():
-                return url
-    
-    return None
+    return _link_field(profile_data, 'telegram_link')
 
-def extract_address_text(profile_data):
+def address_from_user(user):
     """
-    Extract actual address text from profile data.
+    Extract actual address text from a user object.
     Returns: Optional[str] - Address text if found, None otherwise
     """
-    if 'error' in profile_data:
-        return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
-        return None
-    
-    user = profile_data['data']['user']
-    
     # First, check for business_address_json (most reliable)
     if 'business_address_json' in user and user['business_address_json']:
         try:
@@ -147,20 +156,10 @@ def extract_address_text(profile_data):
     # Check bio text for address patterns
     bio = user.get('biography', '')
     if bio:
-        # Pattern for addresses with city, country, postal code
-        address_patterns = [
-            r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}',  # Specific for bar format with postal code
-            r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',  # Bar format without postal code
-            r'[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+\s*\d{5}',  # Name, City, Country, Postal Code
-            r'[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',  # Name, City, Country
-            r'[A-Za-z\s°]+,\s*[A-Za-z\s]+',  # Name, City
-        ]
-        
-        for pattern in address_patterns:
-            matches = re.findall(pattern, bio)
-            if matches:
-                # Return the longest match (most complete address)
-                return max(matches, key=len).strip()
+        address = bio_address(bio)
+        if address:
+            # Longest match of the most specific pattern (most complete address)
+            return address.strip()
     
     # Check bio links for address in title
     if 'bio_links' in user:
@@ -173,50 +172,42 @@ def extract_address_text(profile_data):
     if 'edge_owner_to_timeline_media' in user and 'edges' in user['edge_owner_to_timeline_media']:
         posts = user['edge_owner_to_timeline_media']['edges']
         
-        # Address patterns to look for in post captions
-        address_patterns = [
-            r'📍\s*bar\s+[A-Za-z\s°]+[^\n]*\n[A-Za-z\s,]+,\s*[A-Za-z\s]+',  # Bar with location pin
-            r'bar\s+[A-Za-z\s°]+,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',  # Bar format
-            r'[A-Za-z\s°]+\s+bar,\s*[A-Za-z\s]+,\s*[A-Za-z\s]+',  # Name bar, City, Country
-        ]
-        
-        for post in posts[:10]:  # Check first 10 posts
+        for post in posts[:MAX_CAPTION_POSTS]:  # Check first 10 posts
             node = post.get('node', {})
             
             # Check post caption
             if 'edge_media_to_caption' in node and 'edges' in node['edge_media_to_caption']:
                 for caption_edge in node['edge_media_to_caption']['edges']:
                     caption_text = caption_edge.get('node', {}).get('text', '')
-                    for pattern in address_patterns:
-                        matches = re.findall(pattern, caption_text, re.MULTILINE | re.DOTALL)
-                        if matches:
-                            # Clean up the match and return
-                            address = matches[0].strip().replace('\n', ', ')
-                            return address
+                    address = caption_address(caption_text)
+                    if address:
+                        # Clean up the match and return
+                        return address.strip().replace('\n', ', ')
             
             # Check accessibility caption
             accessibility_caption = node.get('accessibility_caption', '')
             if accessibility_caption:
-                for pattern in address_patterns:
-                    matches = re.findall(pattern, accessibility_caption)
-                    if matches:
-                        return matches[0].strip()
+                address = caption_address(accessibility_caption)
+                if address:
+                    return address.strip()
     
     return None
 
-def extract_place_name(profile_data):
+def extract_address_text(profile_data):
     """
-    Extract the place name (full_name) from profile data.
-    Returns: Optional[str] - Place name if found, None otherwise
+    Extract actual address text from profile data.
+    Returns: Optional[str] - Address text if found, None otherwise
     """
-    if 'error' in profile_data:
-        return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
+    user = get_user(profile_data)
+    if user is None:
         return None
-    
-    user = profile_data['data']['user']
-    
+    return address_from_user(user)
+
+def place_name_from_user(user):
+    """
+    Extract the place name (full_name) from a user object.
+    Returns: Optional[str] - Place name if found, None otherwise
+    """
     # Get the full name from the profile
     full_name = user.get('full_name')
     if full_name and full_name.strip():
@@ -236,19 +227,21 @@ def extract_place_name(profile_data):
     
     return None
 
-def extract_instagram_handle(profile_data):
+def extract_place_name(profile_data):
     """
-    Extract the Instagram handle (username) from profile data.
-    Returns: Optional[str] - Instagram handle if found, None otherwise
+    Extract the place name (full_name) from profile data.
+    Returns: Optional[str] - Place name if found, None otherwise
     """
-    if 'error' in profile_data:
+    user = get_user(profile_data)
+    if user is None:
         return None
-    
-    if 'data' not in profile_data or 'user' not in profile_data['data']:
-        return None
-    
-    user = profile_data['data']['user']
-    
+    return place_name_from_user(user)
+
+def handle_from_user(user):
+    """
+    Extract the Instagram handle (username) from a user object.
+    Returns: Optional[str] - Instagram handle if found, None otherwise
+    """
     # Get the username from the profile
     username = user.get('username')
     if username and username.strip():
@@ -256,19 +249,36 @@ def extract_instagram_handle(profile_data):
     
     return None
 
+def extract_instagram_handle(profile_data):
+    """
+    Extract the Instagram handle (username) from profile data.
+    Returns: Optional[str] - Instagram handle if found, None otherwise
+    """
+    user = get_user(profile_data)
+    if user is None:
+        return None
+    return handle_from_user(user)
+
 def parse_profile_data(profile_data):
     """
     Parse all profile data and return a dictionary with extracted information.
+    Walks the user object once; every link is classified exactly once.
     Returns: dict - Dictionary with all extracted information
     """
-    return {
-        'instagram_handle': extract_instagram_handle(profile_data),
-        'place_name': extract_place_name(profile_data),
-        'wolt_url': extract_wolt_url(profile_data),
-        'google_maps': extract_google_maps(profile_data),
-        'website_url': extract_website_url(profile_data),
-        'telegram_link': extract_telegram_link(profile_data),
-        'address_text': extract_address_text(profile_data)
-    }
-
-
+    user = get_user(profile_data)
+    if user is None:
+        result = {'instagram_handle': None, 'place_name': None}
+        result.update(dict.fromkeys(get_default_rules().fields))
+        result['address_text'] = None
+        return result
+    
+    timings = get_default_timings()
+    with timings.measure('parse.instagram_handle'):
+        result = {'instagram_handle': handle_from_user(user)}
+    with timings.measure('parse.place_name'):
+        result['place_name'] = place_name_from_user(user)
+    with timings.measure('parse.links'):
+        result.update(classify_links(user))
+    with timings.measure('parse.address_text'):
+        result['address_text'] = address_from_user(user)
+    return result
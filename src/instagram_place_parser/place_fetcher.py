@@ -4,15 +4,42 @@ Instagram profile data fetcher using the same API as curl commands.
 Handles authentication and API requests to Instagram.
 """
 
-import requests
 import json
 import re
-import sys
-import os
+import threading
+import time
 
-# Add the token_extractors directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'token_extractors'))
-from place_token_extractor import extract_instagram_tokens
+from token_extractors.token_cache import get_default_token_cache
+from instrumentation.metrics import get_default_metrics
+from instagram_place_parser.single_flight import SingleFlight
+from instrumentation.stage_timings import get_default_timings
+from instagram_place_parser.profile_decoder import decode_profile_bytes
+from instagram_place_parser.retry_policy import (
+    OUTCOME_AUTH,
+    OUTCOME_FAILED,
+    OUTCOME_NETWORK,
+    OUTCOME_NOT_FOUND,
+    OUTCOME_OK,
+    OUTCOME_PRIVATE,
+    OUTCOME_THROTTLED,
+    RetryPolicy,
+    get_default_circuit_breaker,
+    outcome_for_status,
+    parse_retry_after,
+)
+
+# Profile requests by HTTP status ('error' when no response arrived), and their latency
+FETCHES = get_default_metrics().counter('mapcreator_fetches_total', 'Instagram profile requests by HTTP status', ('status',))
+FETCH_SECONDS = get_default_metrics().histogram('mapcreator_fetch_seconds', 'Latency of Instagram profile requests in seconds')
+
+# Instagram usernames: letters, digits, periods and underscores, up to 30 chars,
+# no leading, trailing or doubled periods (so never '.' or '..')
+USERNAME_PATTERN = re.compile(r'^@?(?!\.)(?!.*\.\.)[A-Za-z0-9._]{1,30}(?<!\.)$')
+
+def record_fetch(status, seconds):
+    """Count one profile request in the process-wide metrics."""
+    FETCHES.inc(status=status if status is not None else 'error')
+    FETCH_SECONDS.observe(seconds)
 
 def extract_username_from_input(user_input):
     """
@@ -36,92 +63,395 @@ def extract_username_from_input(user_input):
     # Otherwise, assume it's already a username
     return user_input
 
-def fetch_profile_with_curl(username, csrftoken=None, sessionid=None, mid=None):
+def canonical_username(user_input):
     """
-    Fetches Instagram profile data using the same API as the curl command.
-    Automatically extracts tokens from browsers if authentication fails.
+    Get the canonical form of a username, URL or @handle.
+    Instagram usernames are case-insensitive, so @Boyar.RS, boyar.rs and
+    https://www.instagram.com/boyar.rs/ all map to the same key.
+    Returns: str - Lowercased username without @ or slashes
+    Raises: ValueError - If the result is not a valid username (e.g. '..' from
+        https://www.instagram.com/../), since it names files and folders
+    """
+    username = extract_username_from_input(user_input.strip()).strip('/').lower()
+    if not USERNAME_PATTERN.match(username) or username.startswith('@'):
+        raise ValueError(f"Invalid Instagram username: {username!r}")
+    return username
+
+# Base URL of the Instagram web API
+API_BASE_URL = "https://www.instagram.com"
+
+# Headers exactly as in your curl command (Referer and x-csrftoken are added per fetcher/request)
+DEFAULT_HEADERS = {
+    'x-ig-app-id': '936619743392459',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'X-Requested-With': 'XMLHttpRequest',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+}
+
+def has_required_tokens(tokens):
+    """
+    Check that a token dict contains the cookies needed for authentication.
+    Returns: bool - True if csrftoken and sessionid are present
     """
+    return bool(tokens) and 'csrftoken' in tokens and 'sessionid' in tokens
+
+def build_auth_headers(tokens):
+    """
+    Build the authentication headers (x-csrftoken and Cookie) for a token dict.
+    Returns: dict - Headers to add to a request
+    """
+    cookies = {
+        'csrftoken': tokens['csrftoken'],
+        'sessionid': tokens['sessionid']
+    }
+    if tokens.get('mid'):
+        cookies['mid'] = tokens['mid']
     
-    # The exact API endpoint from your curl command
-    api_url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
-    
-    # Headers exactly as in your curl command
-    headers = {
-        'x-ig-app-id': '936619743392459',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json, text/plain, */*',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Referer': f'https://www.instagram.com/{username}/',
-        'X-Requested-With': 'XMLHttpRequest',
-        'Sec-Fetch-Dest': 'empty',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Site': 'same-origin',
+    return {
+        'x-csrftoken': tokens['csrftoken'],
+        'Cookie': '; '.join(f"{name}={value}" for name, value in cookies.items())
     }
+
+def check_profile_data(data):
+    """
+    Check a decoded web_profile_info response for the empty "status only" payload.
+    Returns: dict - The data itself, or {"error": ...} if the profile is not accessible
+    """
+    # Check for strange empty responses that only contain status
+    if data == {"status": "ok"} or (len(data) == 1 and "status" in data):
+        return {"error": "Profile data not accessible - empty response (profile may be private or restricted)"}
     
-    # Try with provided tokens first, or extract from browsers
-    if csrftoken and sessionid:
-        # Use provided tokens
-        headers['x-csrftoken'] = csrftoken
-        cookies = {
-            'csrftoken': csrftoken,
-            'sessionid': sessionid
-        }
-        if mid:
-            cookies['mid'] = mid
+    return data
+
+def interpret_response(status, decode, retry_after=None):
+    """
+    Turn the status (and body) of a web_profile_info response into the fetch result.
+    
+    Args:
+        status: HTTP status code
+        decode: Callable returning the decoded JSON body (only called for a 200)
+        retry_after: Optional Retry-After header value
+        
+    Returns: tuple - (data or {"error": ...}, OUTCOME_* constant, Retry-After seconds or None)
+    """
+    outcome = outcome_for_status(status)
+    
+    if outcome == OUTCOME_OK:
+        data = check_profile_data(decode())
+        if 'error' in data:
+            return data, OUTCOME_PRIVATE, None
+        return data, OUTCOME_OK, None
+    elif outcome == OUTCOME_THROTTLED:
+        return {"error": "Rate limited by Instagram (429)"}, outcome, parse_retry_after(retry_after)
+    elif outcome == OUTCOME_NOT_FOUND:
+        return {"error": "Profile not found (404)"}, outcome, None
+    elif outcome == OUTCOME_AUTH:
+        return {"error": "Authentication failed. Please log into Instagram in Firefox or Chrome and try again."}, outcome, None
+    else:
+        return {"error": f"API request failed: {status}"}, outcome, parse_retry_after(retry_after)
+
+def record_breaker_outcome(breaker, outcome):
+    """Feed the final outcome of a fetch into the circuit breaker."""
+    if outcome == OUTCOME_AUTH:
+        breaker.record_auth_failure()
+    elif outcome in (OUTCOME_OK, OUTCOME_NOT_FOUND, OUTCOME_PRIVATE):
+        breaker.record_success()
     else:
-        # Extract tokens from available browsers
-        print("No authentication tokens provided. Extracting from browsers...")
-        tokens = extract_instagram_tokens()
+        breaker.record_other()
+
+
+class PrefetchedProfileFetcher:
+    """
+    Fetcher stand-in that serves profiles fetched elsewhere (e.g. by the async engine).
+    """
+    
+    def __init__(self, profiles):
+        """
+        Args:
+            profiles: dict mapping username to profile data or {"error": ...}
+        """
+        self.profiles = profiles
+    
+    def fetch_profile(self, username, tokens=None):
+        """
+        Get the prefetched profile data for a username.
+        Returns: dict - Profile data, or {"error": ...} if it was not prefetched
+        """
+        return self.profiles.get(username, {"error": f"Profile was not prefetched: {username}"})
+
+
+class InstagramFetcher:
+    """
+    Reusable Instagram profile fetcher.
+    
+    Owns a keep-alive requests.Session with a sized connection pool and prebuilt
+    headers and cookies, so all fetches in a process share TCP/TLS connections
+    instead of paying a fresh DNS lookup, connect and handshake per profile.
+    Safe to share between threads.
+    """
+    
+    def __init__(self, base_url=API_BASE_URL, pool_size=10, timeout=30,
+                 csrftoken=None, sessionid=None, mid=None, token_cache=None,
+                 response_cache=None, rate_controller=None, retry_policy=None,
+                 circuit_breaker=None, session_pool=None):
+        """
+        Args:
+            base_url: Base URL of the Instagram web API
+            pool_size: Maximum number of pooled keep-alive connections
+            timeout: Request timeout in seconds
+            csrftoken, sessionid, mid: Optional tokens; taken from the token cache if omitted
+            token_cache: Optional TokenCache; defaults to the process-wide cache
+            response_cache: Optional ProfileResponseCache; responses are not cached if omitted
+            rate_controller: Optional AdaptiveController; requests are not rate limited if omitted
+            retry_policy: Optional RetryPolicy for transient failures; defaults to RetryPolicy()
+            circuit_breaker: Optional CircuitBreaker; defaults to the process-wide breaker
+            session_pool: Optional SessionPool; requests are spread over its accounts instead of the token cache
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token_cache = token_cache or get_default_token_cache()
+        self.response_cache = response_cache
+        self.rate_controller = rate_controller
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or get_default_circuit_breaker()
+        self.session_pool = session_pool
+        self.single_flight = SingleFlight()
+        
+        # requests is imported on first use: the helpers above are imported by
+        # every command, most of which never open a connection
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._auth_headers = None
+        self._fixed_tokens = None
         
-        if not tokens or 'csrftoken' not in tokens or 'sessionid' not in tokens:
-            return {
-                "error": "Authentication required. Please log into Instagram in Firefox or Chrome, or provide tokens manually."
-            }
+        if csrftoken and sessionid:
+            self._fixed_tokens = {'csrftoken': csrftoken, 'sessionid': sessionid, 'mid': mid}
+    
+    def _headers_for(self, tokens):
+        """
+        Get the prebuilt authentication headers for a token dict, rebuilding them only when the tokens change.
+        """
+        with self._lock:
+            if tokens is not self._tokens:
+                self._tokens = tokens
+                self._auth_headers = build_auth_headers(tokens)
+            return self._auth_headers
+    
+    def _get_tokens(self):
+        """
+        Get the tokens for the next request: fixed tokens if given, otherwise from the token cache.
+        Returns: Optional[dict] - Tokens, or None if no tokens could be found
+        """
+        if self._fixed_tokens:
+            return self._fixed_tokens
+        return self.token_cache.get()
+    
+    def _get(self, username, auth_headers):
+        """Send the web_profile_info request over the pooled session."""
+        import requests
+        api_url = f"{self.base_url}/api/v1/users/web_profile_info/?username={username}"
+        headers = dict(auth_headers)
+        headers['Referer'] = f'https://www.instagram.com/{username}/'
         
-        print("Successfully extracted tokens from browser.")
-        headers['x-csrftoken'] = tokens['csrftoken']
-        cookies = {
-            'csrftoken': tokens['csrftoken'],
-            'sessionid': tokens['sessionid']
-        }
-        if 'mid' in tokens:
-            cookies['mid'] = tokens['mid']
-    
-    try:
-        response = requests.get(api_url, headers=headers, cookies=cookies)
+        controller = self.rate_controller
+        if controller is None:
+            return self._send(api_url, headers)
+        
+        with controller.slot():
+            controller.wait_for_rate()
+            start = time.monotonic()
+            try:
+                response = self._send(api_url, headers)
+            except requests.RequestException:
+                controller.record(None, time.monotonic() - start)
+                raise
+            controller.record(response.status_code, time.monotonic() - start)
+            return response
+    
+    def _send(self, api_url, headers):
+        """Send one GET request."""
+        start = time.monotonic()
+        try:
+            with get_default_timings().measure('request'):
+                response = self.session.get(api_url, headers=headers, timeout=self.timeout)
+        except Exception:
+            record_fetch(None, time.monotonic() - start)
+            raise
+        record_fetch(response.status_code, time.monotonic() - start)
+        return response
+    
+    def _interpret(self, response):
+        """Interpret a response, decoding a 200 body down to the fields the parser needs."""
+        def decode():
+            with get_default_timings().measure('decode'):
+                return decode_profile_bytes(response.content)
         
-        # If we get 401, try to extract fresh tokens from browsers
-        if response.status_code == 401:
-            print("Authentication failed (401). Trying to extract fresh tokens from browsers...")
-            tokens = extract_instagram_tokens()
+        return interpret_response(response.status_code, decode, response.headers.get('Retry-After'))
+    
+    def fetch_profile(self, username, tokens=None):
+        """
+        Fetch Instagram profile data for a username.
+        Concurrent fetches of the same canonical username share one request.
+        
+        Args:
+            username: Instagram username
+            tokens: Optional token dict used for this request only
             
-            if tokens and 'csrftoken' in tokens and 'sessionid' in tokens:
-                print("Retrying with fresh tokens from browser...")
-                headers['x-csrftoken'] = tokens['csrftoken']
-                cookies = {
-                    'csrftoken': tokens['csrftoken'],
-                    'sessionid': tokens['sessionid']
-                }
-                if 'mid' in tokens:
-                    cookies['mid'] = tokens['mid']
-                
-                response = requests.get(api_url, headers=headers, cookies=cookies)
-            else:
-                return {"error": "Authentication failed. Please log into Instagram in Firefox or Chrome and try again."}
+        Returns: dict - Profile data, or {"error": ...} on failure
+        """
+        try:
+            key = canonical_username(username)
+        except ValueError as e:
+            return {"error": str(e)}
+        if has_required_tokens(tokens):
+            return self._fetch_cached(username, tokens)
+        return self.single_flight.do(key, lambda: self._fetch_cached(username, tokens))
+    
+    def _fetch_cached(self, username, tokens):
+        """Fetch profile data through the response cache."""
+        # Recently fetched profiles cost no tokens and no network
+        if self.response_cache:
+            cached = self.response_cache.get(username)
+            if cached is not None:
+                return cached
         
-        if response.status_code == 200:
-            data = response.json()
+        data = self._fetch_profile(username, tokens)
+        
+        if self.response_cache and 'error' not in data:
+            self.response_cache.put(username, data)
+        
+        return data
+    
+    def _fetch_profile(self, username, tokens):
+        """Fetch profile data from the API, retrying transient failures with backoff."""
+        breaker_error = self.circuit_breaker.before_request()
+        if breaker_error:
+            return {"error": breaker_error}
+        
+        attempt = 0
+        while True:
+            data, outcome, retry_after = self._fetch_once(username, tokens)
+            if not self.retry_policy.should_retry(outcome, attempt):
+                break
             
-            # Check for strange empty responses that only contain status
-            if data == {"status": "ok"} or (len(data) == 1 and "status" in data):
-                return {"error": "Profile data not accessible - empty response (profile may be private or restricted)"}
+            delay = self.retry_policy.delay(attempt, retry_after)
+            print(f"🔁 Retrying @{username} in {delay:.1f}s ({data['error']})")
+            time.sleep(delay)
+            attempt += 1
+        
+        record_breaker_outcome(self.circuit_breaker, outcome)
+        return data
+    
+    def _fetch_once(self, username, tokens):
+        """
+        Make one fetch attempt, refreshing tokens once on a 401.
+        Returns: tuple - (data or {"error": ...}, OUTCOME_* constant, Retry-After seconds or None)
+        """
+        import requests
+        explicit_tokens = has_required_tokens(tokens)
+        if self.session_pool is not None and not explicit_tokens:
+            return self._fetch_pooled(username)
+        
+        if not explicit_tokens:
+            tokens = self._get_tokens()
+            if not has_required_tokens(tokens):
+                return {
+                    "error": "Authentication required. Please log into Instagram in Firefox or Chrome, or provide tokens manually."
+                }, OUTCOME_AUTH, None
+        
+        try:
+            response = self._get(username, self._headers_for(tokens))
             
-            return data
-        else:
-            return {"error": f"API request failed: {response.status_code}"}
+            # If we get 401, drop the cached tokens and re-read them from browsers
+            if response.status_code == 401:
+                print("Authentication failed (401). Trying to extract fresh tokens from browsers...")
+                stale_tokens = None if explicit_tokens or self._fixed_tokens else tokens
+                tokens = self.token_cache.refresh(stale_tokens)
+                
+                if not has_required_tokens(tokens):
+                    return {"error": "Authentication failed. Please log into Instagram in Firefox or Chrome and try again."}, OUTCOME_AUTH, None
+                
+                # Fixed tokens are no longer valid; use the browser tokens from now on
+                if self._fixed_tokens and not explicit_tokens:
+                    self._fixed_tokens = None
+                
+                print("Retrying with fresh tokens from browser...")
+                response = self._get(username, self._headers_for(tokens))
+            
+            return self._interpret(response)
+            
+        except requests.RequestException as e:
+            return {"error": str(e)}, OUTCOME_NETWORK, None
+        except Exception as e:
+            return {"error": str(e)}, OUTCOME_FAILED, None
+    
+    def _fetch_pooled(self, username):
+        """
+        Make one fetch attempt with the next account of the session pool.
+        A 401 removes the account from the pool and the request moves on to the next one.
+        Returns: tuple - (data or {"error": ...}, OUTCOME_* constant, Retry-After seconds or None)
+        """
+        import requests
+        while True:
+            account = self.session_pool.acquire()
+            if account is None:
+                return {"error": "Authentication failed for every account in the session pool."}, OUTCOME_AUTH, None
+            
+            try:
+                response = self._get(username, account.auth_headers)
+            except requests.RequestException as e:
+                self.session_pool.record(account, None)
+                return {"error": str(e)}, OUTCOME_NETWORK, None
+            
+            self.session_pool.record(account, response.status_code)
+            if response.status_code == 401:
+                continue
             
-    except Exception as e:
-        return {"error": str(e)}
+            try:
+                return self._interpret(response)
+            except Exception as e:
+                return {"error": str(e)}, OUTCOME_FAILED, None
+    
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
 
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
 
+def get_default_fetcher():
+    """
+    Get the process-wide shared InstagramFetcher, creating it on first use.
+    Returns: InstagramFetcher
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = InstagramFetcher()
+        return _default_fetcher
+
+def fetch_profile_with_curl(username, csrftoken=None, sessionid=None, mid=None):
+    """
+    Fetches Instagram profile data using the same API as the curl command.
+    Automatically extracts tokens from browsers if authentication fails.
+    Uses the process-wide pooled session from get_default_fetcher().
+    """
+    tokens = None
+    if csrftoken and sessionid:
+        tokens = {'csrftoken': csrftoken, 'sessionid': sessionid, 'mid': mid}
+    
+    return get_default_fetcher().fetch_profile(username, tokens=tokens)
@@ -5,8 +5,15 @@ Main entry point that coordinates profile fetching and data parsing.
 """
 
 import json
-from place_fetcher import fetch_profile_with_curl, extract_username_from_input
-from place_data_parser import parse_profile_data
+import os
+import sys
+
+if __package__ in (None, ''):
+    # Run as a script: import the packages from src/ instead of this script's own directory
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from instagram_place_parser.place_fetcher import fetch_profile_with_curl, extract_username_from_input
+from instagram_place_parser.place_data_parser import parse_profile_data
 
 def main():
     """
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Field-pruning decoder for web_profile_info responses.
+Decodes the body with json and keeps only the fields declared in
+place_data_parser.REQUIRED_FIELDS, so post media, counters and related
+profiles are dropped before the profile is cached or parsed.
+"""
+
+import json
+
+from instagram_place_parser.place_data_parser import prune_profile_data
+
+def decode_profile_bytes(body):
+    """
+    Decode a web_profile_info body, keeping only REQUIRED_FIELDS.
+
+    Args:
+        body: Response body (bytes or str)
+
+    Returns: dict - Pruned profile data
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    return prune_profile_data(json.loads(body))
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Rate limiting for Instagram API requests.
+A token bucket caps requests/sec per session and an AIMD controller adapts both
+the rate and the number of concurrent requests to what Instagram tolerates.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting requests per second.
+    """
+    
+    def __init__(self, rate, burst=1.0, clock=time.monotonic):
+        """
+        Args:
+            rate: Requests per second
+            burst: Maximum number of requests that may be sent back to back
+            clock: Callable returning monotonic seconds (replaceable in tests)
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        """Add the tokens accumulated since the last update. Caller holds the lock."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def set_rate(self, rate):
+        """Change the rate, keeping the tokens accumulated at the old rate."""
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = rate
+    
+    def reserve(self):
+        """
+        Book the next request slot.
+        Returns: float - Seconds to wait before sending the request
+        """
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self):
+        """Block until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+    
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent."""
+        # asyncio is only loaded by the --async code paths
+        import asyncio
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveController:
+    """
+    AIMD controller for request rate and concurrency.
+    
+    Every 429, 5xx or network error halves the rate and the concurrency limit
+    (at most once per backoff_interval, so one burst of failures counts once).
+    After every increase_every healthy responses with an average latency under
+    latency_target, the rate grows by rate_step and the concurrency limit by one.
+    snapshot() publishes the current values and the peak the controller has found.
+    """
+    
+    def __init__(self, rate=5.0, min_rate=0.2, max_rate=50.0, rate_step=1.0,
+                 concurrency=4, min_concurrency=1, max_concurrency=32,
+                 increase_every=10, decrease_factor=0.5, latency_target=3.0,
+                 backoff_interval=1.0, on_rate_change=None, clock=time.monotonic):
+        """
+        Args:
+            rate: Initial requests per second
+            min_rate, max_rate: Bounds of the request rate
+            rate_step: Requests per second added on each increase
+            concurrency: Initial number of concurrent requests
+            min_concurrency, max_concurrency: Bounds of the concurrency limit
+            increase_every: Healthy responses needed before each increase
+            decrease_factor: Factor applied to rate and concurrency on each decrease
+            latency_target: Average latency (seconds) above which the controller stops increasing
+            backoff_interval: Minimum seconds between two decreases
+            on_rate_change: Optional callable receiving every new rate (e.g. to scale per-account buckets)
+            clock: Callable returning monotonic seconds (replaceable in tests)
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.concurrency = min(max(concurrency, self.min_concurrency), self.max_concurrency)
+        self.increase_every = increase_every
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.backoff_interval = backoff_interval
+        self.on_rate_change = on_rate_change
+        self.clock = clock
+        
+        self.bucket = TokenBucket(min(max(rate, min_rate), max_rate), clock=clock)
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'server_errors': 0,
+            'network_errors': 0,
+            'decreases': 0,
+            'increases': 0,
+            'peak_rate': self.bucket.rate,
+            'peak_concurrency': self.concurrency,
+        }
+        
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters = deque()
+        self._in_flight = 0
+        self._healthy = 0
+        self._latency = None
+        self._last_decrease = 0.0
+    
+    @property
+    def rate(self):
+        """Current requests per second."""
+        return self.bucket.rate
+    
+    def _set_rate(self, rate):
+        """Change the request rate and tell the listener. Caller holds the lock."""
+        self.bucket.set_rate(rate)
+        if self.on_rate_change:
+            self.on_rate_change(rate)
+    
+    def _wake(self):
+        """Let waiting requests in if the concurrency limit allows. Caller holds the lock."""
+        self._cond.notify_all()
+        while self._async_waiters and self._in_flight < self.concurrency:
+            waiter = self._async_waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+    
+    def _leave(self):
+        """Release a concurrency slot."""
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+    
+    @contextmanager
+    def slot(self):
+        """Hold one of the concurrency slots while sending a request (threads)."""
+        with self._lock:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._leave()
+    
+    @asynccontextmanager
+    async def async_slot(self):
+        """Hold one of the concurrency slots while sending a request (one event loop)."""
+        import asyncio
+        with self._lock:
+            if self._in_flight < self.concurrency and not self._async_waiters:
+                self._in_flight += 1
+                waiter = None
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(waiter)
+        
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # The slot may have been handed over just before the cancellation
+                if waiter.done() and not waiter.cancelled():
+                    self._leave()
+                raise
+        try:
+            yield
+        finally:
+            self._leave()
+    
+    def wait_for_rate(self):
+        """Block until the token bucket allows the next request."""
+        self.bucket.acquire()
+    
+    async def wait_for_rate_async(self):
+        """Wait on the event loop until the token bucket allows the next request."""
+        await self.bucket.acquire_async()
+    
+    def record(self, status, latency):
+        """
+        Feed the outcome of a request into the controller.
+        
+        Args:
+            status: HTTP status code, or None for a network error
+            latency: Request latency in seconds
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            
+            if status is None or status == 429 or status >= 500:
+                if status is None:
+                    self.stats['network_errors'] += 1
+                elif status == 429:
+                    self.stats['throttled'] += 1
+                else:
+                    self.stats['server_errors'] += 1
+                self._healthy = 0
+                self._decrease(status)
+                return
+            
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            self._healthy += 1
+            if self._healthy >= self.increase_every and self._latency <= self.latency_target:
+                self._healthy = 0
+                self._increase()
+    
+    def _decrease(self, status):
+        """Multiplicative decrease of rate and concurrency. Caller holds the lock."""
+        now = self.clock()
+        if now - self._last_decrease < self.backoff_interval:
+            return
+        self._last_decrease = now
+        
+        rate = max(self.min_rate, self.bucket.rate * self.decrease_factor)
+        self._set_rate(rate)
+        self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease_factor))
+        self.stats['decreases'] += 1
+        
+        reason = status if status is not None else 'network error'
+        print(f"🚦 Backing off ({reason}): {rate:.2f} req/s, {self.concurrency} concurrent")
+    
+    def _increase(self):
+        """Additive increase of rate and concurrency. Caller holds the lock."""
+        rate = min(self.max_rate, self.bucket.rate + self.rate_step)
+        self._set_rate(rate)
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        self.stats['increases'] += 1
+        self.stats['peak_rate'] = max(self.stats['peak_rate'], rate)
+        self.stats['peak_concurrency'] = max(self.stats['peak_concurrency'], self.concurrency)
+        self._wake()
+    
+    def snapshot(self):
+        """
+        Get the current state of the controller.
+        Returns: dict - Current rate, concurrency, in-flight requests, average latency and stats
+        """
+        with self._lock:
+            state = dict(self.stats)
+            state.update({
+                'rate': self.bucket.rate,
+                'concurrency': self.concurrency,
+                'in_flight': self._in_flight,
+                'latency': self._latency,
+            })
+            return state
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of web_profile_info responses, pruned to the fields the parser reads.
+Lets repeated runs and parser iterations reuse profiles fetched recently instead of hitting the network.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from instagram_place_parser.place_data_parser import REQUIRED_FIELDS
+from instrumentation.metrics import CACHE_REQUESTS
+
+# Default cache directory
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), '.cache', 'mapcreator', 'profiles')
+
+# Version of the cached field set: entries pruned with other REQUIRED_FIELDS are never read back
+FIELDS_VERSION = hashlib.sha256(json.dumps(REQUIRED_FIELDS, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+# Default maximum age of a cached response in seconds (24 hours)
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+# Default maximum total size of the cache in bytes (200 MB)
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+def cache_key(username):
+    """
+    Get the content address of a username's cache entry.
+    Returns: str - SHA-256 hex digest of FIELDS_VERSION and the lowercased username
+    """
+    return hashlib.sha256(f"{FIELDS_VERSION}:{username.strip().lower()}".encode('utf-8')).hexdigest()
+
+class ProfileResponseCache:
+    """
+    Content-addressed on-disk cache of pruned profile responses keyed by username.
+    
+    Entries only hold the REQUIRED_FIELDS of a response, so the key includes
+    FIELDS_VERSION: once the parser reads more fields, old entries are misses.
+    
+    Entries older than max_age are ignored; once the cache grows past max_bytes
+    the least recently written entries are evicted. Safe to share between threads.
+    """
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_age: Seconds a cached response stays valid
+            max_bytes: Maximum total size of the cache before eviction
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+        self._lock = threading.Lock()
+        self._total_bytes = None
+    
+    def _path(self, username):
+        """Get the entry path for a username, sharded by the first two hex digits."""
+        key = cache_key(username)
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, username):
+        """
+        Get a cached profile response.
+        Returns: Optional[dict] - Profile data if cached and not older than max_age, None otherwise
+        """
+        path = self._path(username)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - float(entry['fetched_at']) <= self.max_age:
+                with self._lock:
+                    self.stats['hits'] += 1
+                CACHE_REQUESTS.inc(cache='response', result='hit')
+                return entry['data']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        with self._lock:
+            self.stats['misses'] += 1
+        CACHE_REQUESTS.inc(cache='response', result='miss')
+        return None
+    
+    def put(self, username, data):
+        """Store a profile response and evict old entries if the cache is over max_bytes."""
+        path = self._path(username)
+        entry = json.dumps({
+            'username': username,
+            'fetched_at': time.time(),
+            'data': data,
+        }, ensure_ascii=False).encode('utf-8')
+        
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(entry)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+        
+        with self._lock:
+            self.stats['stores'] += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(entry) - previous_size
+            
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _entries(self):
+        """
+        List all cache entries.
+        Returns: list - (mtime, size, path) tuples
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        
+        for shard in os.listdir(self.cache_dir):
+            shard_path = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(shard_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def _scan_size(self):
+        """Get the total size of all cache entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+    
+    def _evict(self):
+        """Delete the oldest entries until the cache is at 90% of max_bytes. Caller holds the lock."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats['evictions'] += 1
+        
+        self._total_bytes = total
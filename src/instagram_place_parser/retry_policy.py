@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Retry and circuit breaker policies for Instagram API requests.
+Transient failures (network errors, 5xx, 429) are retried with jittered exponential
+backoff; a process-wide circuit breaker stops all fetches once authentication is broken.
+"""
+
+import random
+import threading
+import time
+
+# Outcomes of a single fetch attempt
+OUTCOME_OK = 'ok'
+OUTCOME_NETWORK = 'network'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_SERVER = 'server'
+OUTCOME_AUTH = 'auth'
+OUTCOME_NOT_FOUND = 'not_found'
+OUTCOME_PRIVATE = 'private'
+OUTCOME_FAILED = 'failed'
+
+def outcome_for_status(status):
+    """
+    Classify an HTTP status code of a fetch attempt.
+    Returns: str - One of the OUTCOME_* constants
+    """
+    if status == 200:
+        return OUTCOME_OK
+    if status == 429:
+        return OUTCOME_THROTTLED
+    if status == 401:
+        return OUTCOME_AUTH
+    if status == 404:
+        return OUTCOME_NOT_FOUND
+    if 500 <= status < 600:
+        return OUTCOME_SERVER
+    return OUTCOME_FAILED
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient failures.
+    """
+    
+    # Outcomes worth another attempt; 404s, private profiles and auth failures are final
+    RETRYABLE = frozenset([OUTCOME_NETWORK, OUTCOME_THROTTLED, OUTCOME_SERVER])
+    
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        """
+        Args:
+            max_attempts: Total attempts per fetch, including the first one
+            base_delay: Backoff ceiling in seconds before the first retry
+            max_delay: Largest backoff ceiling in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def should_retry(self, outcome, attempt):
+        """
+        Check whether a failed attempt should be retried.
+        
+        Args:
+            outcome: OUTCOME_* constant of the attempt
+            attempt: Zero-based number of the attempt that just finished
+        """
+        return outcome in self.RETRYABLE and attempt + 1 < self.max_attempts
+    
+    def delay(self, attempt, retry_after=None):
+        """
+        Get the backoff before the next attempt.
+        
+        Args:
+            attempt: Zero-based number of the attempt that just finished
+            retry_after: Optional server-requested delay (Retry-After) in seconds
+        
+        Returns: float - Seconds to wait
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given in seconds.
+    Returns: Optional[float] - Seconds, or None if missing or not a number
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker for authentication failures.
+    
+    After failure_threshold consecutive authentication failures the circuit opens
+    and every fetch fails immediately without touching the API or the browsers.
+    After reset_timeout seconds one probe request is let through: success closes
+    the circuit, another authentication failure opens it again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=3, reset_timeout=300.0, clock=time.monotonic):
+        """
+        Args:
+            failure_threshold: Consecutive authentication failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+            clock: Callable returning monotonic seconds (replaceable in tests)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.stats = {
+            'opened': 0,
+            'rejected': 0,
+        }
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def before_request(self):
+        """
+        Check whether a fetch may proceed.
+        Returns: Optional[str] - None if allowed, otherwise the error to report
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return None
+            
+            self.stats['rejected'] += 1
+            return (f"Instagram fetches paused: authentication is broken "
+                    f"(retrying in {max(0, int(remaining))}s). Log into Instagram in Firefox or Chrome.")
+    
+    def record_success(self):
+        """Record a fetch that reached Instagram with valid authentication."""
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                print("✅ Authentication works again, resuming Instagram fetches")
+            self.state = self.CLOSED
+    
+    def record_auth_failure(self):
+        """Record a fetch that failed because authentication is missing or rejected."""
+        with self._lock:
+            self._failures += 1
+            probe_failed = self.state == self.HALF_OPEN
+            self._probe_in_flight = False
+            if probe_failed or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self.stats['opened'] += 1
+                print(f"⛔ Authentication is broken: pausing all Instagram fetches for {self.reset_timeout:.0f}s")
+    
+    def record_other(self):
+        """Record a fetch whose outcome says nothing about authentication (e.g. a network error)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+
+_default_breaker = None
+_default_breaker_lock = threading.Lock()
+
+def get_default_circuit_breaker():
+    """
+    Get the process-wide CircuitBreaker, creating it on first use.
+    Returns: CircuitBreaker
+    """
+    global _default_breaker
+    with _default_breaker_lock:
+        if _default_breaker is None:
+            _default_breaker = CircuitBreaker()
+        return _default_breaker
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Pool of Instagram accounts for spreading profile requests.
+Each account has its own tokens, request rate, health and cooldown, so total
+throughput grows with the number of logged-in accounts instead of being capped
+by the rate limit of a single session.
+"""
+
+import json
+import threading
+import time
+
+from instagram_place_parser.place_fetcher import build_auth_headers, has_required_tokens
+from instagram_place_parser.rate_limiter import TokenBucket
+
+# Marker of the unfilled values in place_tokens_template.json
+PLACEHOLDER_MARKER = 'YOUR_'
+
+# Default seconds an account rests after a 429
+DEFAULT_COOLDOWN = 60.0
+
+def load_token_file(path):
+    """
+    Load token sets from a JSON file like place_tokens_template.json.
+    The file holds either one token dict or a list of them; placeholder values are skipped.
+    
+    Returns: list - Token dicts with csrftoken, sessionid and optionally mid
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = [entries]
+    
+    token_sets = []
+    for entry in entries:
+        tokens = {name: entry.get(name) for name in ('csrftoken', 'sessionid', 'mid')}
+        if tokens['mid'] and PLACEHOLDER_MARKER in tokens['mid']:
+            tokens['mid'] = None
+        if not has_required_tokens({k: v for k, v in tokens.items() if v}):
+            continue
+        if PLACEHOLDER_MARKER in tokens['csrftoken'] or PLACEHOLDER_MARKER in tokens['sessionid']:
+            continue
+        token_sets.append(tokens)
+    return token_sets
+
+
+class PooledSession:
+    """
+    One Instagram account in the pool with its own rate, health and cooldown.
+    """
+    
+    def __init__(self, name, tokens, rate, clock=time.monotonic):
+        """
+        Args:
+            name: Label of the account (browser profile or token file)
+            tokens: Token dict with csrftoken, sessionid and optionally mid
+            rate: Requests per second allowed for this account
+            clock: Callable returning monotonic seconds (replaceable in tests)
+        """
+        self.name = name
+        self.tokens = tokens
+        self.auth_headers = build_auth_headers(tokens)
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.alive = True
+        self.cooldown_until = 0.0
+        self.throttle_strikes = 0
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'errors': 0,
+        }
+
+
+class SessionPool:
+    """
+    Round-robin pool of Instagram accounts.
+    
+    Every request takes the next account that is alive and not cooling down and
+    waits for that account's token bucket. A 429 puts the account into a cooldown
+    that doubles on consecutive 429s; a 401 removes it from the pool for the rest
+    of the run. Safe to share between threads and with one event loop.
+    """
+    
+    def __init__(self, accounts, rate=5.0, cooldown=DEFAULT_COOLDOWN, max_cooldown=600.0, clock=time.monotonic):
+        """
+        Args:
+            accounts: List of (name, tokens) tuples
+            rate: Requests per second allowed per account
+            cooldown: Seconds an account rests after its first 429
+            max_cooldown: Longest cooldown after consecutive 429s
+            clock: Callable returning monotonic seconds (replaceable in tests)
+        """
+        self.sessions = [PooledSession(name, tokens, rate, clock) for name, tokens in accounts]
+        self.clock = clock
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._next = 0
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def set_rate(self, rate):
+        """Change the requests per second allowed per account (e.g. following an AdaptiveController)."""
+        for session in self.sessions:
+            session.bucket.set_rate(rate)
+    
+    @classmethod
+    def from_sources(cls, token_files=(), browser_profiles=False, rate=5.0, cooldown=DEFAULT_COOLDOWN):
+        """
+        Build a pool from token files and/or every logged-in browser profile.
+        
+        Args:
+            token_files: Paths of JSON token files
+            browser_profiles: Whether to read tokens from all Firefox and Chrome profiles
+            rate: Requests per second allowed per account
+            cooldown: Seconds an account rests after its first 429
+        
+        Returns: SessionPool - Accounts are deduplicated by sessionid
+        """
+        accounts = []
+        for path in token_files:
+            for index, tokens in enumerate(load_token_file(path)):
+                accounts.append((f"{path}#{index}", tokens))
+        if browser_profiles:
+            from token_extractors.place_token_extractor import extract_all_instagram_tokens
+            accounts.extend(extract_all_instagram_tokens())
+        
+        unique = {}
+        for name, tokens in accounts:
+            unique.setdefault(tokens['sessionid'], (name, tokens))
+        return cls(list(unique.values()), rate=rate, cooldown=cooldown)
+    
+    def _reserve(self):
+        """
+        Pick the next usable account and book a request slot on it.
+        Returns: tuple - (PooledSession, seconds to wait) or (None, 0.0) if every account is logged out
+        """
+        with self._lock:
+            alive = [s for s in self.sessions if s.alive]
+            if not alive:
+                return None, 0.0
+            
+            now = self.clock()
+            count = len(self.sessions)
+            chosen = None
+            for offset in range(count):
+                session = self.sessions[(self._next + offset) % count]
+                if session.alive and session.cooldown_until <= now:
+                    chosen = session
+                    self._next = (self._next + offset + 1) % count
+                    break
+            
+            # Every account is cooling down: wait for the one that recovers first
+            if chosen is None:
+                chosen = min(alive, key=lambda s: s.cooldown_until)
+            
+            chosen.stats['requests'] += 1
+            wait = max(0.0, chosen.cooldown_until - now)
+        return chosen, wait + chosen.bucket.reserve()
+    
+    def acquire(self):
+        """
+        Block until an account may send the next request.
+        Returns: Optional[PooledSession] - The account, or None if every account is logged out
+        """
+        session, delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return session
+    
+    async def acquire_async(self):
+        """
+        Wait on the event loop until an account may send the next request.
+        Returns: Optional[PooledSession] - The account, or None if every account is logged out
+        """
+        # asyncio is only loaded by the --async code paths
+        import asyncio
+        session, delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return session
+    
+    def record(self, session, status):
+        """
+        Feed the outcome of a request into the account's health.
+        
+        Args:
+            session: PooledSession that sent the request
+            status: HTTP status code, or None for a network error
+        """
+        with self._lock:
+            if status == 429:
+                session.stats['throttled'] += 1
+                cooldown = min(self.max_cooldown, self.cooldown * (2 ** session.throttle_strikes))
+                session.throttle_strikes += 1
+                session.cooldown_until = self.clock() + cooldown
+                print(f"🧊 Account {session.name} throttled (429), resting for {cooldown:.0f}s")
+            elif status == 401:
+                if session.alive:
+                    session.alive = False
+                    print(f"🔒 Account {session.name} was logged out (401), removing it from the pool")
+            elif status is None or status >= 500:
+                session.stats['errors'] += 1
+            else:
+                session.throttle_strikes = 0
+    
+    def snapshot(self):
+        """
+        Get the state of every account.
+        Returns: list - One dict per account with name, alive, cooling and stats
+        """
+        with self._lock:
+            now = self.clock()
+            return [dict(session.stats, name=session.name, alive=session.alive,
+                         cooling=session.cooldown_until > now)
+                    for session in self.sessions]
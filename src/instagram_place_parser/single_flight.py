@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of duplicate work.
+Concurrent calls for the same key share one in-flight call and its result,
+so the same profile is never fetched twice at the same time.
+"""
+
+import threading
+
+class _Call:
+    """One in-flight call shared by every caller with the same key."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one call.
+    
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and get the same result (or exception). Once the call
+    finishes the key is forgotten, so later calls run again. do() is for threads,
+    do_async() for coroutines on one event loop. The stats dict counts calls and
+    how many of them were coalesced into an in-flight call.
+    """
+    
+    def __init__(self):
+        self.stats = {
+            'calls': 0,
+            'coalesced': 0,
+        }
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+    
+    def do(self, key, function):
+        """
+        Run function() unless a call for key is already in flight, then share its result.
+        
+        Args:
+            key: Hashable key identifying the work (e.g. a canonical username)
+            function: Callable without arguments doing the work
+        
+        Returns: The result of the (possibly shared) call
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+                owner = False
+            else:
+                call = self._calls[key] = _Call()
+                owner = True
+        
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    async def do_async(self, key, function):
+        """
+        Await function() unless a call for key is already in flight, then share its result.
+        
+        Args:
+            key: Hashable key identifying the work (e.g. a canonical username)
+            function: Callable without arguments returning an awaitable
+        
+        Returns: The result of the (possibly shared) call
+        """
+        # asyncio is only loaded by the --async code paths
+        import asyncio
+        with self._lock:
+            self.stats['calls'] += 1
+            future = self._async_calls.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+            else:
+                future = self._async_calls[key] = asyncio.ensure_future(function())
+                future.add_done_callback(lambda done: self._forget_async(key, done))
+        
+        # shield() keeps a cancelled waiter from cancelling the shared call
+        return await asyncio.shield(future)
+    
+    def _forget_async(self, key, future):
+        """Drop a finished async call if it is still the one registered for key."""
+        with self._lock:
+            if self._async_calls.get(key) is future:
+                del self._async_calls[key]
@@ -10,17 +10,123 @@ import unittest
 import json
 import sys
 import os
+import subprocess
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Add the current directory to the path so we can import place_data_parser
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Add the src directory to the path so the test also runs as a plain script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from place_data_parser import (
+from instagram_place_parser.place_data_parser import (
+    classify_links,
     extract_wolt_url,
     extract_google_maps,
     extract_website_url,
     extract_telegram_link,
-    extract_address_text
+    extract_address_text,
+    parse_profile_data,
+    prune_profile_data
 )
+from instagram_place_parser.profile_decoder import decode_profile_bytes
+from instrumentation.metrics import MetricsRegistry
+from instagram_place_parser.address_engine import bio_address, caption_address
+from instagram_place_parser.url_rules import UrlRules, get_default_rules
+from instagram_place_parser.place_fetcher import InstagramFetcher
+from instagram_place_parser.retry_policy import (
+    OUTCOME_AUTH,
+    OUTCOME_NETWORK,
+    OUTCOME_NOT_FOUND,
+    OUTCOME_SERVER,
+    OUTCOME_THROTTLED,
+    CircuitBreaker,
+    RetryPolicy,
+    parse_retry_after,
+)
+from token_extractors.token_cache import TokenCache
+from instagram_place_parser.async_place_fetcher import AsyncInstagramFetcher, aiohttp
+from instagram_place_parser import response_cache
+from instagram_place_parser.response_cache import ProfileResponseCache
+from instagram_place_parser.rate_limiter import AdaptiveController, TokenBucket
+from instagram_place_parser.session_pool import SessionPool, load_token_file
+from instagram_place_parser.single_flight import SingleFlight
+
+
+def profile_response(username):
+    """A web_profile_info response body for a username."""
+    return {"data": {"user": {"username": username, "full_name": username.title(), "biography": "",
+                              "external_url": None, "bio_links": []}}, "status": "ok"}
+
+
+class FakeInstagram:
+    """
+    Local HTTP/1.1 server standing in for the web_profile_info endpoint.
+    
+    Answers with the queued (status, body, headers) responses in order, then with
+    the profile of the requested username. Records the requests and counts TCP connections.
+    """
+    
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def setup(self):
+                super().setup()
+                with fake.lock:
+                    fake.connections += 1
+            
+            def do_GET(self):
+                username = self.path.rpartition("username=")[2]
+                with fake.lock:
+                    fake.requests.append((username, dict(self.headers)))
+                    status, body, headers = fake.responses.pop(0) if fake.responses else (200, profile_response(username), {})
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    """Monotonic clock that only moves when advanced."""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+def fake_fetcher(fake, **kwargs):
+    """An InstagramFetcher sending requests to a FakeInstagram with fixed tokens and its own circuit breaker."""
+    kwargs.setdefault("circuit_breaker", CircuitBreaker())
+    kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.01))
+    return InstagramFetcher(base_url=fake.url, csrftoken="csrf", sessionid="session", **kwargs)
 
 
 class TestInstagramProfiles(unittest.TestCase):
@@ -242,7 +348,883 @@ class TestInstagramProfiles(unittest.TestCase):
         self.assertIsNone(website_url, "Empty case should return None for website URL")
         self.assertIsNone(telegram_link, "Empty case should return None for Telegram link")
         self.assertIsNone(address_text, "Empty case should return None for address text")
+    
+    def test_pruned_profile(self):
+        """Test that pruning and the response decoder keep everything the parser reads."""
+        # Profile with post captions and fields the parser never reads
+        post = {
+            "node": {
+                "display_url": "https://scontent.cdninstagram.com/v/photo.jpg",
+                "edge_liked_by": {"count": 120},
+                "accessibility_caption": "Photo by Krafter bar",
+                "edge_media_to_caption": {
+                    "edges": [{"node": {"text": "📍 bar Krafter Zeleni Venac\nBelgrade, Serbia"}}]
+                }
+            }
+        }
+        profile_data = {
+            "data": {
+                "user": {
+                    "username": "krafter.bar",
+                    "full_name": "Krafter",
+                    "biography": "Craft beer bar",
+                    "external_url": "https://wolt.com/en/srb/belgrade/venue/krafter",
+                    "bio_links": [],
+                    "business_address_json": None,
+                    "edge_followed_by": {"count": 5400},
+                    "edge_related_profiles": {"edges": [{"node": {"username": "other.bar"}}]},
+                    "edge_owner_to_timeline_media": {"count": 300, "edges": [post] * 12}
+                }
+            },
+            "status": "ok"
+        }
+        
+        # Prune the decoded profile and decode the encoded response
+        pruned = prune_profile_data(profile_data)
+        decoded = decode_profile_bytes(json.dumps(profile_data).encode('utf-8'))
+        
+        # Assert expected outputs
+        user = pruned["data"]["user"]
+        self.assertNotIn("edge_followed_by", user, "Unused counters should be dropped")
+        self.assertNotIn("edge_related_profiles", user, "Related profiles should be dropped")
+        self.assertEqual(len(user["edge_owner_to_timeline_media"]["edges"]), 10, "Only the first 10 posts should be kept")
+        self.assertEqual(set(user["edge_owner_to_timeline_media"]["edges"][0]["node"]),
+                         {"accessibility_caption", "edge_media_to_caption"}, "Only captions should be kept from posts")
+        self.assertEqual(decoded, pruned, "Decoding a response should prune it")
+        self.assertEqual(parse_profile_data(pruned), parse_profile_data(profile_data),
+                         "Pruned profile should parse to the same place data")
+    
+    def test_delivery_and_booking_links_profile(self):
+        """Test that every link type of url_rules.json gets its own field."""
+        # Profile with links of the newer categories and mixed-case hosts
+        profile_data = {
+            "data": {
+                "user": {
+                    "biography": "Georgian cuisine",
+                    "external_url": "https://www.TripAdvisor.com/Restaurant_Review-g294472-Tbilisi",
+                    "bio_links": [
+                        {"url": "https://glovoapp.com/rs/en/belgrade/tbilisi-bgd/", "title": "Glovo"},
+                        {"url": "https://WOLT.com/en/srb/belgrade/restaurant/tbilisi", "title": "Wolt"},
+                        {"url": "https://www.thefork.com/restaurant/tbilisi-r12345", "title": "Book a table"},
+                        {"url": "https://www.google.com/maps/place/Tbilisi", "title": "Map"},
+                        {"url": "https://tbilisi.rs/", "title": "Site"}
+                    ],
+                    "business_address_json": None
+                }
+            }
+        }
+        
+        # Extract all data
+        parsed = parse_profile_data(profile_data)
+        
+        # Assert expected outputs
+        self.assertEqual(parsed["tripadvisor_url"], "https://www.TripAdvisor.com/Restaurant_Review-g294472-Tbilisi", "Should have TripAdvisor URL")
+        self.assertEqual(parsed["glovo_url"], "https://glovoapp.com/rs/en/belgrade/tbilisi-bgd/", "Should have Glovo URL")
+        self.assertEqual(parsed["wolt_url"], "https://WOLT.com/en/srb/belgrade/restaurant/tbilisi", "Hosts should match case-insensitively")
+        self.assertEqual(parsed["booking_url"], "https://www.thefork.com/restaurant/tbilisi-r12345", "Should have booking URL")
+        self.assertEqual(parsed["google_maps"], "https://www.google.com/maps/place/Tbilisi", "Should have Google Maps URL")
+        self.assertEqual(parsed["website_url"], "https://tbilisi.rs/", "Only unmatched links should be the website")
+        self.assertIsNone(parsed["telegram_link"], "Should not have Telegram link")
+
+    
+    def test_metrics_exposition(self):
+        """Test that counters and histograms render in the Prometheus text format."""
+        registry = MetricsRegistry()
+        fetches = registry.counter("test_fetches_total", "Fetches by status", ("status",))
+        latency = registry.histogram("test_fetch_seconds", "Fetch latency", buckets=(0.1, 1.0))
+        
+        # Record samples
+        fetches.inc(status=200)
+        fetches.inc(status=200)
+        fetches.inc(status="error")
+        for seconds in (0.05, 0.5, 3.0):
+            latency.observe(seconds)
+        lines = registry.render().splitlines()
+        
+        # Assert expected outputs
+        self.assertIs(registry.counter("test_fetches_total", "Fetches by status", ("status",)), fetches,
+                      "Registering a name again should return the existing metric")
+        self.assertIn("# TYPE test_fetches_total counter", lines)
+        self.assertIn('test_fetches_total{status="200"} 2', lines)
+        self.assertIn('test_fetches_total{status="error"} 1', lines)
+        self.assertIn('test_fetch_seconds_bucket{le="0.1"} 1', lines, "Buckets should be cumulative")
+        self.assertIn('test_fetch_seconds_bucket{le="1"} 2', lines, "Buckets should be cumulative")
+        self.assertIn('test_fetch_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("test_fetch_seconds_sum 3.55", lines)
+        self.assertIn("test_fetch_seconds_count 3", lines)
+        with self.assertRaises(ValueError):
+            fetches.inc(code=200)
+    
+    def test_cli_startup_imports(self):
+        """Test that importing the make_place CLI does not load network, browser or asyncio modules."""
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        heavy = ["requests", "sqlite3", "asyncio", "aiohttp", "http.server"]
+        code = f"import sys, make_place.make_place; print([m for m in {heavy!r} if m in sys.modules])"
+        
+        # Import in a fresh interpreter
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=src_dir), check=True)
+        
+        # Assert expected outputs
+        self.assertEqual(result.stdout.strip(), "[]", "Heavy modules should only be imported when used")
+
+
+
+class TestAddressEngine(unittest.TestCase):
+    """Test cases for the linear-time address matchers."""
+    
+    def test_address_patterns(self):
+        """Test that bios and captions match the preferred address pattern."""
+        # Assert expected outputs
+        self.assertEqual(bio_address("Cool bar, Belgrade, Serbia 11000"), "Cool bar, Belgrade, Serbia 11000",
+                         "Bar address with postcode should be preferred")
+        self.assertEqual(bio_address("Kafana, Belgrade"), "Kafana, Belgrade")
+        self.assertIsNone(bio_address("No address here"), "Bio without a comma should not match")
+        self.assertEqual(caption_address("Come over!\n📍 bar Boyar\nBelgrade, Serbia"), "📍 bar Boyar\nBelgrade, Serbia",
+                         "Pinned caption address should span both lines")
+        self.assertEqual(caption_address("Party at bar Boyar, Belgrade, Serbia"), "bar Boyar, Belgrade, Serbia")
+    
+    def test_adversarial_address_input(self):
+        """Test that inputs making the old regexes backtrack are matched quickly."""
+        bio = " " * 20000 + " bar,"
+        caption = "bar" + " " * 20000 + ","
+        
+        # Match inputs that took the old patterns minutes
+        start = time.perf_counter()
+        bio_result = bio_address(bio)
+        caption_result = caption_address(caption)
+        elapsed = time.perf_counter() - start
+        
+        # Assert expected outputs
+        self.assertIsNone(bio_result)
+        self.assertIsNone(caption_result)
+        self.assertLess(elapsed, 0.5, "Address matching should stay linear in the text length")
+
+
+class TestUrlRules(unittest.TestCase):
+    """Test cases for the url_rules.json link classifier."""
+    
+    def test_classify_known_hosts(self):
+        """Test that remembered hosts classify the same as freshly parsed ones."""
+        rules = UrlRules([('wolt_url', ['wolt.com']), ('google_maps', ['maps.app.goo.gl', 'google.com/maps'])],
+                         'website_url')
+        urls = {
+            'https://wolt.com/en/srb': 'wolt_url',
+            'https://www.wolt.com/x': 'wolt_url',
+            'https://WOLT.com/x': 'wolt_url',
+            'https://user@wolt.com:443/x': 'wolt_url',
+            '  wolt.com/x': 'wolt_url',
+            'https://maps.app.goo.gl/6MAJ': 'google_maps',
+            'https://www.google.com/maps/place/x': 'google_maps',
+            'https://www.google.com/search?q=x': 'website_url',
+            'https://notwolt.com/x': 'website_url',
+            'https://': None,
+            'https://wolt.comm': 'website_url',
+            'http://wolt.com': 'wolt_url',
+        }
+        
+        # Classify every link twice: the second pass hits the remembered hosts
+        first = {url: rules.classify(url) for url in urls}
+        second = {url: rules.classify(url) for url in urls}
+        
+        # Assert expected outputs
+        self.assertEqual(first, urls)
+        self.assertEqual(second, urls, "Remembered hosts should not change the result")
+        self.assertEqual(rules.classify_first(list(urls)),
+                         {'wolt_url': 'https://wolt.com/en/srb', 'google_maps': 'https://maps.app.goo.gl/6MAJ',
+                          'website_url': 'https://www.google.com/search?q=x'},
+                         "The first link of each field should win")
+    
+    def test_validate_unknown_field(self):
+        """Test that a category without a place field fails loudly."""
+        rules = UrlRules([('wolt_url', ['wolt.com']), ('deliveroo_url', ['deliveroo.com'])], 'website_url')
+        
+        # Assert expected outputs
+        with self.assertRaises(ValueError) as raised:
+            rules.validate({'wolt_url', 'website_url'})
+        self.assertIn('deliveroo_url', str(raised.exception))
+        rules.validate({'wolt_url', 'deliveroo_url', 'website_url'})
+        self.assertIn('website_url', get_default_rules().fields, "The fallback should be one of the fields")
+    
+    def test_classify_links(self):
+        """Test that external_url is checked before bio_links and the first link of each field wins."""
+        user = {
+            'external_url': 'https://wolt.com/en/srb/belgrade/venue/boyar',
+            'bio_links': [
+                {'url': 'https://wolt.com/en/srb/belgrade/venue/other'},
+                {'url': None},
+                {'url': 'https://t.me/boyar_rs'},
+                {'url': 'https://boyar.rs'},
+                {'url': 'https://www.tripadvisor.de/Restaurant_Review'},
+                {'url': 'https://linktr.ee/boyar'},
+            ],
+        }
+        
+        # Classify the links of a profile
+        links = classify_links(user)
+        
+        # Assert expected outputs
+        self.assertEqual(set(links), set(get_default_rules().fields), "Every field should have an entry")
+        self.assertEqual(links['wolt_url'], 'https://wolt.com/en/srb/belgrade/venue/boyar', "external_url should win")
+        self.assertEqual(links['telegram_link'], 'https://t.me/boyar_rs')
+        self.assertEqual(links['website_url'], 'https://boyar.rs', "First unmatched link should be the website")
+        self.assertEqual(links['tripadvisor_url'], 'https://www.tripadvisor.de/Restaurant_Review')
+        self.assertIsNone(links['google_maps'])
+        self.assertIsNone(links['booking_url'])
+    
+    def test_classify_links_without_links(self):
+        """Test that a profile without links gets an empty entry for every field."""
+        # Classify profiles without links
+        results = [classify_links({}), classify_links({'external_url': None, 'bio_links': None})]
+        
+        # Assert expected outputs
+        for links in results:
+            self.assertTrue(all(value is None for value in links.values()), "No field should have a link")
+            self.assertIn('wolt_url', links)
+
+
+class TestConnectionPooling(unittest.TestCase):
+    """Test cases for the pooled keep-alive session of InstagramFetcher."""
+    
+    def setUp(self):
+        self.fake = FakeInstagram()
+    
+    def tearDown(self):
+        self.fake.close()
+    
+    def test_fetches_share_one_connection(self):
+        """Test that sequential fetches reuse one keep-alive connection with the prebuilt headers."""
+        fetcher = fake_fetcher(self.fake)
+        
+        # Fetch three profiles one after another
+        profiles = [fetcher.fetch_profile(username) for username in ("boyar.rs", "pelmeni", "kafana")]
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertEqual([profile["data"]["user"]["username"] for profile in profiles], ["boyar.rs", "pelmeni", "kafana"])
+        self.assertEqual(self.fake.connections, 1, "Fetches should reuse the pooled connection")
+        username, headers = self.fake.requests[0]
+        self.assertEqual(headers["x-csrftoken"], "csrf")
+        self.assertEqual(headers["Cookie"], "csrftoken=csrf; sessionid=session")
+        self.assertEqual(headers["Referer"], "https://www.instagram.com/boyar.rs/")
+        self.assertEqual(headers["x-ig-app-id"], "936619743392459")
+    
+    def test_auth_failure_switches_to_browser_tokens(self):
+        """Test that a 401 refreshes the token cache once and retries with the fresh tokens."""
+        self.fake.responses.append((401, {"message": "login required"}, {}))
+        reads = []
+        token_cache = TokenCache(path=None, extractor=lambda: reads.append(1) or {"csrftoken": "fresh", "sessionid": "browser"})
+        fetcher = fake_fetcher(self.fake, token_cache=token_cache)
+        
+        # Fetch two profiles, the first answered with a 401
+        first = fetcher.fetch_profile("boyar.rs")
+        second = fetcher.fetch_profile("pelmeni")
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertNotIn("error", first, "The retry with fresh tokens should succeed")
+        self.assertNotIn("error", second)
+        self.assertEqual(len(reads), 1, "The browser should be read once")
+        cookies = [headers["Cookie"] for username, headers in self.fake.requests]
+        self.assertEqual(cookies, ["csrftoken=csrf; sessionid=session",
+                                   "csrftoken=fresh; sessionid=browser",
+                                   "csrftoken=fresh; sessionid=browser"])
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncFetcher(unittest.TestCase):
+    """Test cases for AsyncInstagramFetcher."""
+    
+    def setUp(self):
+        self.fake = FakeInstagram()
+    
+    def tearDown(self):
+        self.fake.close()
+    
+    def fetch_profiles(self, usernames, **kwargs):
+        """Fetch profiles from the fake server with fixed tokens and a fresh circuit breaker."""
+        kwargs.setdefault("circuit_breaker", CircuitBreaker())
+        kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.01))
+        
+        async def run():
+            async with AsyncInstagramFetcher(base_url=self.fake.url, csrftoken="csrf", sessionid="session", **kwargs) as fetcher:
+                return await fetcher.fetch_profiles(usernames)
+        return asyncio.run(run())
+    
+    def test_fetch_profiles(self):
+        """Test that many profiles are fetched over at most max_connections connections."""
+        usernames = [f"place_{i}" for i in range(12)]
+        
+        # Fetch twelve profiles with two connections
+        results = self.fetch_profiles(usernames, max_connections=2)
+        
+        # Assert expected outputs
+        self.assertEqual(sorted(results), sorted(usernames))
+        for username, data in results.items():
+            self.assertEqual(data["data"]["user"]["username"], username)
+        self.assertLessEqual(self.fake.connections, 2, "Connections should be capped and reused")
+        username, headers = self.fake.requests[0]
+        self.assertEqual(headers["Cookie"], "csrftoken=csrf; sessionid=session")
+        self.assertEqual(headers["Referer"], f"https://www.instagram.com/{username}/")
+    
+    def test_duplicate_usernames_share_request(self):
+        """Test that concurrent fetches of the same canonical username send one request."""
+        # Fetch the same profile under three spellings
+        results = self.fetch_profiles(["Boyar.RS", "@boyar.rs", "boyar.rs"])
+        
+        # Assert expected outputs
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(self.fake.requests), 1, "Duplicates should be coalesced")
+    
+    def test_errors(self):
+        """Test that error statuses and invalid usernames become error dicts."""
+        self.fake.responses.append((404, {}, {}))
+        
+        # Fetch a missing profile and an invalid username
+        results = self.fetch_profiles(["missing", "not..valid"])
+        
+        # Assert expected outputs
+        self.assertEqual(results["missing"], {"error": "Profile not found (404)"})
+        self.assertIn("error", results["not..valid"])
+        self.assertEqual(len(self.fake.requests), 1, "Invalid usernames should not be requested")
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ProfileResponseCache."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ProfileResponseCache(cache_dir=self.temp_dir.name)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_put_and_get(self):
+        """Test that stored responses are found under any case of the username."""
+        # Look up a profile before and after storing it
+        before = self.cache.get("boyar.rs")
+        self.cache.put("boyar.rs", profile_response("boyar.rs"))
+        after = self.cache.get("Boyar.RS")
+        
+        # Assert expected outputs
+        self.assertIsNone(before)
+        self.assertEqual(after, profile_response("boyar.rs"))
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["stores"], 1)
+    
+    def test_field_set_change_misses(self):
+        """Test that entries pruned with another field set are not read back."""
+        self.cache.put("boyar.rs", profile_response("boyar.rs"))
+        self.addCleanup(setattr, response_cache, "FIELDS_VERSION", response_cache.FIELDS_VERSION)
+        
+        # Look up the profile after the parser starts reading other fields
+        response_cache.FIELDS_VERSION = "other-fields"
+        result = self.cache.get("boyar.rs")
+        
+        # Assert expected outputs
+        self.assertIsNone(result, "An entry of another field set should be a miss")
+        self.assertEqual(self.cache.stats["misses"], 1)
+    
+    def test_expired_entry(self):
+        """Test that entries older than max_age are ignored."""
+        self.cache.put("boyar.rs", profile_response("boyar.rs"))
+        path = self.cache._path("boyar.rs")
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        entry["fetched_at"] = time.time() - self.cache.max_age - 60
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        
+        # Look up the expired entry
+        result = self.cache.get("boyar.rs")
+        
+        # Assert expected outputs
+        self.assertIsNone(result, "Expired entry should be a miss")
+        self.assertEqual(self.cache.stats["misses"], 1)
+    
+    def test_eviction_removes_oldest(self):
+        """Test that the oldest entries are evicted once the cache is over max_bytes."""
+        self.cache.put("oldest", profile_response("oldest"))
+        self.cache.put("middle", profile_response("middle"))
+        entry_size = os.path.getsize(self.cache._path("oldest"))
+        self.cache.max_bytes = int(entry_size * 2.5)
+        os.utime(self.cache._path("oldest"), (1000, 1000))
+        os.utime(self.cache._path("middle"), (2000, 2000))
+        
+        # Store a third entry, pushing the cache over max_bytes
+        self.cache.put("newest", profile_response("newest"))
+        
+        # Assert expected outputs
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertIsNone(self.cache.get("oldest"), "Oldest entry should be evicted")
+        self.assertIsNotNone(self.cache.get("middle"))
+        self.assertIsNotNone(self.cache.get("newest"))
+    
+    def test_fetcher_uses_cache(self):
+        """Test that the fetcher serves cached profiles without a request and does not cache errors."""
+        fake = FakeInstagram([(404, {}, {})])
+        self.addCleanup(fake.close)
+        fetcher = fake_fetcher(fake, response_cache=self.cache)
+        
+        # Fetch a missing profile and another profile twice each
+        missing = [fetcher.fetch_profile("missing") for _ in range(2)]
+        found = [fetcher.fetch_profile("boyar.rs") for _ in range(2)]
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertEqual(missing[0], {"error": "Profile not found (404)"})
+        self.assertNotIn("error", missing[1], "The 404 should not be cached")
+        self.assertEqual(found[0], found[1])
+        self.assertEqual([username for username, headers in fake.requests], ["missing", "missing", "boyar.rs"])
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for TokenBucket and the AIMD AdaptiveController."""
+    
+    def setUp(self):
+        self.clock = FakeClock()
+    
+    def test_token_bucket(self):
+        """Test that the bucket allows a burst and then spaces requests at the rate."""
+        bucket = TokenBucket(rate=2.0, burst=2, clock=self.clock)
+        
+        # Reserve four slots at once, then one more after a second
+        delays = [bucket.reserve() for _ in range(4)]
+        self.clock.advance(1.0)
+        later = bucket.reserve()
+        
+        # Assert expected outputs
+        self.assertEqual(delays, [0.0, 0.0, 0.5, 1.0])
+        self.assertEqual(later, 0.5, "One second should refill two tokens of the debt")
+    
+    def test_token_bucket_set_rate(self):
+        """Test that a rate change keeps the tokens accumulated at the old rate."""
+        bucket = TokenBucket(rate=1.0, clock=self.clock)
+        bucket.reserve()
+        self.clock.advance(0.5)
+        
+        # Double the rate halfway through the refill
+        bucket.set_rate(2.0)
+        self.clock.advance(0.25)
+        delay = bucket.reserve()
+        
+        # Assert expected outputs
+        self.assertEqual(delay, 0.0, "0.5s at 1/s plus 0.25s at 2/s should refill one token")
+    
+    def test_additive_increase(self):
+        """Test that rate and concurrency grow after enough fast healthy responses."""
+        rates = []
+        controller = AdaptiveController(rate=5.0, concurrency=4, increase_every=3, latency_target=1.0,
+                                        on_rate_change=rates.append, clock=self.clock)
+        
+        # Record six fast responses
+        for _ in range(6):
+            controller.record(200, 0.1)
+        state = controller.snapshot()
+        
+        # Assert expected outputs
+        self.assertEqual(state["rate"], 7.0)
+        self.assertEqual(state["concurrency"], 6)
+        self.assertEqual(state["increases"], 2)
+        self.assertEqual(state["peak_rate"], 7.0)
+        self.assertEqual(rates, [6.0, 7.0])
+    
+    def test_slow_responses_do_not_increase(self):
+        """Test that the controller stops increasing when latency is above the target."""
+        controller = AdaptiveController(rate=5.0, increase_every=2, latency_target=1.0, clock=self.clock)
+        
+        # Record slow healthy responses
+        for _ in range(4):
+            controller.record(200, 2.0)
+        
+        # Assert expected outputs
+        self.assertEqual(controller.rate, 5.0)
+        self.assertEqual(controller.snapshot()["increases"], 0)
+    
+    def test_multiplicative_decrease(self):
+        """Test that failures halve rate and concurrency at most once per backoff interval."""
+        controller = AdaptiveController(rate=8.0, concurrency=8, min_rate=1.5, backoff_interval=1.0, clock=self.clock)
+        
+        # Record a burst of failures, then another failure after the backoff interval
+        controller.record(429, 0.1)
+        controller.record(503, 0.1)
+        controller.record(None, 0.1)
+        after_burst = controller.snapshot()
+        for _ in range(2):
+            self.clock.advance(1.0)
+            controller.record(429, 0.1)
+        
+        # Assert expected outputs
+        self.assertEqual((after_burst["rate"], after_burst["concurrency"]), (4.0, 4), "A burst should count once")
+        self.assertEqual((after_burst["throttled"], after_burst["server_errors"], after_burst["network_errors"]), (1, 1, 1))
+        self.assertEqual(controller.rate, 1.5, "Rate should stop at min_rate")
+        self.assertEqual(controller.concurrency, 1)
+        self.assertEqual(controller.snapshot()["decreases"], 3)
+    
+    def test_concurrency_slots(self):
+        """Test that slot() admits at most `concurrency` requests at a time."""
+        controller = AdaptiveController(concurrency=1, clock=self.clock)
+        entered = threading.Event()
+        
+        def second_request():
+            with controller.slot():
+                entered.set()
+        
+        # Hold the only slot while a second thread asks for one
+        with controller.slot():
+            thread = threading.Thread(target=second_request)
+            thread.start()
+            blocked = not entered.wait(0.2)
+            in_flight = controller.snapshot()["in_flight"]
+        thread.join()
+        
+        # Assert expected outputs
+        self.assertTrue(blocked, "Second request should wait for the slot")
+        self.assertEqual(in_flight, 1)
+        self.assertTrue(entered.is_set())
+        self.assertEqual(controller.snapshot()["in_flight"], 0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for RetryPolicy and the fetcher retries."""
+    
+    def test_should_retry(self):
+        """Test that only transient outcomes are retried, up to max_attempts."""
+        policy = RetryPolicy(max_attempts=3)
+        
+        # Assert expected outputs
+        for outcome in (OUTCOME_NETWORK, OUTCOME_THROTTLED, OUTCOME_SERVER):
+            self.assertTrue(policy.should_retry(outcome, 0), f"{outcome} should be retried")
+            self.assertTrue(policy.should_retry(outcome, 1))
+            self.assertFalse(policy.should_retry(outcome, 2), "The third attempt should be the last")
+        self.assertFalse(policy.should_retry(OUTCOME_NOT_FOUND, 0))
+        self.assertFalse(policy.should_retry(OUTCOME_AUTH, 0))
+    
+    def test_delay_bounds(self):
+        """Test that the jittered backoff stays under the exponential ceiling and honours Retry-After."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        
+        # Sample delays for several attempts
+        for attempt, ceiling in ((0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)):
+            delays = [policy.delay(attempt) for _ in range(200)]
+            
+            # Assert expected outputs
+            self.assertTrue(all(0 <= delay <= ceiling for delay in delays), f"Attempt {attempt} should wait at most {ceiling}s")
+        self.assertGreaterEqual(policy.delay(0, retry_after=3.0), 3.0, "Retry-After should be a lower bound")
+        self.assertLessEqual(policy.delay(0, retry_after=60.0), 5.0, "Retry-After should be capped at max_delay")
+    
+    def test_parse_retry_after(self):
+        """Test parsing of Retry-After header values."""
+        # Assert expected outputs
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertEqual(parse_retry_after("-3"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2026 07:28:00 GMT"))
+    
+    def test_fetcher_retries_transient_failures(self):
+        """Test that 5xx and 429 responses are retried and 404s are not."""
+        fake = FakeInstagram([(404, {}, {}), (503, {}, {}), (429, {}, {"Retry-After": "0"})])
+        self.addCleanup(fake.close)
+        breaker = CircuitBreaker()
+        fetcher = fake_fetcher(fake, circuit_breaker=breaker, retry_policy=RetryPolicy(base_delay=0.01))
+        
+        # Fetch a missing profile, then one through two transient failures
+        missing = fetcher.fetch_profile("missing")
+        found = fetcher.fetch_profile("boyar.rs")
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertEqual(missing, {"error": "Profile not found (404)"})
+        self.assertEqual(found["data"]["user"]["username"], "boyar.rs")
+        self.assertEqual([username for username, headers in fake.requests], ["missing"] + ["boyar.rs"] * 3)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_fetcher_gives_up(self):
+        """Test that the fetcher reports the last failure after max_attempts."""
+        fake = FakeInstagram([(500, {}, {})] * 3)
+        self.addCleanup(fake.close)
+        fetcher = fake_fetcher(fake, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+        
+        # Fetch a profile that keeps failing
+        result = fetcher.fetch_profile("boyar.rs")
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertEqual(result, {"error": "API request failed: 500"})
+        self.assertEqual(len(fake.requests), 2)
+
 
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker."""
+    
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0, clock=self.clock)
+    
+    def test_opens_after_consecutive_auth_failures(self):
+        """Test that the circuit opens after failure_threshold consecutive auth failures only."""
+        # A success resets the count, then two failures in a row open the circuit
+        self.breaker.record_auth_failure()
+        self.breaker.record_success()
+        self.breaker.record_auth_failure()
+        still_closed = self.breaker.state
+        self.breaker.record_auth_failure()
+        error = self.breaker.before_request()
+        
+        # Assert expected outputs
+        self.assertEqual(still_closed, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertIn("retrying in 60s", error)
+        self.assertEqual(self.breaker.stats, {"opened": 1, "rejected": 1})
+    
+    def test_half_open_probe(self):
+        """Test that one probe is let through after reset_timeout and its outcome decides the state."""
+        self.breaker.record_auth_failure()
+        self.breaker.record_auth_failure()
+        
+        # Wait out the timeout and send a probe plus a concurrent request
+        self.clock.advance(59.0)
+        early = self.breaker.before_request()
+        self.clock.advance(1.0)
+        probe = self.breaker.before_request()
+        concurrent = self.breaker.before_request()
+        self.breaker.record_success()
+        
+        # Assert expected outputs
+        self.assertIsNotNone(early, "Requests should be rejected before reset_timeout")
+        self.assertIsNone(probe, "One probe should be let through")
+        self.assertIsNotNone(concurrent, "Only one probe may be in flight")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertIsNone(self.breaker.before_request())
+    
+    def test_failed_probe_reopens(self):
+        """Test that a failed probe opens the circuit for another reset_timeout."""
+        self.breaker.record_auth_failure()
+        self.breaker.record_auth_failure()
+        self.clock.advance(60.0)
+        
+        # Let a probe fail with a network error, then with an auth failure
+        first_probe = self.breaker.before_request()
+        self.breaker.record_other()
+        second_probe = self.breaker.before_request()
+        self.breaker.record_auth_failure()
+        
+        # Assert expected outputs
+        self.assertIsNone(first_probe)
+        self.assertIsNone(second_probe, "A probe without an auth outcome should free the probe slot")
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.stats["opened"], 2)
+        self.assertIn("retrying in 60s", self.breaker.before_request())
+
+
+def pool_accounts(*names):
+    """(name, tokens) tuples with tokens derived from each name."""
+    return [(name, {"csrftoken": f"csrf_{name}", "sessionid": f"session_{name}"}) for name in names]
+
+
+class TestSessionPool(unittest.TestCase):
+    """Test cases for SessionPool."""
+    
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = SessionPool(pool_accounts("a", "b", "c"), rate=1000.0, cooldown=10.0, max_cooldown=25.0, clock=self.clock)
+    
+    def test_round_robin(self):
+        """Test that requests rotate over the accounts."""
+        # Acquire six request slots
+        names = [self.pool.acquire().name for _ in range(6)]
+        
+        # Assert expected outputs
+        self.assertEqual(names, ["a", "b", "c", "a", "b", "c"])
+        self.assertEqual([state["requests"] for state in self.pool.snapshot()], [2, 2, 2])
+    
+    def test_throttled_account_cools_down(self):
+        """Test that a 429 rests the account with a cooldown that doubles up to max_cooldown."""
+        first = self.pool.acquire()
+        self.pool.record(first, 429)
+        
+        # Acquire while the account rests, then after the cooldown
+        resting = [self.pool.acquire().name for _ in range(2)]
+        cooling = self.pool.snapshot()[0]["cooling"]
+        self.clock.advance(10.0)
+        recovered = self.pool.acquire().name
+        self.pool.record(first, 429)
+        second_cooldown = first.cooldown_until - self.clock.now
+        self.pool.record(first, 429)
+        third_cooldown = first.cooldown_until - self.clock.now
+        
+        # Assert expected outputs
+        self.assertEqual(resting, ["b", "c"])
+        self.assertTrue(cooling)
+        self.assertEqual(recovered, "a")
+        self.assertEqual(second_cooldown, 20.0, "Consecutive 429s should double the cooldown")
+        self.assertEqual(third_cooldown, 25.0, "Cooldown should be capped at max_cooldown")
+    
+    def test_all_accounts_cooling(self):
+        """Test that the account recovering first is used when every account is cooling down."""
+        for session, delay in zip(self.pool.sessions, (30.0, 10.0, 20.0)):
+            session.cooldown_until = self.clock.now + delay
+        
+        # Reserve a slot with every account cooling down
+        session, wait = self.pool._reserve()
+        
+        # Assert expected outputs
+        self.assertEqual(session.name, "b")
+        self.assertAlmostEqual(wait, 10.0, places=3)
+    
+    def test_logged_out_accounts_are_removed(self):
+        """Test that a 401 removes the account and an empty pool yields None."""
+        # Log out two accounts, then the last one
+        for session in self.pool.sessions[:2]:
+            self.pool.record(session, 401)
+        remaining = {self.pool.acquire().name for _ in range(3)}
+        self.pool.record(self.pool.sessions[2], 401)
+        
+        # Assert expected outputs
+        self.assertEqual(remaining, {"c"})
+        self.assertIsNone(self.pool.acquire())
+        self.assertEqual([state["alive"] for state in self.pool.snapshot()], [False, False, False])
+    
+    def test_set_rate(self):
+        """Test that set_rate changes the token bucket of every account."""
+        # Slow every account down
+        self.pool.set_rate(0.5)
+        
+        # Assert expected outputs
+        self.assertEqual([session.bucket.rate for session in self.pool.sessions], [0.5] * 3)
+    
+    def test_load_token_file(self):
+        """Test that placeholder token sets are skipped and duplicate accounts merged."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "tokens.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([
+                    {"csrftoken": "csrf1", "sessionid": "session1", "mid": "YOUR_MID"},
+                    {"csrftoken": "YOUR_CSRFTOKEN", "sessionid": "YOUR_SESSIONID"},
+                    {"csrftoken": "csrf2", "sessionid": "session1"},
+                ], f)
+            
+            # Load the token sets and build a pool from them
+            token_sets = load_token_file(path)
+            pool = SessionPool.from_sources(token_files=[path])
+        
+        # Assert expected outputs
+        self.assertEqual(token_sets, [{"csrftoken": "csrf1", "sessionid": "session1", "mid": None},
+                                      {"csrftoken": "csrf2", "sessionid": "session1", "mid": None}])
+        self.assertEqual(len(pool), 1, "Accounts should be deduplicated by sessionid")
+    
+    def test_fetcher_skips_logged_out_account(self):
+        """Test that the fetcher moves on to the next account after a 401."""
+        fake = FakeInstagram([(401, {}, {})])
+        self.addCleanup(fake.close)
+        fetcher = fake_fetcher(fake, session_pool=self.pool)
+        
+        # Fetch two profiles through the pool
+        first = fetcher.fetch_profile("boyar.rs")
+        second = fetcher.fetch_profile("pelmeni")
+        fetcher.close()
+        
+        # Assert expected outputs
+        self.assertNotIn("error", first)
+        self.assertNotIn("error", second)
+        cookies = [headers["Cookie"] for username, headers in fake.requests]
+        self.assertEqual(cookies, ["csrftoken=csrf_a; sessionid=session_a",
+                                   "csrftoken=csrf_b; sessionid=session_b",
+                                   "csrftoken=csrf_c; sessionid=session_c"])
+        self.assertFalse(self.pool.sessions[0].alive)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for SingleFlight."""
+    
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.release = threading.Event()
+        self.runs = []
+    
+    def work(self, result):
+        """Blocking work that records each run and waits for the test to release it."""
+        self.runs.append(result)
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def run_callers(self, result, count=4):
+        """Call do() for one key from several threads and return their results or exceptions."""
+        outcomes = []
+        
+        def caller():
+            try:
+                outcomes.append(self.flight.do("boyar.rs", lambda: self.work(result)))
+            except Exception as e:
+                outcomes.append(e)
+        threads = [threading.Thread(target=caller) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while self.flight.stats["coalesced"] < count - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+    
+    def test_concurrent_calls_share_result(self):
+        """Test that concurrent calls for one key run the work once and share its result."""
+        result = {"data": "profile"}
+        
+        # Call do() from four threads while the first call is in flight
+        outcomes = self.run_callers(result)
+        again = self.flight.do("boyar.rs", lambda: "fresh")
+        
+        # Assert expected outputs
+        self.assertEqual(len(self.runs), 1, "The work should run once")
+        self.assertTrue(all(outcome is result for outcome in outcomes))
+        self.assertEqual(self.flight.stats, {"calls": 5, "coalesced": 3})
+        self.assertEqual(again, "fresh", "A finished call should not be reused")
+    
+    def test_concurrent_calls_share_exception(self):
+        """Test that every waiting caller gets the exception of the shared call."""
+        error = ValueError("fetch failed")
+        
+        # Call do() from four threads with failing work
+        outcomes = self.run_callers(error)
+        
+        # Assert expected outputs
+        self.assertEqual(len(self.runs), 1)
+        self.assertEqual(len(outcomes), 4)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+        self.assertEqual(self.flight._calls, {}, "A failed call should be forgotten")
+    
+    def test_do_async(self):
+        """Test that coroutines share one call and a cancelled waiter does not cancel it."""
+        async def run():
+            release = asyncio.Event()
+            
+            async def work():
+                self.runs.append(1)
+                await release.wait()
+                return "profile"
+            
+            waiters = [asyncio.ensure_future(self.flight.do_async("boyar.rs", work)) for _ in range(3)]
+            await asyncio.sleep(0)
+            waiters[0].cancel()
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*waiters[1:])
+            return waiters[0].cancelled(), results
+        
+        # Run three coroutines for one key, cancelling the first
+        cancelled, results = asyncio.run(run())
+        
+        # Assert expected outputs
+        self.assertTrue(cancelled)
+        self.assertEqual(results, ["profile", "profile"])
+        self.assertEqual(len(self.runs), 1)
+        self.assertEqual(self.flight.stats, {"calls": 3, "coalesced": 2})
+        self.assertEqual(self.flight._async_calls, {}, "A finished call should be forgotten")
 
 if __name__ == '__main__':
     # Run the tests
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Data-driven classification of profile links.
+Maps every link to a place_data field with the rule table in url_rules.json:
+each URL is split once and its host looked up in a suffix-indexed map.
+The field of every plain host whose links do not depend on their path is
+remembered under its 'https://host/' prefix, so a link to a known host costs
+one find, one slice and one dict lookup.
+"""
+
+import json
+import os
+import re
+
+# Rule table shipped next to this module
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'url_rules.json')
+
+# Scheme and '//' (both optional), then the authority up to the path, query or fragment
+_AUTHORITY = re.compile(r'\s*(?:[^/?#]*//)?([^/?#]*)')
+
+# Characters of a host that needs no normalization (no credentials, port, uppercase or whitespace)
+_PLAIN_HOST_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789.-')
+
+# Hosts remembered per rule table before the memo is cleared
+_MAX_REMEMBERED_HOSTS = 4096
+
+# Schemes a remembered host is stored under
+_WEB_SCHEMES = ('https://', 'http://')
+
+# Marks a host that is not remembered yet
+_UNKNOWN = object()
+
+def _split_authority(url):
+    """
+    Find the host of a URL.
+    Returns: tuple - (lowercased host without credentials, port and trailing dot, index where the path starts)
+    """
+    match = _AUTHORITY.match(url)
+    host = match.group(1).lower()
+    if '@' in host:
+        host = host.rpartition('@')[2]
+    if ':' in host:
+        host = host.partition(':')[0]
+    return host.strip().rstrip('.'), match.end()
+
+def split_url(url):
+    """
+    Split a URL into its lowercased host and path.
+    Works without a scheme ('wolt.com/...') and drops credentials, port and a trailing dot.
+    Returns: tuple - (host, path); host is '' if the URL has none
+    """
+    host, path_start = _split_authority(url)
+    return host, url[path_start:].strip().lower()
+
+class UrlRules:
+    """
+    Rule table mapping link hosts (and optional path prefixes) to place_data fields.
+    
+    Rules are indexed by host, so classifying a link costs one dict lookup per
+    label of its host (www.google.com → www.google.com, google.com, com)
+    regardless of how many rules there are.
+    """
+    
+    def __init__(self, rules, fallback=None):
+        """
+        Args:
+            rules: List of (field, patterns) pairs; a pattern is a host optionally followed by a path prefix
+            fallback: Field for links with a host that no rule matches, or None to ignore them
+        """
+        self.fallback = fallback
+        self.fields = []
+        self._by_host = {}
+        # 'https://host/' and 'http://host/' -> field, for hosts whose links go to one field whatever their path
+        self._prefix_fields = {}
+        for field, patterns in rules:
+            if field not in self.fields:
+                self.fields.append(field)
+            for pattern in patterns:
+                host, path = split_url(pattern)
+                self._by_host.setdefault(host, []).append((path, field))
+        if fallback and fallback not in self.fields:
+            self.fields.append(fallback)
+        
+        # Longer path prefixes are more specific
+        for entries in self._by_host.values():
+            entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+        
+        # Copied for every classify_first call
+        self._no_links = dict.fromkeys(self.fields)
+    
+    @classmethod
+    def load(cls, path=DEFAULT_RULES_FILE):
+        """
+        Load a rule table from a JSON file like url_rules.json.
+        Returns: UrlRules - The rule table
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        return cls([(rule['field'], rule['match']) for rule in table['rules']], table.get('fallback'))
+    
+    def validate(self, known_fields):
+        """
+        Check that every field of the table exists where links are stored.
+        
+        Args:
+            known_fields: Names of the fields that can hold links (e.g. the PlaceData fields)
+        
+        Raises:
+            ValueError: If the table sends links to a field that does not exist
+        """
+        unknown = [field for field in self.fields if field not in known_fields]
+        if unknown:
+            raise ValueError(f"URL rules send links to unknown fields: {', '.join(unknown)} "
+                             f"(add them to PlaceData or fix url_rules.json)")
+    
+    def classify(self, url):
+        """
+        Get the field a link belongs to.
+        Returns: Optional[str] - Field name, the fallback for unmatched links, None for links without a host
+        """
+        # Fast path: the link up to the first '/' after 'https://' is looked up as is
+        # ('' without a path). Only plain hosts are remembered, so a key can only
+        # match a link whose host is exactly that host and a hit needs no normalization
+        field = self._prefix_fields.get(url[:url.find('/', 8) + 1], _UNKNOWN)
+        if field is not _UNKNOWN:
+            return field
+        
+        return self._classify_slow(url)
+    
+    def classify_first(self, urls):
+        """
+        Classify links in order, keeping the first link of each field.
+        Same as calling classify on every link, with the fast path inlined since
+        it runs for every link of every profile.
+        Args:
+            urls: Links to classify (empty ones are ignored)
+        Returns: dict - One entry per field of the rule table (None if no link went there)
+        """
+        links = self._no_links.copy()
+        prefix_fields = self._prefix_fields
+        for url in urls:
+            if not url:
+                continue
+            field = prefix_fields.get(url[:url.find('/', 8) + 1], _UNKNOWN)
+            if field is _UNKNOWN:
+                field = self._classify_slow(url)
+            if field is not None and links[field] is None:
+                links[field] = url
+        return links
+    
+    def _classify_slow(self, url):
+        """Classify a link after normalizing its host."""
+        host, path_start = _split_authority(url)
+        if not host:
+            return None
+        field = self._prefix_fields.get(f'https://{host}/', _UNKNOWN)
+        if field is not _UNKNOWN:
+            return field
+        return self._resolve(host, url, path_start)
+    
+    def _resolve(self, host, url, path_start):
+        """
+        Walk the suffixes of a host through the rule index, remembering hosts whose field does not depend on the path.
+        Returns: Optional[str] - Field name, or the fallback for unmatched links
+        """
+        # Most rules have no path prefix, so the path is only lowercased when one needs it
+        path = None
+        suffix = host
+        while True:
+            for prefix, field in self._by_host.get(suffix, ()):
+                if not prefix:
+                    break
+                if path is None:
+                    path = url[path_start:].strip().lower()
+                if path.startswith(prefix):
+                    return field
+            else:
+                dot = suffix.find('.')
+                if dot >= 0:
+                    suffix = suffix[dot + 1:]
+                    continue
+                field = self.fallback
+            
+            if path is None and host[-1] != '.' and _PLAIN_HOST_CHARS.issuperset(host):
+                # No path prefix was consulted: every link of this host goes to the same field
+                if len(self._prefix_fields) >= 2 * _MAX_REMEMBERED_HOSTS:
+                    self._prefix_fields.clear()
+                for scheme in _WEB_SCHEMES:
+                    self._prefix_fields[f'{scheme}{host}/'] = field
+            return field
+
+# Rule table loaded on first use
+_default_rules = None
+
+def get_default_rules():
+    """
+    Get the rule table loaded from url_rules.json.
+    Returns: UrlRules - The shared rule table
+    """
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = UrlRules.load()
+    return _default_rules
@@ -0,0 +1,3 @@
+"""
+Stage timings and Prometheus metrics shared by the parser, token and make_place packages.
+"""
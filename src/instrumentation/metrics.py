@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for long-running pipelines.
+Counters, gauges and histograms registered in a process-wide registry and
+rendered in the Prometheus text exposition format, either served on a local
+/metrics endpoint or periodically written to a file (e.g. for the node_exporter
+textfile collector).
+"""
+
+import bisect
+import os
+import threading
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names, values, extra=()):
+    """Format a label set as {name="value",...}, or '' if there are no labels."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    """Common part of all metric types: name, help text, label names and a lock."""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels):
+        """Get the label values of a sample in label name order."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def render(self):
+        """
+        Render the metric in the text exposition format.
+        Returns: list - Lines including # HELP and # TYPE
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+    
+    def inc(self, amount=1, **labels):
+        """Increase the count of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        """Get the count of a label set."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. a queue depth."""
+    
+    kind = 'gauge'
+    
+    def set(self, value, **labels):
+        """Set the value of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def dec(self, amount=1, **labels):
+        """Decrease the value of a label set."""
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count."""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+    
+    def observe(self, value, **labels):
+        """Record one observation for a label set."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per bucket (last one is +Inf), then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+    
+    def _samples(self):
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Named metrics of one process.
+    
+    Registering a name again returns the existing metric, so modules can
+    declare the metrics they update at import time. Safe to share between threads.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+    
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with another type or labels")
+            return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        """Get or register a Counter."""
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name, documentation, labelnames=()):
+        """Get or register a Gauge."""
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Get or register a Histogram."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+        Returns: str - Exposition text ending with a newline
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path):
+        """Write the rendered metrics to a file atomically, so readers never see a partial file."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+class MetricsFileWriter:
+    """Background thread rewriting a metrics file every few seconds until stopped."""
+    
+    def __init__(self, registry, path, interval=15.0):
+        """
+        Args:
+            registry: MetricsRegistry to write
+            path: Path of the metrics file, e.g. /var/lib/node_exporter/mapcreator.prom
+            interval: Seconds between rewrites
+        """
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+    
+    def _write(self):
+        try:
+            self.registry.write(self.path)
+        except OSError as e:
+            print(f"⚠️  Could not write metrics file {self.path}: {e}")
+    
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._write()
+    
+    def start(self):
+        """Write the file now and then every interval."""
+        self._write()
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop rewriting and write the final values."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._write()
+
+def serve_metrics(registry, host='127.0.0.1', port=9464):
+    """
+    Serve GET /metrics on a background thread.
+    
+    Args:
+        registry: MetricsRegistry to expose
+        host: Interface to listen on
+        port: TCP port to listen on (0 picks a free one)
+    
+    Returns: ThreadingHTTPServer - Call shutdown() to stop it
+    """
+    # Imported here: only runs exposing metrics need an HTTP server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            content = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would drown the pipeline output
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+# Process-wide registry shared by all modules
+_default_registry = MetricsRegistry()
+
+def get_default_metrics():
+    """
+    Get the process-wide MetricsRegistry.
+    Returns: MetricsRegistry
+    """
+    return _default_registry
+
+# Lookups of the on-disk caches by cache (e.g. 'response') and result (hit or miss);
+# shared by every cache so they report under one metric
+CACHE_REQUESTS = _default_registry.counter('mapcreator_cache_requests_total', 'Cache lookups by cache and result',
+                                           ('cache', 'result'))
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency instrumentation of the make_place hot path.
+Token extraction, the profile request, decoding, every parser extractor,
+populator and outputter time themselves into the process-wide StageTimings.
+It is disabled unless a run asks for timings, and then costs one attribute
+check per stage. Memory stays bounded in long-running services: every stage
+keeps exact counters plus a fixed-size sample for its percentiles.
+"""
+
+import contextvars
+import math
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+# Samples kept per stage for percentiles; count, total and max stay exact beyond it
+RESERVOIR_SIZE = 1024
+
+# Handles kept in the per-handle breakdown before the oldest is dropped
+DEFAULT_MAX_HANDLES = 10000
+
+# Handle the current thread (or task) is working on, for per-handle reports
+_current_handle = contextvars.ContextVar('timed_handle', default=None)
+
+# Shared no-op context manager returned while timings are disabled
+_NOT_TIMED = nullcontext()
+
+def summarize(durations):
+    """
+    Summarize a latency series.
+    
+    Args:
+        durations: Durations in seconds
+    
+    Returns: dict - count plus total, p50, p95 and max in milliseconds
+    """
+    series = _Series()
+    for seconds in durations:
+        series.add(seconds)
+    return series.summary()
+
+class _Series:
+    """
+    Running aggregate of one latency series.
+    
+    Count, total and max are exact. Percentiles come from a uniform sample of
+    at most RESERVOIR_SIZE durations (reservoir sampling), so they are exact
+    until the series grows past it.
+    """
+    
+    __slots__ = ('count', 'total', 'max', 'samples', 'draw')
+    
+    def __init__(self, draw=random.random):
+        """
+        Args:
+            draw: Function returning a float in [0, 1), used to pick the samples kept
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        self.draw = draw
+    
+    def add(self, seconds):
+        """Add one duration."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(seconds)
+        else:
+            # Every duration so far stays in the sample with the same probability
+            slot = int(self.draw() * self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = seconds
+    
+    def copy(self):
+        """Get an independent copy to summarize outside the lock."""
+        series = _Series(self.draw)
+        series.count, series.total, series.max = self.count, self.total, self.max
+        series.samples = list(self.samples)
+        return series
+    
+    def summary(self):
+        """
+        Summarize the series.
+        Returns: dict - count plus total, p50, p95 and max in milliseconds
+        """
+        ordered = sorted(self.samples)
+        
+        def percentile(fraction):
+            # Nearest-rank percentile of the sample
+            return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)] * 1000
+        
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'p50_ms': round(percentile(0.50), 3),
+            'p95_ms': round(percentile(0.95), 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+class _StageTimer:
+    """Context manager recording the time spent inside it."""
+    
+    __slots__ = ('timings', 'stage', 'start')
+    
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.timings.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _HandleScope:
+    """Context manager setting the handle samples are attributed to."""
+    
+    __slots__ = ('handle', 'token')
+    
+    def __init__(self, handle):
+        self.handle = handle
+    
+    def __enter__(self):
+        self.token = _current_handle.set(self.handle)
+        return self
+    
+    def __exit__(self, *exc_info):
+        _current_handle.reset(self.token)
+        return False
+
+class StageTimings:
+    """
+    Latency samples per stage, overall and per handle.
+    
+    Stages are measured with `with timings.measure('request'):`; samples are
+    attributed to the handle set with `with timings.handle(handle):` in the same
+    thread or context. Safe to share between threads.
+    
+    Memory does not grow with the number of samples, and the per-handle
+    breakdown keeps only the max_handles handles timed most recently.
+    """
+    
+    def __init__(self, enabled=False, max_handles=DEFAULT_MAX_HANDLES):
+        """
+        Args:
+            enabled: Whether measure() records anything
+            max_handles: Handles kept in the per-handle breakdown; the oldest is dropped beyond it
+        """
+        self.enabled = enabled
+        self.max_handles = max_handles
+        self._lock = threading.Lock()
+        self._draw = random.Random().random
+        self._stages = {}
+        self._handles = {}
+    
+    def handle(self, handle):
+        """
+        Attribute the samples recorded inside the returned context manager to a handle.
+        Returns: context manager
+        """
+        if not self.enabled:
+            return _NOT_TIMED
+        return _HandleScope(handle)
+    
+    def measure(self, stage):
+        """
+        Time the code inside the returned context manager as one sample of a stage.
+        Returns: context manager - A no-op while timings are disabled
+        """
+        if not self.enabled:
+            return _NOT_TIMED
+        return _StageTimer(self, stage)
+    
+    def record(self, stage, seconds):
+        """
+        Record one sample of a stage for the current handle.
+        
+        Args:
+            stage: Stage name, e.g. 'request' or 'output.JSON'
+            seconds: Duration of the sample
+        """
+        handle = _current_handle.get()
+        with self._lock:
+            series = self._stages.get(stage)
+            if series is None:
+                series = self._stages[stage] = _Series(self._draw)
+            series.add(seconds)
+            if handle is None:
+                return
+            
+            handle_stages = self._handles.get(handle)
+            if handle_stages is None:
+                if len(self._handles) >= self.max_handles:
+                    # Dicts keep insertion order: the first handle is the oldest
+                    del self._handles[next(iter(self._handles))]
+                handle_stages = self._handles[handle] = {}
+            series = handle_stages.get(stage)
+            if series is None:
+                series = handle_stages[stage] = _Series(self._draw)
+            series.add(seconds)
+    
+    def report(self):
+        """
+        Summarize all samples.
+        Returns: dict - {'stages': {stage: summary}, 'handles': {handle: {stage: summary}}}
+        """
+        with self._lock:
+            stages = {stage: series.copy() for stage, series in self._stages.items()}
+            handles = {
+                handle: {stage: series.copy() for stage, series in handle_stages.items()}
+                for handle, handle_stages in self._handles.items()
+            }
+        return {
+            'stages': {stage: series.summary() for stage, series in stages.items()},
+            'handles': {
+                handle: {stage: series.summary() for stage, series in handle_stages.items()}
+                for handle, handle_stages in handles.items()
+            },
+        }
+
+# Process-wide timings shared by all stages
+_default_timings = StageTimings()
+
+def get_default_timings():
+    """
+    Get the process-wide StageTimings (disabled until a run enables it).
+    Returns: StageTimings
+    """
+    return _default_timings
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test suite for the stage timings
+
+This module contains tests for StageTimings: latency summaries, bounded
+memory, per-handle attribution across threads and the disabled no-op. Samples
+are recorded with fixed durations, so no test depends on the speed of the machine.
+"""
+
+import unittest
+import contextvars
+import sys
+import os
+import threading
+
+# Add the src directory to the path so the test also runs as a plain script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrumentation.stage_timings import RESERVOIR_SIZE, StageTimings, summarize
+
+
+class TestStageTimings(unittest.TestCase):
+    """Test cases for StageTimings and summarize."""
+    
+    def test_summarize(self):
+        """Test the nearest-rank percentiles of a latency series."""
+        # Summarize 1..100 ms in shuffled order
+        summary = summarize([(i * 37 % 100 + 1) / 1000 for i in range(100)])
+        
+        # Assert expected outputs
+        self.assertEqual(summary, {'count': 100, 'total_ms': 5050.0, 'p50_ms': 50.0, 'p95_ms': 95.0, 'max_ms': 100.0})
+        self.assertEqual(summarize([0.002]), {'count': 1, 'total_ms': 2.0, 'p50_ms': 2.0, 'p95_ms': 2.0, 'max_ms': 2.0})
+    
+    def test_long_series_stays_bounded(self):
+        """Test that a long series keeps a bounded sample with exact count, total and max."""
+        timings = StageTimings(enabled=True)
+        
+        # Record 1..10000 ms, far more samples than the reservoir holds
+        for i in range(10000):
+            timings.record('request', (i + 1) / 1000)
+        summary = timings.report()['stages']['request']
+        
+        # Assert expected outputs
+        self.assertEqual(len(timings._stages['request'].samples), RESERVOIR_SIZE, "Samples should be capped")
+        self.assertEqual((summary['count'], summary['total_ms'], summary['max_ms']), (10000, 50005000.0, 10000.0))
+        self.assertLess(abs(summary['p50_ms'] - 5000), 1000, "p50 of a uniform sample should be near the median")
+        self.assertGreater(summary['p95_ms'], 9000)
+    
+    def test_oldest_handles_are_dropped(self):
+        """Test that the per-handle breakdown keeps only the most recent handles."""
+        timings = StageTimings(enabled=True, max_handles=2)
+        
+        # Time three handles with room for two
+        for handle in ('boyar.rs', 'pelmeni', 'krafter.bar'):
+            with timings.handle(handle):
+                timings.record('request', 0.010)
+        report = timings.report()
+        
+        # Assert expected outputs
+        self.assertEqual(sorted(report['handles']), ['krafter.bar', 'pelmeni'], "The oldest handle should be dropped")
+        self.assertEqual(report['stages']['request']['count'], 3, "Dropped handles should still count overall")
+    
+    def test_per_handle_attribution(self):
+        """Test that samples count overall and for the handle they were recorded under."""
+        timings = StageTimings(enabled=True)
+        
+        # Record samples under two handles and outside any handle
+        with timings.handle('boyar.rs'):
+            timings.record('request', 0.010)
+            timings.record('decode', 0.001)
+        with timings.handle('pelmeni'):
+            timings.record('request', 0.030)
+        timings.record('tokens', 0.200)
+        report = timings.report()
+        
+        # Assert expected outputs
+        self.assertEqual(sorted(report['stages']), ['decode', 'request', 'tokens'])
+        self.assertEqual(report['stages']['request']['count'], 2)
+        self.assertEqual(report['stages']['request']['total_ms'], 40.0)
+        self.assertEqual(sorted(report['handles']), ['boyar.rs', 'pelmeni'], "Samples without a handle should only count overall")
+        self.assertEqual(sorted(report['handles']['boyar.rs']), ['decode', 'request'])
+        self.assertEqual(report['handles']['pelmeni']['request']['max_ms'], 30.0)
+    
+    def test_handles_in_threads(self):
+        """Test that each thread attributes samples to its own handle and copied contexts keep it."""
+        timings = StageTimings(enabled=True)
+        
+        def place(handle, seconds):
+            with timings.handle(handle):
+                timings.record('parse', seconds)
+                # A worker started with the copied context records for the same handle
+                context = contextvars.copy_context()
+                worker = threading.Thread(target=context.run, args=(timings.record, 'populate', seconds))
+                worker.start()
+                worker.join()
+        
+        # Time two places on two threads at once
+        threads = [threading.Thread(target=place, args=(f'place_{i}', (i + 1) / 1000)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        handles = timings.report()['handles']
+        
+        # Assert expected outputs
+        for i in range(2):
+            stages = handles[f'place_{i}']
+            self.assertEqual(sorted(stages), ['parse', 'populate'])
+            self.assertEqual(stages['populate']['total_ms'], float(i + 1), "Copied context should keep the handle")
+    
+    def test_measure(self):
+        """Test that measure() records one non-negative sample per use."""
+        timings = StageTimings(enabled=True)
+        
+        # Measure a stage three times
+        for _ in range(3):
+            with timings.measure('output.JSON'):
+                pass
+        
+        # Assert expected outputs
+        summary = timings.report()['stages']['output.JSON']
+        self.assertEqual(summary['count'], 3)
+        self.assertGreaterEqual(summary['max_ms'], 0.0)
+    
+    def test_disabled_is_noop(self):
+        """Test that disabled timings return a shared no-op and record nothing."""
+        timings = StageTimings()
+        
+        # Measure a stage under a handle while disabled
+        with timings.handle('boyar.rs'):
+            with timings.measure('request'):
+                pass
+        
+        # Assert expected outputs
+        self.assertIs(timings.measure('request'), timings.measure('decode'), "The no-op should be shared")
+        self.assertIs(timings.handle('boyar.rs'), timings.measure('request'))
+        self.assertEqual(timings.report(), {'stages': {}, 'handles': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,3 @@
+"""
+make_place pipeline: populators, outputters, batch runs and the place service.
+"""
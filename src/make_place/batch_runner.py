@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Batch runner for make_place.
+
+This module contains the StagedRunner class that runs the make_place pipeline
+for many inputs inside one process, split into stages connected by bounded
+queues, and the AsyncBatchRunner class that fetches on an asyncio event loop.
+Inputs naming the same place (e.g. @boyar.rs, boyar.rs and its profile URL) are
+coalesced into one pipeline run whose result they share.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from instrumentation.metrics import get_default_metrics
+from instrumentation.stage_timings import get_default_timings
+
+# Failures kept for the summary; later ones are only counted
+MAX_LISTED_FAILURES = 100
+
+# Places waiting in a queue, by stage ('input': not yet picked up by a worker;
+# otherwise the StagedRunner stage the queue feeds)
+QUEUE_DEPTH = get_default_metrics().gauge('mapcreator_queue_depth', 'Places waiting in a queue, by pipeline stage', ('stage',))
+
+
+@dataclass
+class BatchResult:
+    """
+    Data class representing the outcome of a batch run.
+    
+    failures lists the first max_failures (input, reason) pairs only, so a long
+    run over a failing API keeps constant memory; failed counts all of them.
+    """
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    coalesced: int = 0
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    max_failures: int = MAX_LISTED_FAILURES
+    
+    @property
+    def handles_per_second(self) -> float:
+        """
+        Get the throughput of the run.
+        
+        Returns:
+            Processed inputs per second of wall-clock time
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.total / self.elapsed
+    
+    def record(self, group: List[str], ok: bool, reason: str):
+        """
+        Count the shared outcome of a group of duplicate inputs.
+        
+        Args:
+            group: Inputs that were coalesced into one run
+            ok: Whether the run succeeded
+            reason: Failure reason if it did not
+        """
+        for input_string in group:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+                if len(self.failures) < self.max_failures:
+                    self.failures.append((input_string, reason))
+
+
+class AsyncBatchRunner:
+    """
+    Runner class that fetches profiles on one asyncio event loop and hands
+    them to a thread pool for parsing and output.
+    """
+    
+    def __init__(self, resolve: Callable[[str], Optional[str]], fetcher,
+                 process: Callable[[str, dict], bool],
+                 concurrency: int = 100, workers: int = 4,
+                 skip_fetch: Optional[Callable[[str], bool]] = None):
+        """
+        Args:
+            resolve: Callable returning the Instagram handle for an input, or None
+            fetcher: Async fetcher with a fetch_profile(handle) coroutine and close()
+            process: Callable running the pipeline for an input with its prefetched
+                profile data. Returns True on success, False on failure.
+            concurrency: Maximum number of places fetched or processed at once
+            workers: Number of threads used by process
+            skip_fetch: Optional callable returning True for handles whose profile is not
+                needed (e.g. fresh places); process then receives an empty profile
+        """
+        self.resolve = resolve
+        self.skip_fetch = skip_fetch
+        self.fetcher = fetcher
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.workers = max(1, workers)
+    
+    async def _run_one(self, input_string: str, semaphore: 'asyncio.Semaphore',
+                       executor: ThreadPoolExecutor) -> Tuple[bool, str]:
+        """Fetch and process one input, turning exceptions into failures."""
+        # The semaphore is held until processing finishes so at most
+        # `concurrency` profiles are kept in memory
+        import asyncio
+        async with semaphore:
+            QUEUE_DEPTH.dec(stage='input')
+            try:
+                handle = self.resolve(input_string)
+                if handle and not (self.skip_fetch and self.skip_fetch(handle)):
+                    with get_default_timings().handle(handle):
+                        profile_data = await self.fetcher.fetch_profile(handle)
+                else:
+                    profile_data = {}
+                loop = asyncio.get_running_loop()
+                if await loop.run_in_executor(executor, self.process, input_string, profile_data):
+                    return True, ""
+                return False, "pipeline failed (see log above)"
+            except Exception as e:
+                return False, str(e)
+    
+    async def _run(self, groups: List[List[str]], result: BatchResult):
+        """Run one input of every duplicate group on the current event loop."""
+        import asyncio
+        semaphore = asyncio.Semaphore(self.concurrency)
+        QUEUE_DEPTH.inc(len(groups), stage='input')
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                outcomes = await asyncio.gather(
+                    *(self._run_one(group[0], semaphore, executor) for group in groups)
+                )
+        finally:
+            await self.fetcher.close()
+        
+        for group, (ok, reason) in zip(groups, outcomes):
+            result.record(group, ok, reason)
+    
+    def run(self, inputs: Iterable[str]) -> BatchResult:
+        """
+        Process all inputs and collect a throughput summary.
+        
+        Args:
+            inputs: Input strings (Instagram URLs, handles, etc.)
+        
+        Returns:
+            BatchResult: Counts, failures and elapsed time of the run
+        """
+        # Inputs naming the same place share the run of the first one
+        inputs = list(inputs)
+        groups: Dict[str, List[str]] = {}
+        for input_string in inputs:
+            groups.setdefault(self.resolve(input_string) or input_string, []).append(input_string)
+        groups = list(groups.values())
+        result = BatchResult(total=len(inputs), coalesced=len(inputs) - len(groups))
+        start = time.perf_counter()
+        
+        # asyncio is only loaded by the --async code paths
+        import asyncio
+        asyncio.run(self._run(groups, result))
+        
+        result.elapsed = time.perf_counter() - start
+        return result
+
+
+@dataclass
+class PipelineItem:
+    """
+    Data class representing one place travelling through the stages of a StagedRunner.
+    """
+    input_string: str
+    handle: Optional[str] = None
+    place_data: Any = None
+    # Raw profile, dropped by the stage that parses it
+    profile: Optional[dict] = None
+    success: bool = True
+    reason: str = ""
+    # Seconds spent in the stages so far, recorded as the 'place' timing when it finishes
+    elapsed: float = 0.0
+
+
+@dataclass
+class Stage:
+    """
+    Data class representing one stage of a StagedRunner.
+    
+    process(item) does the stage's work on a PipelineItem and returns True to
+    pass the item on to the next stage, or False if the item is finished (its
+    success and reason fields tell how). Exceptions fail the item.
+    """
+    name: str
+    process: Callable[[PipelineItem], bool]
+    workers: int = 1
+
+
+# Marks the end of a stage's input
+_END = object()
+
+
+class StagedRunner:
+    """
+    Runner class that pushes inputs through stages connected by bounded queues.
+    
+    Every stage has its own worker threads, so a slow API only holds up the fetch
+    workers while parsing and writing carry on. When a queue is full the stage
+    feeding it blocks, and in the end so does reading the inputs: at most about
+    sum(queue_size + workers) places are held in memory, however many inputs
+    there are. Inputs with the same key as a place still in the pipeline share
+    its run; with remember_finished, so do inputs for places already finished.
+    """
+    
+    def __init__(self, stages: List[Stage], queue_size: Optional[int] = None,
+                 key: Optional[Callable[[str], Optional[str]]] = None,
+                 remember_finished: bool = True):
+        """
+        Args:
+            stages: Stages in pipeline order
+            queue_size: Capacity of the queue in front of every stage;
+                defaults to twice the number of workers of that stage
+            key: Optional callable returning the canonical handle of an input
+            remember_finished: Keep the outcome of every finished key so later duplicates
+                share it; costs one entry per distinct input
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.key = key
+        self.remember_finished = remember_finished
+    
+    def run(self, inputs: Iterable[str]) -> BatchResult:
+        """
+        Process all inputs and collect a throughput summary.
+        Inputs are read lazily, so a generator (e.g. lines of stdin) is never held in memory.
+        
+        Args:
+            inputs: Input strings (Instagram URLs, handles, etc.)
+        
+        Returns:
+            BatchResult: Counts, failures and elapsed time of the run
+        """
+        stages = self.stages
+        queues = [queue.Queue(maxsize=self.queue_size or 2 * max(1, stage.workers)) for stage in stages]
+        result = BatchResult()
+        lock = threading.Lock()
+        # Key -> inputs sharing the run of the place in the pipeline
+        in_flight: Dict[str, List[str]] = {}
+        # Key -> (success, reason) of finished places
+        finished: Optional[Dict[str, Tuple[bool, str]]] = {} if self.remember_finished else None
+        # Workers of every stage that have not stopped yet
+        remaining = [max(1, stage.workers) for stage in stages]
+        timings = get_default_timings()
+        start = time.perf_counter()
+        
+        def finish(key, item):
+            with lock:
+                result.record(in_flight.pop(key), item.success, item.reason)
+                if finished is not None:
+                    finished[key] = (item.success, item.reason)
+            # Time the place spent being worked on, queue waits excluded
+            if timings.enabled and item.handle:
+                with timings.handle(item.handle):
+                    timings.record('place', item.elapsed)
+        
+        def work(index):
+            stage = stages[index]
+            while True:
+                entry = queues[index].get()
+                if entry is _END:
+                    break
+                QUEUE_DEPTH.dec(stage=stage.name)
+                key, item = entry
+                started = time.perf_counter()
+                try:
+                    with timings.handle(item.handle):
+                        passed = stage.process(item)
+                except Exception as e:
+                    item.success, item.reason, passed = False, str(e), False
+                item.elapsed += time.perf_counter() - started
+                if passed and index + 1 < len(stages):
+                    QUEUE_DEPTH.inc(stage=stages[index + 1].name)
+                    queues[index + 1].put(entry)
+                else:
+                    finish(key, item)
+            
+            # The last worker of a stage tells the next stage that no more items follow
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and index + 1 < len(stages):
+                for _ in range(remaining[index + 1]):
+                    queues[index + 1].put(_END)
+        
+        threads = [
+            threading.Thread(target=work, args=(index,), name=f'stage-{stage.name}-{n}', daemon=True)
+            for index, stage in enumerate(stages)
+            for n in range(remaining[index])
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            for input_string in inputs:
+                key = (self.key(input_string) if self.key else None) or input_string
+                with lock:
+                    result.total += 1
+                    if key in in_flight:
+                        in_flight[key].append(input_string)
+                        result.coalesced += 1
+                        continue
+                    if finished is not None and key in finished:
+                        result.record([input_string], *finished[key])
+                        result.coalesced += 1
+                        continue
+                    in_flight[key] = [input_string]
+                QUEUE_DEPTH.inc(stage=stages[0].name)
+                # Blocks while the first stage is saturated
+                queues[0].put((key, PipelineItem(input_string)))
+        finally:
+            for _ in range(remaining[0]):
+                queues[0].put(_END)
+            for thread in threads:
+                thread.join()
+        
+        result.elapsed = time.perf_counter() - start
+        return result
+
+def print_summary(result: BatchResult):
+    """
+    Print a per-run throughput summary.
+    
+    Args:
+        result: BatchResult returned by StagedRunner.run() or AsyncBatchRunner.run()
+    """
+    print("\n" + "=" * 50)
+    print("📊 BATCH SUMMARY")
+    print(f"📥 Inputs: {result.total}")
+    print(f"✅ Succeeded: {result.succeeded}")
+    print(f"❌ Failed: {result.failed}")
+    if result.coalesced:
+        print(f"🔗 Coalesced duplicates: {result.coalesced}")
+    print(f"⏱️  Elapsed: {result.elapsed:.2f}s")
+    print(f"🚀 Throughput: {result.handles_per_second:.2f} handles/sec")
+    
+    for input_string, reason in result.failures:
+        print(f"   ❌ {input_string}: {reason}")
+    if result.failed > len(result.failures):
+        print(f"   ... and {result.failed - len(result.failures)} more failures (see log above)")
+
+
+def read_input_file(path: str) -> List[str]:
+    """
+    Read inputs from a text file, one per line.
+    
+    Blank lines and lines starting with '#' are ignored.
+    
+    Args:
+        path: Path to the input file
+    
+    Returns:
+        List of input strings
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(iter_inputs(f))
+
+
+def iter_inputs(lines: Iterable[str]) -> Iterable[str]:
+    """
+    Yield the inputs of a stream of lines (e.g. stdin) as they are read.
+    
+    Blank lines and lines starting with '#' are skipped.
+    
+    Args:
+        lines: Lines of text
+    
+    Returns:
+        Generator of input strings
+    """
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
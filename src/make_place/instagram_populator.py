@@ -6,16 +6,26 @@ This module contains the InstagramPopulator class that populates PlaceData
 with information extracted from Instagram profiles.
 """
 
-import sys
-import os
+import time
+from dataclasses import fields
 from typing import Optional
 
-# Add the instagram_place_parser to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'instagram_place_parser'))
+from instrumentation.metrics import get_default_metrics
+from instagram_place_parser.place_fetcher import (
+    USERNAME_PATTERN,
+    canonical_username,
+    extract_username_from_input,
+    get_default_fetcher,
+)
+from instagram_place_parser.place_data_parser import parse_profile_data
+from instagram_place_parser.url_rules import get_default_rules
+from make_place.place_data import PlaceData
 
-from place_fetcher import fetch_profile_with_curl, extract_username_from_input
-from place_data_parser import parse_profile_data
-from place_data import PlaceData
+# Fields a link category of url_rules.json can be stored in
+PLACE_FIELDS = frozenset(field.name for field in fields(PlaceData))
+
+# Time spent turning a fetched profile into place fields (cache lookups included)
+PARSE_SECONDS = get_default_metrics().histogram('mapcreator_parse_seconds', 'Time to parse an Instagram profile in seconds')
 
 
 class InstagramPopulator:
@@ -23,16 +33,34 @@ class InstagramPopulator:
     Populator class that extracts place information from Instagram profiles.
     """
     
-    def __init__(self):
+    def __init__(self, fetcher=None, journal=None):
+        """
+        Args:
+            fetcher: Optional InstagramFetcher to share between populators;
+                defaults to the process-wide fetcher
+            journal: Optional RunJournal recording when the profile is fetched and parsed
+        """
         self.name = "Instagram"
+        # A url_rules.json category without a PlaceData field would silently drop its links
+        get_default_rules().validate(PLACE_FIELDS)
+        # PlaceData fields read and set by populate(), used by PopulatorScheduler
+        self.consumes = ('instagram_handle', 'instagram_url')
+        self.produces = ('instagram_handle', 'instagram_url', 'place_name',
+                         *get_default_rules().fields, 'address_text')
+        # One profile request
+        self.cost = 1
+        self.fetcher = fetcher
+        self.journal = journal
+        # Why the last populate() failed, e.g. the fetch error
+        self.error: Optional[str] = None
     
     def populate_from_args(self, place_data: PlaceData, input_string: str) -> bool:
         """
-        Populate instagram_url from input string if it's an Instagram link.
+        Populate instagram_url from input string if it's an Instagram link or handle.
         
         Args:
             place_data: PlaceData instance to populate
-            input_string: Input string that might contain Instagram URL
+            input_string: Input string that might contain Instagram URL, @handle or username
             
         Returns:
             bool: True if instagram_url was set, False otherwise
@@ -40,11 +68,13 @@ class InstagramPopulator:
         if not input_string:
             return False
         
-        # Check if it's an Instagram URL
-        if 'instagram.com' in input_string.lower():
+        input_string = input_string.strip()
+        
+        # Check if it's an Instagram URL, @handle or plain username
+        if 'instagram.com' in input_string.lower() or USERNAME_PATTERN.match(input_string):
             try:
-                # Extract username from the input
-                username = extract_username_from_input(input_string)
+                # Extract the canonical (lowercased) username from the input
+                username = canonical_username(input_string)
                 if username:
                     place_data.instagram_url = f"https://www.instagram.com/{username}/"
                     place_data.instagram_handle = username
@@ -93,36 +123,39 @@ class InstagramPopulator:
                     place_data.instagram_handle = handle
                 except ValueError:
                     print(f"❌ Error extracting handle from URL: {place_data.instagram_url}")
+                    self.error = f"could not extract handle from {place_data.instagram_url}"
                     return False
             else:
                 return False
             
             # Fetch profile data from Instagram
-            profile_data = fetch_profile_with_curl(handle)
+            profile_data = (self.fetcher or get_default_fetcher()).fetch_profile(handle)
             
             # Check for errors
             if 'error' in profile_data:
                 print(f"❌ Error fetching Instagram profile: {profile_data['error']}")
+                self.error = profile_data['error']
+                if self.journal:
+                    self.journal.record(handle, 'failed', profile_data['error'])
                 return False
+            if self.journal:
+                self.journal.record(handle, 'fetched')
             
             # Parse the profile data
+            start = time.perf_counter()
             parsed_data = parse_profile_data(profile_data)
+            PARSE_SECONDS.observe(time.perf_counter() - start)
+            if self.journal:
+                self.journal.record(handle, 'parsed')
             
             # Update place_data with parsed information (only if current data is None)
             if not place_data.place_name and parsed_data.get('place_name'):
                 place_data.place_name = parsed_data['place_name']
             
-            if not place_data.wolt_url and parsed_data.get('wolt_url'):
-                place_data.wolt_url = parsed_data['wolt_url']
-            
-            if not place_data.google_maps and parsed_data.get('google_maps'):
-                place_data.google_maps = parsed_data['google_maps']
-            
-            if not place_data.website_url and parsed_data.get('website_url'):
-                place_data.website_url = parsed_data['website_url']
-            
-            if not place_data.telegram_link and parsed_data.get('telegram_link'):
-                place_data.telegram_link = parsed_data['telegram_link']
+            # Links: one field per category of url_rules.json
+            for field in get_default_rules().fields:
+                if not getattr(place_data, field, None) and parsed_data.get(field):
+                    setattr(place_data, field, parsed_data[field])
             
             if not place_data.address_text and parsed_data.get('address_text'):
                 place_data.address_text = parsed_data['address_text']
@@ -131,4 +164,5 @@ class InstagramPopulator:
             
         except Exception as e:
             print(f"❌ Error populating from Instagram: {e}")
+            self.error = str(e)
             return False
@@ -7,8 +7,9 @@ from PlaceData instances.
 """
 
 import json
+from dataclasses import fields
 from pathlib import Path
-from place_data import PlaceData
+from make_place.place_data import PlaceData
 
 
 class JsonOutputter:
@@ -18,6 +19,8 @@ class JsonOutputter:
     
     def __init__(self):
         self.name = "JSON"
+        # PlaceData fields written to the file
+        self.needs = tuple(field.name for field in fields(PlaceData))
     
     def can_output(self, place_data: PlaceData) -> bool:
         """
@@ -7,22 +7,50 @@ and creates an organized folder structure with a README.md containing the parsed
 
 Usage:
     python make_place.py -i <instagram_link> -o <output_folder>
+    python make_place.py --input-file <inputs.txt> -o <output_folder> [--workers N] [--parse-workers N] [--output-workers N]
+    python make_place.py --input-file <inputs.txt> -o <output_folder> --stale-after 168
+    python make_place.py --input-file <inputs.txt> -o <output_folder> --resume
+    python make_place.py --serve 8765 -o <output_folder>
+    python make_place.py --jsonl < <inputs.txt> > <places.jsonl>
+    python make_place.py --input-file <inputs.txt> -o <output_folder> --metrics-port 9464
 
 Example:
     python make_place.py -i https://www.instagram.com/boyar.rs/ -o ./places
 """
 
 import argparse
+import atexit
 import os
 import sys
+import threading
 import json
 from datetime import datetime
 from pathlib import Path
 
-from place_data import PlaceData
-from instagram_populator import InstagramPopulator
-from json_outputter import JsonOutputter
-from readme_outputter import ReadmeOutputter
+if __package__ in (None, ''):
+    # Run as a script: import the packages from src/ instead of this script's own directory
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from make_place.place_data import PlaceData
+from make_place.populator_scheduler import PopulatorScheduler
+from make_place.instagram_populator import InstagramPopulator
+from make_place.json_outputter import JsonOutputter
+from make_place.readme_outputter import ReadmeOutputter
+from make_place.batch_runner import AsyncBatchRunner, Stage, StagedRunner, iter_inputs, print_summary, read_input_file
+from instagram_place_parser.place_fetcher import InstagramFetcher, PrefetchedProfileFetcher
+from token_extractors.token_cache import TokenCache, DEFAULT_TTL
+from instagram_place_parser.response_cache import ProfileResponseCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_AGE, DEFAULT_MAX_BYTES
+from instagram_place_parser.rate_limiter import AdaptiveController
+from instagram_place_parser.retry_policy import RetryPolicy, get_default_circuit_breaker
+from instagram_place_parser.session_pool import SessionPool, DEFAULT_COOLDOWN
+from instrumentation.metrics import MetricsFileWriter, get_default_metrics, serve_metrics
+from instrumentation.stage_timings import get_default_timings
+from make_place.run_journal import RunJournal, RUN_JOURNAL_FILE
+
+# Places by result (written, skipped or failed) and output files by outputter and result
+PLACES = get_default_metrics().counter('mapcreator_places_total', 'Places processed by result', ('result',))
+OUTPUTS_WRITTEN = get_default_metrics().counter('mapcreator_outputs_written_total', 'Outputter runs by outputter and result',
+                                                ('outputter', 'result'))
 
 
 def create_place_folder(output_folder, instagram_handle):
@@ -49,6 +77,409 @@ def create_place_folder(output_folder, instagram_handle):
 
 
 
+def is_fresh(place_folder, max_age):
+    """
+    Check if a place folder was extracted recently enough to be skipped.
+    
+    Args:
+        place_folder (str): Path to the place folder
+        max_age (float): Seconds after which a place is stale
+        
+    Returns:
+        bool: True if place_data.json exists and its extracted_at is younger than max_age
+    """
+    try:
+        with open(os.path.join(place_folder, 'place_data.json'), 'r', encoding='utf-8') as f:
+            extracted_at = datetime.fromisoformat(json.load(f)['extracted_at'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    
+    age = (datetime.now(extracted_at.tzinfo) - extracted_at).total_seconds()
+    return 0 <= age < max_age
+
+
+def resolve_handle(input_string):
+    """
+    Get the Instagram handle for an input without fetching anything.
+    
+    Args:
+        input_string (str): Input string (Instagram URL, handle, etc.)
+        
+    Returns:
+        str: Instagram handle, or None if the input is not recognized or not a valid
+            username (so a handle is always safe as a folder name)
+    """
+    place_data = PlaceData()
+    InstagramPopulator().populate_from_args(place_data, input_string)
+    return place_data.instagram_handle
+
+
+def prepare_place(input_string, populators, journal=None):
+    """
+    Create the PlaceData of an input and let the populators read the input.
+    
+    Args:
+        input_string (str): Input string (Instagram URL, handle, etc.)
+        populators (list): Populators whose populate_from_args() is run
+        journal (RunJournal): Optional journal recording a failure
+        
+    Returns:
+        PlaceData: Place with instagram_handle set, or None if no handle could be extracted
+    """
+    # Create PlaceData instance
+    print("📄 Creating PlaceData instance...")
+    place_data = PlaceData()
+    
+    # Run populate_from_args for all populators
+    print("📝 Processing input with populators...")
+    for populator in populators:
+        if populator.populate_from_args(place_data, input_string):
+            print(f"✅ {populator.name} populator processed input")
+    
+    # Get the handle for folder creation
+    if not place_data.instagram_handle:
+        print(f"❌ Error: Could not extract handle from input: {input_string}")
+        if journal:
+            journal.record(input_string, 'failed', 'could not extract handle')
+        PLACES.inc(result='failed')
+        return None
+    return place_data
+
+
+def make_place(input_string, output_folder, fetcher=None, max_age=None, journal=None):
+    """
+    Run the populator and outputter pipeline for a single input.
+    
+    Args:
+        input_string (str): Input string (Instagram URL, handle, etc.)
+        output_folder (str): Base output directory
+        fetcher (InstagramFetcher): Optional fetcher shared across places
+        max_age (float): Skip places extracted less than this many seconds ago;
+            None rebuilds every place
+        journal (RunJournal): Optional journal recording the progress of the place
+        
+    Returns:
+        tuple: (success, place_folder) - success is False if the handle could not
+            be extracted or any populator/outputter failed; place_folder is None
+            if nothing was written
+    """
+    # Create list of populators
+    print("🔧 Initializing populators...")
+    populators = [InstagramPopulator(fetcher, journal)]
+    
+    place_data = prepare_place(input_string, populators, journal)
+    if place_data is None:
+        return False, None
+    
+    # Samples of every stage below are attributed to this handle
+    timings = get_default_timings()
+    with timings.handle(place_data.instagram_handle), timings.measure('place'):
+        return build_place(place_data, populators, output_folder, max_age, journal)
+
+
+def build_place(place_data, populators, output_folder, max_age=None, journal=None):
+    """
+    Run the pipeline for a place whose handle is known: populate it and write its folder.
+    
+    Args:
+        place_data (PlaceData): Place with instagram_handle set
+        populators (list): Populators that already processed the input
+        output_folder (str): Base output directory
+        max_age (float): Skip the place if it was extracted less than this many seconds ago
+        journal (RunJournal): Optional journal recording the progress of the place
+        
+    Returns:
+        tuple: (success, place_folder)
+    """
+    existing_folder = skip_fresh_place(place_data, output_folder, max_age, journal)
+    if existing_folder:
+        return True, existing_folder
+    
+    # Create list of outputters
+    print("🔧 Initializing outputters...")
+    outputters = [JsonOutputter(), ReadmeOutputter()]
+    
+    success = populate_place(place_data, populators, outputters)
+    return write_place(place_data, outputters, output_folder, success, journal)
+
+
+def skip_fresh_place(place_data, output_folder, max_age=None, journal=None):
+    """
+    Incremental mode: check whether a place is still fresh and should be left untouched.
+    
+    Args:
+        place_data (PlaceData): Place with instagram_handle set
+        output_folder (str): Base output directory
+        max_age (float): Seconds a place stays fresh; None never skips
+        journal (RunJournal): Optional journal recording the skip; handles a resumed
+            journal left failed or unfinished are never skipped
+        
+    Returns:
+        str: Folder of the fresh place, or None if the place has to be built
+    """
+    if max_age is None or (journal and journal.needs_retry(place_data.instagram_handle)):
+        return None
+    existing_folder = os.path.join(output_folder, place_data.instagram_handle)
+    if not is_fresh(existing_folder, max_age):
+        return None
+    print(f"⏭️  {place_data.instagram_handle} is up to date, skipping (use --force to rebuild)")
+    if journal:
+        journal.record(place_data.instagram_handle, 'skipped')
+    PLACES.inc(result='skipped')
+    return existing_folder
+
+
+def populate_place(place_data, populators, outputters):
+    """
+    Populate the fields the outputters need; independent populators run concurrently.
+    
+    Returns:
+        bool: True if every populator that ran succeeded
+    """
+    print("🔄 Populating place data...")
+    wanted = set().union(*(outputter.needs for outputter in outputters))
+    return PopulatorScheduler(populators).run(place_data, wanted)
+
+
+def write_place(place_data, outputters, output_folder, success=True, journal=None):
+    """
+    Create the folder of a populated place and run the outputters.
+    
+    Args:
+        place_data (PlaceData): Populated place
+        outputters (list): Outputters to run
+        output_folder (str): Base output directory
+        success (bool): Whether populating the place succeeded; nothing is written if not
+        journal (RunJournal): Optional journal recording the outcome
+        
+    Returns:
+        tuple: (success, place_folder) - place_folder is None if populating failed
+    """
+    if not success:
+        fail_place(place_data, journal)
+        return False, None
+    
+    # Create folder structure
+    print(f"📁 Creating folder structure in: {output_folder}")
+    place_folder = create_place_folder(output_folder, place_data.instagram_handle)
+    print(f"✅ Created folder: {place_folder}")
+    
+    # Run all outputters
+    print("📄 Creating output files...")
+    for outputter in outputters:
+        if outputter.can_output(place_data):
+            print(f"🔄 Running {outputter.name} outputter...")
+            with get_default_timings().measure(f'output.{outputter.name}'):
+                written = outputter.output(place_data, place_folder)
+            OUTPUTS_WRITTEN.inc(outputter=outputter.name, result='written' if written else 'failed')
+            if written:
+                print(f"✅ {outputter.name} outputter completed")
+            else:
+                print(f"⚠️  {outputter.name} outputter failed")
+                success = False
+    
+    if journal:
+        journal.finish(place_data.instagram_handle, success)
+    PLACES.inc(result='written' if success else 'failed')
+    return success, place_folder
+
+
+def fail_place(place_data, journal=None):
+    """
+    Record a place whose populate failed, without writing anything.
+    
+    A fresh extracted_at would make the next incremental run skip the place,
+    and a previous good extraction must not be overwritten with its gaps.
+    
+    Args:
+        place_data (PlaceData): Place that failed
+        journal (RunJournal): Optional journal recording the failure
+    """
+    print(f"❌ Not writing {place_data.instagram_handle}: populating failed")
+    if journal:
+        journal.finish(place_data.instagram_handle, False)
+    PLACES.inc(result='failed')
+
+
+def staged_runner(output_folder, fetcher, max_age=None, journal=None,
+                  fetch_workers=4, parse_workers=2, output_workers=2, queue_size=None,
+                  emit=None, remember_finished=True):
+    """
+    Build the batch pipeline: normalize -> fetch -> parse -> output, each stage
+    with its own workers and a bounded queue in front of it.
+    
+    Args:
+        output_folder (str): Base output directory (unused with emit)
+        fetcher (InstagramFetcher): Fetcher shared by the fetch workers
+        max_age (float): Skip places extracted less than this many seconds ago
+        journal (RunJournal): Optional journal recording the progress of every place
+        fetch_workers, parse_workers, output_workers (int): Worker threads per stage
+        queue_size (int): Capacity of every stage queue (default: twice its workers)
+        emit (callable): Optional callable receiving every populated PlaceData
+            in place of writing its folder
+        remember_finished (bool): Let later duplicates of finished inputs share their
+            outcome instead of running again (one entry per distinct input)
+        
+    Returns:
+        StagedRunner: Runner whose run(inputs) processes the inputs
+    """
+    # Outputters and the input-only populator keep no per-place state, so the workers share them
+    outputters = [JsonOutputter(), ReadmeOutputter()]
+    wanted = set().union(*(outputter.needs for outputter in outputters))
+    instagram = InstagramPopulator()
+    
+    def normalize(item):
+        item.place_data = prepare_place(item.input_string, [instagram], journal)
+        if item.place_data is None:
+            item.success, item.reason = False, "could not extract handle"
+            return False
+        item.handle = item.place_data.instagram_handle
+        # Fresh places finish here, before costing a request
+        return not skip_fresh_place(item.place_data, output_folder, max_age, journal)
+    
+    def fetch(item):
+        # No request for a place whose wanted Instagram fields are already set:
+        # the scheduler would skip the populator that consumes the profile
+        if PopulatorScheduler.is_needed(instagram, item.place_data, wanted):
+            item.profile = fetcher.fetch_profile(item.handle)
+        return True
+    
+    def parse(item):
+        profiles = {item.handle: item.profile} if item.profile is not None else {}
+        populators = [InstagramPopulator(PrefetchedProfileFetcher(profiles), journal)]
+        # The raw profile is only referenced by this stage from here on
+        item.profile = None
+        item.success = populate_place(item.place_data, populators, outputters)
+        if not item.success:
+            # The real cause (HTTP status, open circuit breaker, ...) rather than a generic failure
+            item.reason = populators[0].error or "populating failed (see log above)"
+        return True
+    
+    def output(item):
+        if not item.success:
+            if not emit:
+                fail_place(item.place_data, journal)
+            return False
+        if emit:
+            emit(item.place_data)
+            return False
+        item.success, _ = write_place(item.place_data, outputters, output_folder, True, journal)
+        if not item.success:
+            item.reason = "writing the place failed (see log above)"
+        return False
+    
+    return StagedRunner([
+        Stage('normalize', normalize),
+        Stage('fetch', fetch, fetch_workers),
+        Stage('parse', parse, parse_workers),
+        Stage('output', output, output_workers),
+    ], queue_size=queue_size, key=resolve_handle, remember_finished=remember_finished)
+
+
+def run_jsonl(inputs, records, fetcher, args):
+    """
+    Run the staged pipeline writing one PlaceData JSON object per line to a stream.
+    
+    Args:
+        inputs: Input strings, possibly a lazily read stream
+        records: Text stream receiving the JSON lines (stdout)
+        fetcher (InstagramFetcher): Fetcher shared by the fetch workers
+        args: Parsed command line arguments (worker counts and queue size)
+        
+    Returns:
+        BatchResult: Counts, failures and elapsed time of the run
+    """
+    lock = threading.Lock()
+    closed = threading.Event()
+    
+    def emit(place_data):
+        line = json.dumps(place_data.to_dict(), ensure_ascii=False) + '\n'
+        with lock:
+            if closed.is_set():
+                return
+            try:
+                # Flushed per record so downstream tools see each place as it completes
+                records.write(line)
+                records.flush()
+            except BrokenPipeError:
+                print("🛑 Output closed, stopping")
+                closed.set()
+                # Keep the interpreter from failing to flush the closed pipe at exit
+                os.dup2(os.open(os.devnull, os.O_WRONLY), records.fileno())
+    
+    def until_closed(inputs):
+        for input_string in inputs:
+            if closed.is_set():
+                return
+            yield input_string
+    
+    print(f"📜 JSONL mode: {args.workers} fetch and {args.parse_workers} parse workers")
+    runner = staged_runner(None, fetcher, None, None,
+                           fetch_workers=args.workers, parse_workers=args.parse_workers,
+                           output_workers=1, queue_size=args.queue_size,
+                           emit=emit, remember_finished=False)
+    return runner.run(until_closed(inputs))
+
+
+def start_metrics(args):
+    """
+    Expose the process-wide metrics as requested with --metrics-port and --metrics-file.
+    
+    Args:
+        args: Parsed command line arguments
+    """
+    registry = get_default_metrics()
+    if args.metrics_port is not None:
+        server = serve_metrics(registry, port=args.metrics_port)
+        print(f"📈 Metrics on http://127.0.0.1:{server.server_port}/metrics")
+    if args.metrics_file:
+        writer = MetricsFileWriter(registry, args.metrics_file, args.metrics_interval).start()
+        # The final values are written however the run ends
+        atexit.register(writer.stop)
+        print(f"📈 Metrics written to {args.metrics_file} every {args.metrics_interval:g}s")
+
+
+def print_timings(report):
+    """Print the latency distribution of every stage, slowest in total first."""
+    stages = sorted(report['stages'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    print("⏱️  Stage timings:")
+    for stage, summary in stages:
+        print(f"   {stage:<24} {summary['count']:>6}x  p50 {summary['p50_ms']:9.3f} ms  "
+              f"p95 {summary['p95_ms']:9.3f} ms  max {summary['max_ms']:9.3f} ms  "
+              f"total {summary['total_ms'] / 1000:8.2f}s")
+
+
+def report_timings(args, result=None):
+    """
+    Print and/or write the stage timings requested with --timings and --report.
+    
+    Args:
+        args: Parsed command line arguments
+        result (BatchResult): Outcome of a batch run, added to the report file
+    """
+    if not (args.timings or args.report):
+        return
+    
+    report = get_default_timings().report()
+    if args.timings:
+        print_timings(report)
+    if args.report:
+        if result is not None:
+            report['run'] = {
+                'total': result.total,
+                'succeeded': result.succeeded,
+                'failed': result.failed,
+                'elapsed_s': round(result.elapsed, 3),
+                'handles_per_second': round(result.handles_per_second, 3),
+            }
+        try:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"📈 Timing report: {args.report}")
+        except OSError as e:
+            print(f"⚠️  Could not write timing report {args.report}: {e}")
+
+
 def main():
     """Main function to handle command line arguments and orchestrate the process."""
     parser = argparse.ArgumentParser(
@@ -59,99 +490,406 @@ Examples:
   python make_place.py -i https://www.instagram.com/boyar.rs/ -o ./places
   python make_place.py -i @boyar.rs -o ./my_places
   python make_place.py -i boyar.rs -o /path/to/output
+  python make_place.py -i boyar.rs -i ruske_palacinke -o ./places
+  python make_place.py --input-file venues.txt -o ./places --workers 8
+  python make_place.py --input-file venues.txt -o ./places --stale-after 168
+  python make_place.py --input-file venues.txt -o ./places --async --concurrency 200
+  python make_place.py --serve 8765 -o ./places
         """
     )
     
     parser.add_argument(
         '-i', '--input',
-        required=True,
-        help='Input string (Instagram URL, handle, etc.)'
+        action='append',
+        default=[],
+        help='Input string (Instagram URL, handle, etc.). Can be given multiple times'
+    )
+    
+    parser.add_argument(
+        '--input-file',
+        help='Text file with one input per line (blank lines and # comments are ignored)'
     )
     
     parser.add_argument(
         '-o', '--output-folder',
-        required=True,
-        help='Output folder where the place folder will be created'
+        help='Output folder where the place folder will be created (optional with --jsonl)'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Number of profile fetch workers in batch mode; with --async, threads parsing and writing '
+             'places (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=2,
+        help='Number of threads parsing fetched profiles in batch mode (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--output-workers',
+        type=int,
+        default=2,
+        help='Number of threads writing place folders in batch mode (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        help='Places waiting in front of each batch mode stage before the stage feeding it blocks '
+             '(default: twice the stage\'s workers)'
+    )
+    
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Fetch profiles on an asyncio event loop (requires aiohttp)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=100,
+        help='Maximum number of profile requests in flight with --async (default: 100)'
+    )
+    
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=5.0,
+        help='Initial Instagram requests per second; adapted to 429s and latency (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--max-rate',
+        type=float,
+        default=50.0,
+        help='Upper bound for the adaptive request rate (default: 50)'
+    )
+    
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=3,
+        help='Retries for network errors, 5xx and 429 responses, with jittered exponential backoff (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--token-file',
+        action='append',
+        default=[],
+        help='JSON token file (see place_tokens_template.json) added to the account pool. Can be given multiple times'
+    )
+    
+    parser.add_argument(
+        '--browser-profiles',
+        action='store_true',
+        help='Add every logged-in Firefox and Chrome profile to the account pool'
+    )
+    
+    parser.add_argument(
+        '--account-cooldown',
+        type=float,
+        default=DEFAULT_COOLDOWN,
+        help=f'Seconds a pooled account rests after a 429, doubled on repeated 429s (default: {DEFAULT_COOLDOWN:.0f})'
+    )
+    
+    parser.add_argument(
+        '--token-ttl',
+        type=int,
+        default=DEFAULT_TTL,
+        help=f'Seconds to reuse cached browser tokens before re-reading them (default: {DEFAULT_TTL})'
+    )
+    
+    parser.add_argument(
+        '--max-age',
+        type=int,
+        default=DEFAULT_MAX_AGE,
+        help=f'Seconds a cached profile response is reused instead of refetching (default: {DEFAULT_MAX_AGE})'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always fetch profiles from Instagram and do not store responses'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'Directory of the profile response cache (default: {DEFAULT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help='Size of the profile response cache before old entries are evicted, in MB (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--stale-after',
+        type=float,
+        metavar='HOURS',
+        help='Skip places whose place_data.json was extracted less than HOURS ago '
+             '(default: rebuild every place)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Rebuild every place, even if --stale-after would skip it'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help=f'Continue an interrupted batch run: skip places the journal '
+             f'(<output folder>/{RUN_JOURNAL_FILE}) records as done, retry failed and unfinished ones '
+             f'even if --stale-after would skip them'
+    )
+    
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print p50/p95/max latency of every stage (tokens, request, decode, parser extractors, outputters)'
+    )
+    
+    parser.add_argument(
+        '--report',
+        metavar='REPORT_JSON',
+        help='Write per-handle and aggregate stage latencies and counts to a JSON file'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        metavar='[HOST:]PORT',
+        help='Run as a local HTTP service keeping sessions, tokens and caches warm '
+             '(POST /places/<input> makes a place, GET /places/<input> returns its JSON)'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve Prometheus metrics (fetches by status, token refreshes, cache hits, parse time, '
+             'outputs written, queue depth) on http://127.0.0.1:PORT/metrics'
+    )
+    
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Periodically rewrite Prometheus metrics to a file (e.g. for the node_exporter textfile collector)'
+    )
+    
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        default=15.0,
+        help='Seconds between rewrites of --metrics-file (default: %(default)g)'
+    )
+    
+    parser.add_argument(
+        '--jsonl',
+        action='store_true',
+        help='Read inputs from stdin (unless -i/--input-file is given) and write one PlaceData JSON '
+             'object per line to stdout as each place completes, instead of place folders; logs go to stderr'
     )
     
     args = parser.parse_args()
     
+    if not args.output_folder and not args.jsonl:
+        parser.error("-o/--output-folder is required")
+    if args.jsonl and (args.serve or args.use_async or args.resume):
+        parser.error("--jsonl cannot be combined with --serve, --async or --resume")
+    
+    # JSONL mode: stdout carries the records only, everything printed goes to stderr
+    records = sys.stdout
+    if args.jsonl:
+        sys.stdout = sys.stderr
+    
+    # Time every stage of the pipeline
+    if args.timings or args.report:
+        get_default_timings().enabled = True
+    start_metrics(args)
+    
+    inputs = list(args.input)
+    if args.input_file:
+        inputs.extend(read_input_file(args.input_file))
+    if args.jsonl and not inputs:
+        # Read stdin lazily, so any number of inputs runs in constant memory
+        inputs = iter_inputs(sys.stdin)
+    
+    if not inputs and not args.serve:
+        parser.error("at least one of -i/--input, --input-file or --serve is required")
+    if inputs and args.serve:
+        parser.error("--serve takes its inputs from HTTP requests, not -i/--input or --input-file")
+    
     print("🏗️  Make Place - Place Information Extractor")
     print("=" * 50)
     
-    # Create PlaceData instance
-    print("📄 Creating PlaceData instance...")
-    place_data = PlaceData()
+    # One pooled session for the whole run, sized for the number of workers
+    token_cache = TokenCache(ttl=args.token_ttl)
+    response_cache = None
+    if not args.no_cache:
+        response_cache = ProfileResponseCache(
+            cache_dir=args.cache_dir,
+            max_age=args.max_age,
+            max_bytes=args.cache_max_mb * 1024 * 1024
+        )
     
-    # Create list of populators
-    print("🔧 Initializing populators...")
-    populators = [InstagramPopulator()]
+    # Several accounts: --rate and --max-rate apply per account, the controller scales with the pool
+    session_pool = None
+    accounts = 1
+    if args.token_file or args.browser_profiles:
+        try:
+            session_pool = SessionPool.from_sources(args.token_file, args.browser_profiles,
+                                                    rate=args.rate, cooldown=args.account_cooldown)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error: could not load token file: {e}")
+            sys.exit(1)
+        if not len(session_pool):
+            print("❌ Error: no usable Instagram accounts found in the token files or browser profiles")
+            sys.exit(1)
+        accounts = len(session_pool)
+        print(f"👥 Account pool: {', '.join(session.name for session in session_pool.sessions)}")
     
-    # Track which populators have run (boolean array)
-    populated = [False] * len(populators)
+    # Seconds after which a place is rebuilt; None rebuilds everything
+    max_age = None if args.force or args.stale_after is None else args.stale_after * 3600
     
-    # Run populate_from_args for all populators
-    print("📝 Processing input with populators...")
-    for populator in populators:
-        if populator.populate_from_args(place_data, args.input):
-            print(f"✅ {populator.name} populator processed input")
+    # Batch runs keep a journal of every handle's progress so they can be resumed
+    journal = None
+    if not args.serve and not args.jsonl and (args.use_async or len(inputs) > 1 or args.input_file):
+        journal = RunJournal(os.path.join(args.output_folder, RUN_JOURNAL_FILE), resume=args.resume)
+        if args.resume:
+            pending = [input_string for input_string in inputs
+                       if not journal.is_completed(resolve_handle(input_string) or input_string)]
+            print(f"⏩ Resuming: {len(inputs) - len(pending)} of {len(inputs)} inputs already done")
+            inputs = pending
+        journal.queue(dict.fromkeys(resolve_handle(input_string) or input_string for input_string in inputs))
     
-    # Get the handle for folder creation
-    if not place_data.instagram_handle:
-        print("❌ Error: Could not extract handle from input")
-        sys.exit(1)
+    max_concurrency = args.concurrency if args.use_async else args.workers
+    rate_controller = AdaptiveController(
+        rate=args.rate * accounts,
+        max_rate=args.max_rate * accounts,
+        concurrency=min(max_concurrency, 4),
+        max_concurrency=max_concurrency,
+        # Every account starts at --rate and follows the controller up to --max-rate
+        on_rate_change=session_pool and (lambda rate: session_pool.set_rate(rate / accounts))
+    )
+    retry_policy = RetryPolicy(max_attempts=args.retries + 1)
+    fetcher = InstagramFetcher(pool_size=max(args.workers, 1), token_cache=token_cache,
+                               response_cache=response_cache, rate_controller=rate_controller,
+                               retry_policy=retry_policy, session_pool=session_pool)
     
-    # Create folder structure
-    print(f"📁 Creating folder structure in: {args.output_folder}")
-    place_folder = create_place_folder(args.output_folder, place_data.instagram_handle)
-    print(f"✅ Created folder: {place_folder}")
+    # JSONL mode: stream records to stdout, stop reading inputs once stdout is closed (e.g. `| head`)
+    if args.jsonl:
+        result = run_jsonl(inputs, records, fetcher, args)
+        print_summary(result)
+        report_timings(args, result)
+        sys.exit(0 if result.failed == 0 else 1)
     
-    # Populate data using populators
-    print("🔄 Populating place data...")
-    max_iterations = 10  # Prevent infinite loops
-    iteration = 0
+    # Service mode: keep everything above warm and make places on request
+    if args.serve:
+        from make_place.place_server import PlaceService, serve, DEFAULT_HOST
+        host, _, port = args.serve.rpartition(':')
+        try:
+            port = int(port)
+        except ValueError:
+            parser.error(f"--serve expects [HOST:]PORT, got {args.serve}")
+        serve(PlaceService(args.output_folder, fetcher, max_age), host or DEFAULT_HOST, port)
+        return
     
-    while iteration < max_iterations:
-        iteration += 1
-        any_populated = False
+    # Async mode: fetch on one event loop, parse and write on the worker threads
+    if args.use_async:
+        try:
+            from instagram_place_parser.async_place_fetcher import AsyncInstagramFetcher
+            async_fetcher = AsyncInstagramFetcher(max_connections=args.concurrency, token_cache=token_cache,
+                                                  response_cache=response_cache,
+                                                  rate_controller=rate_controller,
+                                                  retry_policy=retry_policy,
+                                                  session_pool=session_pool)
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
         
-        for i, populator in enumerate(populators):
-            # Check if this populator can populate and hasn't run yet
-            if populator.can_populate(place_data) and not populated[i]:
-                print(f"🔄 Running {populator.name} populator...")
-                if populator.populate(place_data):
-                    print(f"✅ {populator.name} populator completed")
-                    populated[i] = True
-                    any_populated = True
-                else:
-                    print(f"⚠️  {populator.name} populator failed")
-        
-        if not any_populated:
-            break
+        print(f"⚡ Async mode: {len(inputs)} inputs, {args.concurrency} requests in flight, {args.workers} workers")
+        runner = AsyncBatchRunner(
+            resolve_handle,
+            async_fetcher,
+            lambda input_string, profile_data: make_place(
+                input_string, args.output_folder,
+                PrefetchedProfileFetcher({resolve_handle(input_string): profile_data}),
+                max_age, journal
+            )[0],
+            concurrency=args.concurrency,
+            workers=args.workers,
+            skip_fetch=None if max_age is None else (
+                lambda handle: not journal.needs_retry(handle)
+                and is_fresh(os.path.join(args.output_folder, handle), max_age))
+        )
     
-    if iteration >= max_iterations:
-        print("⚠️  Maximum iterations reached")
+    # Batch mode: fetch, parse and write in separate stages with bounded queues between them
+    elif journal:
+        print(f"📦 Batch mode: {len(inputs)} inputs, {args.workers} fetch, {args.parse_workers} parse "
+              f"and {args.output_workers} output workers")
+        runner = staged_runner(args.output_folder, fetcher, max_age, journal,
+                               fetch_workers=args.workers, parse_workers=args.parse_workers,
+                               output_workers=args.output_workers, queue_size=args.queue_size)
+    else:
+        runner = None
     
-    # Create list of outputters
-    print("🔧 Initializing outputters...")
-    outputters = [JsonOutputter(), ReadmeOutputter()]
+    if runner:
+        result = runner.run(inputs)
+        journal.close()
+        print_summary(result)
+        stats = token_cache.stats
+        print(f"🔑 Tokens: {stats['browser_reads']} browser reads, "
+              f"{stats['memory_hits'] + stats['disk_hits']} cache hits, "
+              f"{stats['invalidations']} invalidations")
+        state = rate_controller.snapshot()
+        print(f"🚦 Rate control: {state['rate']:.2f} req/s x {state['concurrency']} concurrent, "
+              f"peak {state['peak_rate']:.2f} req/s x {state['peak_concurrency']}; "
+              f"{state['throttled']} throttled (429), {state['server_errors']} server errors, "
+              f"{state['network_errors']} network errors")
+        if session_pool:
+            sessions = session_pool.snapshot()
+            alive = sum(1 for session in sessions if session['alive'])
+            print(f"👥 Accounts: {alive} of {len(sessions)} alive; " + ", ".join(
+                f"{session['name']} {session['requests']} requests ({session['throttled']} throttled)"
+                for session in sessions))
+        breaker = get_default_circuit_breaker()
+        if breaker.stats['opened']:
+            print(f"⛔ Auth circuit breaker opened {breaker.stats['opened']} times, "
+                  f"{breaker.stats['rejected']} fetches skipped (now {breaker.state})")
+        if response_cache:
+            stats = response_cache.stats
+            print(f"💾 Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['evictions']} evictions")
+        report_timings(args, result)
+        sys.exit(0 if result.failed == 0 else 1)
     
-    # Run all outputters
-    print("📄 Creating output files...")
-    for outputter in outputters:
-        if outputter.can_output(place_data):
-            print(f"🔄 Running {outputter.name} outputter...")
-            if outputter.output(place_data, place_folder):
-                print(f"✅ {outputter.name} outputter completed")
-            else:
-                print(f"⚠️  {outputter.name} outputter failed")
+    success, place_folder = make_place(inputs[0], args.output_folder, fetcher, max_age)
+    report_timings(args)
+    if place_folder is None:
+        sys.exit(1)
     
     # Summary
     print("\n" + "=" * 50)
-    print("🎉 SUCCESS! Place information extracted and organized:")
+    if success:
+        print("🎉 SUCCESS! Place information extracted and organized:")
+    else:
+        print("⚠️  Place folder created, but some outputs failed (see log above):")
     print(f"📂 Folder: {place_folder}")
     print(f"📄 README: {place_folder}/README.md")
     print(f"📄 JSON: {place_folder}/place_data.json")
+    if not success:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -24,6 +24,9 @@ class PlaceData:
     google_maps: Optional[str] = None
     website_url: Optional[str] = None
     telegram_link: Optional[str] = None
+    glovo_url: Optional[str] = None
+    tripadvisor_url: Optional[str] = None
+    booking_url: Optional[str] = None
     address_text: Optional[str] = None
     
     def __post_init__(self):
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Local HTTP service for make_place.
+
+This module contains the PlaceService class and a small JSON HTTP API around
+it, so other tools can make places without paying for Python startup, browser
+token extraction and a cold Instagram connection on every call. The fetcher,
+tokens and caches stay warm for the lifetime of the process.
+
+Endpoints:
+    POST /places/<input>[?force=1]  Make (or refresh) the place and return its place_data.json
+    GET  /places/<input>            Return the stored place_data.json of the place
+    GET  /health                    Liveness check with request counters
+    GET  /metrics                   Prometheus metrics of the process
+"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from make_place.make_place import make_place, resolve_handle
+from instrumentation.metrics import get_default_metrics
+from instagram_place_parser.place_fetcher import USERNAME_PATTERN
+from instagram_place_parser.single_flight import SingleFlight
+
+# Address the service listens on by default (local only)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class PlaceService:
+    """
+    Service class that makes and serves places with shared, warm resources.
+    
+    Concurrent requests for the same handle share one pipeline run, so a place
+    folder is never written by two threads at once. Stored places are kept in
+    memory and re-read only when their place_data.json changes on disk.
+    """
+    
+    def __init__(self, output_folder: str, fetcher, max_age: Optional[float] = None):
+        """
+        Args:
+            output_folder: Base output directory of the place folders
+            fetcher: InstagramFetcher shared by all requests
+            max_age: Seconds a place stays fresh; fresh places are returned without a fetch
+        """
+        self.output_folder = output_folder
+        self.fetcher = fetcher
+        self.max_age = max_age
+        self.single_flight = SingleFlight()
+        self.stats = {
+            'made': 0,
+            'served': 0,
+            'failed': 0,
+        }
+        self._lock = threading.Lock()
+        self._places = {}
+    
+    def get(self, handle: str) -> Optional[dict]:
+        """
+        Get the stored place data of a handle.
+        
+        Args:
+            handle: Instagram handle
+        
+        Returns:
+            dict: Contents of its place_data.json, or None if the place was never made
+        """
+        path = os.path.join(self.output_folder, handle, 'place_data.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        
+        with self._lock:
+            cached = self._places.get(handle)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                place = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._places[handle] = (mtime, place)
+        return place
+    
+    def lookup(self, handle: str) -> Optional[dict]:
+        """
+        Serve the stored place data of a handle, counting the request.
+        
+        Returns:
+            dict: Contents of its place_data.json, or None if the place was never made
+        """
+        place = self.get(handle)
+        if place is not None:
+            with self._lock:
+                self.stats['served'] += 1
+        return place
+    
+    def make(self, handle: str, input_string: str, force: bool = False) -> Tuple[bool, Optional[dict]]:
+        """
+        Run the pipeline for an input, sharing the run with concurrent requests for the same handle.
+        
+        Args:
+            handle: Instagram handle of the input
+            input_string: Input string (Instagram URL, handle, etc.)
+            force: Rebuild the place even if it is fresh
+        
+        Returns:
+            tuple: (success, place data or None if nothing was written)
+        """
+        def run():
+            success, _ = make_place(input_string, self.output_folder, self.fetcher,
+                                    max_age=None if force else self.max_age)
+            return success
+        
+        success = self.single_flight.do(handle, run)
+        with self._lock:
+            self.stats['made' if success else 'failed'] += 1
+        return success, self.get(handle)
+
+
+class PlaceRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler translating requests into PlaceService calls."""
+    
+    # Set by serve()
+    service: PlaceService = None
+    
+    def _send_json(self, status: int, body: dict):
+        """Send a JSON response."""
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+    
+    def _route(self) -> Tuple[Optional[str], Optional[str], dict]:
+        """
+        Split the request path.
+        
+        Returns:
+            tuple: (input string, its handle, query parameters); input is None for other paths,
+                handle is None unless it is a valid username (it names the place folder)
+        """
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if not url.path.startswith('/places/'):
+            return None, None, query
+        input_string = unquote(url.path[len('/places/'):]).strip()
+        handle = resolve_handle(input_string) if input_string else None
+        if handle and not USERNAME_PATTERN.match(handle):
+            handle = None
+        return input_string, handle, query
+    
+    def do_GET(self):
+        """Serve a stored place, the health check or the metrics."""
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', **self.service.stats,
+                                  'coalesced': self.service.single_flight.stats['coalesced']})
+            return
+        if self.path == '/metrics':
+            content = get_default_metrics().render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        
+        input_string, handle, _ = self._route()
+        if input_string is None:
+            self._send_json(404, {'error': 'not found'})
+        elif not handle:
+            self._send_json(400, {'error': f'not an Instagram handle or URL: {input_string}'})
+        else:
+            place = self.service.lookup(handle)
+            if place is None:
+                self._send_json(404, {'error': f'no place for {handle}; POST /places/{handle} to make it'})
+            else:
+                self._send_json(200, place)
+    
+    def do_POST(self):
+        """Make a place and return its data."""
+        input_string, handle, query = self._route()
+        if input_string is None:
+            self._send_json(404, {'error': 'not found'})
+            return
+        if not handle:
+            self._send_json(400, {'error': f'not an Instagram handle or URL: {input_string}'})
+            return
+        
+        force = query.get('force', ['0'])[0].lower() in ('1', 'true', 'yes')
+        try:
+            success, place = self.service.make(handle, input_string, force)
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        
+        if success and place is not None:
+            self._send_json(200, place)
+        else:
+            self._send_json(502, {'error': f'could not make place for {handle} (see service log)', 'place': place})
+
+
+def make_server(service: PlaceService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """
+    Bind an HTTP server answering requests with a PlaceService, without serving yet.
+    
+    Args:
+        service: Service answering the requests
+        host: Interface to listen on
+        port: TCP port to listen on (0 picks a free one, see server.server_port)
+    
+    Returns:
+        ThreadingHTTPServer: Call serve_forever() to serve, shutdown() to stop
+    """
+    handler = type('BoundPlaceRequestHandler', (PlaceRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(service: PlaceService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """
+    Serve a PlaceService over HTTP until interrupted.
+    
+    Args:
+        service: Service answering the requests
+        host: Interface to listen on
+        port: TCP port to listen on
+    """
+    server = make_server(service, host, port)
+    print(f"🛰️  Serving places on http://{host}:{server.server_port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping service")
+    finally:
+        server.server_close()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Populator scheduler for make_place.
+
+This module contains the PopulatorScheduler class that runs populators in the
+order given by the PlaceData fields they consume and produce. Populators that do
+not depend on each other run concurrently; a populator starts as soon as every
+populator producing one of its inputs has finished. Sources are demand-driven:
+a populator only runs while a field it provides is still empty, and cheaper
+sources of the same field run first.
+"""
+
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+from instrumentation.metrics import get_default_metrics
+from instrumentation.stage_timings import get_default_timings
+from make_place.place_data import PlaceData
+
+# Populator runs by populator and result (succeeded, failed or skipped)
+POPULATOR_RUNS = get_default_metrics().counter('mapcreator_populator_runs_total', 'Populator runs by populator and result',
+                                               ('populator', 'result'))
+
+
+class PopulatorScheduler:
+    """
+    Scheduler class that runs populators along their field dependencies.
+    
+    A populator declares the PlaceData fields it reads in `consumes` and the
+    fields it may set in `produces`. It waits for every other populator that
+    produces a field it consumes, then runs if can_populate() accepts the data.
+    A populator without declarations depends on nothing.
+    
+    A populator may also declare its `cost` (e.g. the number of HTTP requests it
+    makes, default 0). It waits for cheaper populators producing the same fields
+    and is skipped if, by the time it could start, every wanted field it
+    produces is already set.
+    """
+    
+    def __init__(self, populators: List, max_workers: int = None):
+        """
+        Args:
+            populators: Populators to run
+            max_workers: Maximum number of populators running at once (default: all of them)
+        
+        Raises:
+            ValueError: If the populators depend on each other in a cycle
+        """
+        self.populators = list(populators)
+        self.max_workers = max_workers or max(len(self.populators), 1)
+        
+        # Field → populators producing it
+        producers: Dict[str, List[int]] = {}
+        for i, populator in enumerate(self.populators):
+            for field in getattr(populator, 'produces', ()):
+                producers.setdefault(field, []).append(i)
+        
+        # Edges from each populator to the populators waiting for its fields,
+        # and from cheaper to more expensive sources of the same field
+        self.dependents: List[List[int]] = [[] for _ in self.populators]
+        self.waiting_on: List[int] = [0] * len(self.populators)
+        for i, populator in enumerate(self.populators):
+            inputs = set()
+            for field in getattr(populator, 'consumes', ()):
+                inputs.update(j for j in producers.get(field, ()) if j != i)
+            cost = self.cost(populator)
+            for field in getattr(populator, 'produces', ()):
+                inputs.update(j for j in producers[field] if self.cost(self.populators[j]) < cost)
+            for j in inputs:
+                self.dependents[j].append(i)
+            self.waiting_on[i] = len(inputs)
+        
+        self._check_cycles()
+    
+    def _check_cycles(self):
+        """Raise ValueError if some populators can never start because they wait for each other."""
+        remaining = list(self.waiting_on)
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        started = 0
+        while ready:
+            i = ready.pop()
+            started += 1
+            for j in self.dependents[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    ready.append(j)
+        
+        if started < len(self.populators):
+            names = ', '.join(self.populators[i].name for i, count in enumerate(remaining) if count)
+            raise ValueError(f"Populator dependency cycle between: {names}")
+    
+    @staticmethod
+    def cost(populator) -> float:
+        """
+        Get the declared cost of a populator.
+        
+        Returns:
+            float: Relative cost of running the populator, 0 if it declares none
+        """
+        return getattr(populator, 'cost', 0)
+    
+    @staticmethod
+    def is_needed(populator, place_data: PlaceData, wanted) -> bool:
+        """
+        Check if a populator could still fill a wanted field.
+        
+        Args:
+            populator: Populator to check
+            place_data: PlaceData instance being populated
+            wanted: Fields the caller needs, or None for every field
+        
+        Returns:
+            bool: True if the populator declares no fields or one of its wanted fields is empty
+        """
+        produces = getattr(populator, 'produces', None)
+        if not produces:
+            return True
+        return any(not getattr(place_data, field, None)
+                   for field in produces if wanted is None or field in wanted)
+    
+    @staticmethod
+    def _populate(populator, place_data: PlaceData) -> bool:
+        """
+        Run one populator.
+        
+        Returns:
+            bool: True if the populator succeeded, False if it failed or raised
+        """
+        try:
+            with get_default_timings().measure(f'populate.{populator.name}'):
+                success = bool(populator.populate(place_data))
+        except Exception as e:
+            print(f"❌ Error in {populator.name} populator: {e}")
+            success = False
+        POPULATOR_RUNS.inc(populator=populator.name, result='succeeded' if success else 'failed')
+        return success
+    
+    def run(self, place_data: PlaceData, wanted=None) -> bool:
+        """
+        Run every populator whose inputs are available and whose fields are still needed.
+        
+        Args:
+            place_data: PlaceData instance to populate
+            wanted: Fields the outputters need (default: every field)
+        
+        Returns:
+            bool: True if no populator failed, False otherwise
+        """
+        success = True
+        remaining = list(self.waiting_on)
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        running = {}
+        executor = None
+        
+        def finish(i, ok):
+            nonlocal success
+            populator = self.populators[i]
+            if ok:
+                print(f"✅ {populator.name} populator completed")
+            else:
+                print(f"⚠️  {populator.name} populator failed")
+                success = False
+            release(i)
+        
+        def release(i):
+            for j in self.dependents[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    ready.append(j)
+        
+        try:
+            while ready or running:
+                while ready:
+                    i = ready.pop(0)
+                    populator = self.populators[i]
+                    if not populator.can_populate(place_data):
+                        release(i)
+                        continue
+                    if not self.is_needed(populator, place_data, wanted):
+                        print(f"⏭️  Skipping {populator.name} populator: its fields are already set")
+                        POPULATOR_RUNS.inc(populator=populator.name, result='skipped')
+                        release(i)
+                        continue
+                    
+                    print(f"🔄 Running {populator.name} populator...")
+                    # The only runnable populator runs on the calling thread
+                    if not ready and not running:
+                        finish(i, self._populate(populator, place_data))
+                        continue
+                    
+                    if executor is None:
+                        executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                      thread_name_prefix='populator')
+                    # The copied context keeps samples attributed to this place's handle
+                    running[executor.submit(contextvars.copy_context().run,
+                                            self._populate, populator, place_data)] = i
+                
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(running.pop(future), future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        
+        return success
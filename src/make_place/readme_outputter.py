@@ -7,7 +7,19 @@ from PlaceData instances.
 """
 
 from pathlib import Path
-from place_data import PlaceData
+from instagram_place_parser.url_rules import get_default_rules
+from make_place.place_data import PlaceData
+
+# Section titles of the link fields listed only when present; other url_rules.json
+# categories get a title made from their field name
+LINK_TITLES = {
+    'glovo_url': "🛵 Glovo Delivery",
+    'tripadvisor_url': "🦉 TripAdvisor",
+    'booking_url': "📅 Booking",
+}
+
+# Link fields with a section of their own, shown even when empty
+FIXED_LINK_FIELDS = ('wolt_url', 'google_maps', 'website_url', 'telegram_link')
 
 
 class ReadmeOutputter:
@@ -17,6 +29,17 @@ class ReadmeOutputter:
     
     def __init__(self):
         self.name = "README"
+        # PlaceData fields shown in the README: one per url_rules.json category besides the profile ones
+        self.needs = ('instagram_handle', 'instagram_url', 'extracted_at', 'place_name',
+                      *FIXED_LINK_FIELDS, *self.extra_link_fields(), 'address_text')
+    
+    @staticmethod
+    def extra_link_fields():
+        """
+        Get the link fields listed only when present.
+        Returns: tuple - url_rules.json fields without a section of their own
+        """
+        return tuple(field for field in get_default_rules().fields if field not in FIXED_LINK_FIELDS)
     
     def can_output(self, place_data: PlaceData) -> bool:
         """
@@ -83,6 +106,14 @@ class ReadmeOutputter:
             markdown_content += f"### 📱 Telegram\n"
             markdown_content += f"*Not available*\n\n"
         
+        # Links found by the newer url_rules.json categories are only listed when present
+        for field in self.extra_link_fields():
+            url = getattr(place_data, field, None)
+            if url:
+                title = LINK_TITLES.get(field) or f"🔗 {field.replace('_url', '').replace('_', ' ').title()}"
+                markdown_content += f"### {title}\n"
+                markdown_content += f"**URL:** [{url}]({url})\n\n"
+        
         if place_data.address_text:
             markdown_content += f"### 📍 Address\n"
             markdown_content += f"**Location:** {place_data.address_text}\n\n"
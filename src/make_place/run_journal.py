@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Checkpoint journal for batch runs of make_place.
+
+This module contains the RunJournal class that appends the state of every
+handle (queued, fetched, parsed, written, skipped or failed) to a JSON Lines
+file, so an interrupted run can be resumed without redoing finished places.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+# File name of the journal inside the output folder
+RUN_JOURNAL_FILE = '.run_journal.jsonl'
+
+# States after which a handle needs no more work
+COMPLETED_STATES = ('written', 'skipped')
+
+
+class RunJournal:
+    """
+    Append-only journal of per-handle states.
+    
+    Each line is one JSON object {"handle", "state", "at"} plus "reason" for
+    failures; the last line of a handle is its current state. Lines are flushed
+    as they are written, so a run killed at any point leaves a readable journal
+    (a torn last line is ignored). Safe to share between threads.
+    """
+    
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Args:
+            path: Path of the journal file, e.g. <output folder>/.run_journal.jsonl
+            resume: Keep the states of the previous run and append to them;
+                otherwise the journal starts empty
+        """
+        self.path = path
+        self.states: Dict[str, Tuple[str, Optional[str]]] = self._load() if resume else {}
+        # Handles the previous run failed or did not finish
+        self.retrying = frozenset(handle for handle, (state, _) in self.states.items()
+                                  if state not in COMPLETED_STATES)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Line buffered: every record reaches the file before the next one starts
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8', buffering=1)
+        if resume and self._file.tell() and not self._ends_with_newline():
+            # Terminate a line torn by the interrupted run so the next record stays readable
+            self._file.write('\n')
+    
+    def _load(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Read the states recorded by a previous run.
+        
+        Returns:
+            Handle → (state, failure reason) of its last record; empty if there is no journal
+        """
+        states = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        states[entry['handle']] = (entry['state'], entry.get('reason'))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            pass
+        return states
+    
+    def _ends_with_newline(self) -> bool:
+        """Check if the journal file ends with a complete line."""
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+    
+    def record(self, handle: str, state: str, reason: Optional[str] = None):
+        """
+        Append the new state of a handle.
+        
+        Args:
+            handle: Instagram handle (or the raw input if it has none)
+            state: queued, fetched, parsed, written, skipped or failed
+            reason: Why the handle failed
+        """
+        entry = {'handle': handle, 'state': state, 'at': round(time.time(), 3)}
+        if reason:
+            entry['reason'] = reason
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.states[handle] = (state, reason)
+            self._file.write(line)
+    
+    def queue(self, handles: Iterable[str]):
+        """Record every handle of the run as queued."""
+        for handle in handles:
+            self.record(handle, 'queued')
+    
+    def finish(self, handle: str, success: bool):
+        """
+        Record the outcome of a handle's pipeline run.
+        
+        A handle already recorded as failed in this run (e.g. with its fetch
+        error) keeps that record instead of getting a generic reason.
+        """
+        if success:
+            self.record(handle, 'written')
+        elif self.states.get(handle, (None, None))[0] != 'failed':
+            self.record(handle, 'failed', 'pipeline failed (see log)')
+    
+    def is_completed(self, handle: str) -> bool:
+        """
+        Check if a handle needs no more work.
+        
+        Returns:
+            bool: True if its last state is written or skipped; failed and in-progress handles are retried
+        """
+        state, _ = self.states.get(handle, (None, None))
+        return state in COMPLETED_STATES
+    
+    def needs_retry(self, handle: str) -> bool:
+        """
+        Check if a resumed handle was failed or unfinished in the previous run.
+        Such handles are rebuilt even if their folder looks fresh.
+        
+        Returns:
+            bool: True if the journal this run resumed left the handle failed or in progress
+        """
+        return handle in self.retrying
+    
+    def close(self):
+        """Close the journal file."""
+        with self._lock:
+            self._file.close()
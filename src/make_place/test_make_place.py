@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+"""
+Test suite for make_place.py
+
+This module contains tests for the place pipeline: incremental runs, the run
+journal, the staged batch runner, JSONL mode and the HTTP service. Profiles are
+served by stub fetchers, so no test touches the network.
+"""
+
+import unittest
+import io
+import json
+import sys
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from http.client import HTTPConnection
+
+# Add the src directory to the path so the test also runs as a plain script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from make_place.make_place import make_place, populate_place, report_timings, run_jsonl, staged_runner
+from make_place.run_journal import RunJournal
+from make_place.place_server import PlaceService, make_server
+from make_place.batch_runner import BatchResult, Stage, StagedRunner, read_input_file
+from make_place.instagram_populator import InstagramPopulator
+from make_place.json_outputter import JsonOutputter
+from make_place.readme_outputter import ReadmeOutputter
+from make_place.place_data import PlaceData
+from make_place.populator_scheduler import PopulatorScheduler
+from instrumentation.stage_timings import get_default_timings
+
+
+def stub_profile(name):
+    """A minimal profile response with a place name and a Wolt link."""
+    return {'data': {'user': {
+        'full_name': name,
+        'biography': '',
+        'external_url': 'https://wolt.com/en/srb/belgrade/venue/boyar',
+        'bio_links': [],
+    }}}
+
+
+class StubFetcher:
+    """Fetcher stand-in serving canned profiles and counting the fetches of every handle."""
+    
+    def __init__(self, profiles=None, error=None):
+        """
+        Args:
+            profiles: dict mapping username to profile data (default: stub_profile for every handle)
+            error: Error returned for every fetch instead of a profile
+        """
+        self.profiles = profiles
+        self.error = error
+        self.fetches = {}
+        self._lock = threading.Lock()
+    
+    def fetch_profile(self, username, tokens=None):
+        with self._lock:
+            self.fetches[username] = self.fetches.get(username, 0) + 1
+        if self.error:
+            return {'error': self.error}
+        if self.profiles is None:
+            return stub_profile(username.title())
+        return self.profiles.get(username, {'error': f'Profile not found: {username}'})
+
+
+class TestBatchMode(unittest.TestCase):
+    """Test cases for running many inputs in one process."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = os.path.join(self.temp_dir.name, 'places')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_read_input_file(self):
+        """Test that blank lines and comments of an input file are skipped."""
+        path = os.path.join(self.temp_dir.name, 'venues.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# Belgrade\nboyar.rs\n\n  @ruske_palacinke  \n# closed\nhttps://www.instagram.com/pizzabarserbia/\n")
+        
+        # Assert expected outputs
+        self.assertEqual(read_input_file(path),
+                         ['boyar.rs', '@ruske_palacinke', 'https://www.instagram.com/pizzabarserbia/'])
+    
+    def test_handle_forms(self):
+        """Test that plain handles, @handles and profile URLs all name the same place."""
+        handles = []
+        for input_string in ('boyar.rs', '@Boyar.rs', 'https://www.instagram.com/boyar.rs/', 'not a handle!'):
+            place_data = PlaceData()
+            InstagramPopulator().populate_from_args(place_data, input_string)
+            handles.append(place_data.instagram_handle)
+        
+        # Assert expected outputs
+        self.assertEqual(handles, ['boyar.rs', 'boyar.rs', 'boyar.rs', None])
+    
+    def test_batch_run(self):
+        """Test that a batch run writes every place and counts failures and duplicates."""
+        fetcher = StubFetcher({'boyar.rs': stub_profile('Boyar'), 'ruske_palacinke': stub_profile('Ruske')})
+        runner = staged_runner(self.output_folder, fetcher, fetch_workers=4)
+        
+        # Run two places, a duplicate and a missing profile
+        result = runner.run(['boyar.rs', '@ruske_palacinke', '@boyar.rs', 'missing'])
+        
+        # Assert expected outputs
+        self.assertEqual((result.total, result.succeeded, result.failed, result.coalesced), (4, 3, 1, 1))
+        self.assertEqual(sorted(os.listdir(self.output_folder)), ['boyar.rs', 'ruske_palacinke'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output_folder, 'boyar.rs'))),
+                         ['README.md', 'place_data.json'])
+        self.assertGreater(result.handles_per_second, 0)
+
+
+class TestIncrementalRuns(unittest.TestCase):
+    """Test cases for skipping fresh places."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = self.temp_dir.name
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_failed_place_is_not_fresh(self):
+        """Test that a failed fetch writes nothing, so the next incremental run fetches again."""
+        failing, working = StubFetcher(error='HTTP 500'), StubFetcher()
+        
+        # Fail once, then run again with a day of freshness
+        first = make_place('boyar.rs', self.output_folder, failing, max_age=86400)
+        written = os.path.exists(os.path.join(self.output_folder, 'boyar.rs', 'place_data.json'))
+        second = make_place('boyar.rs', self.output_folder, working, max_age=86400)
+        
+        # Assert expected outputs
+        self.assertEqual(first, (False, None), "A failed place should not get a folder")
+        self.assertFalse(written, "A failed place should not write place_data.json")
+        self.assertTrue(second[0])
+        self.assertEqual(working.fetches, {'boyar.rs': 1}, "The second run should fetch the failed place")
+    
+    def test_failed_place_keeps_previous_data(self):
+        """Test that a failed rebuild does not overwrite a good place."""
+        success, place_folder = make_place('boyar.rs', self.output_folder, StubFetcher())
+        with open(os.path.join(place_folder, 'place_data.json'), 'r', encoding='utf-8') as f:
+            before = json.load(f)
+        
+        # Rebuild without freshness, failing
+        failed = make_place('boyar.rs', self.output_folder, StubFetcher(error='HTTP 500'))
+        with open(os.path.join(place_folder, 'place_data.json'), 'r', encoding='utf-8') as f:
+            after = json.load(f)
+        
+        # Assert expected outputs
+        self.assertTrue(success)
+        self.assertFalse(failed[0])
+        self.assertEqual(after, before, "The good place_data.json should be kept")
+        self.assertEqual(after['place_name'], 'Boyar.Rs')
+        self.assertEqual(after['wolt_url'], 'https://wolt.com/en/srb/belgrade/venue/boyar')
+    
+    def test_fresh_place_is_skipped(self):
+        """Test that a place extracted within max_age is not fetched again."""
+        fetcher = StubFetcher()
+        
+        # Build twice with a day of freshness
+        make_place('boyar.rs', self.output_folder, fetcher, max_age=86400)
+        success, place_folder = make_place('@Boyar.rs', self.output_folder, fetcher, max_age=86400)
+        
+        # Assert expected outputs
+        self.assertTrue(success)
+        self.assertEqual(place_folder, os.path.join(self.output_folder, 'boyar.rs'))
+        self.assertEqual(fetcher.fetches, {'boyar.rs': 1}, "The fresh place should not be fetched again")
+    
+    def test_fresh_place_is_rebuilt_by_default(self):
+        """Test that without max_age (no --stale-after) an existing place is fetched and rebuilt."""
+        fetcher = StubFetcher()
+        
+        # Build twice without a freshness window
+        make_place('boyar.rs', self.output_folder, fetcher)
+        success, _ = make_place('boyar.rs', self.output_folder, fetcher)
+        
+        # Assert expected outputs
+        self.assertTrue(success)
+        self.assertEqual(fetcher.fetches, {'boyar.rs': 2}, "Skipping fresh places should be opt-in")
+
+
+
+class TestRunJournal(unittest.TestCase):
+    """Test cases for resuming batch runs from the journal."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = self.temp_dir.name
+        self.journal_path = os.path.join(self.output_folder, '.run_journal.jsonl')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def write_journal(self, *lines):
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(lines))
+    
+    def test_resume_states(self):
+        """Test that the last state of every handle decides what a resumed run retries."""
+        self.write_journal('{"handle": "boyar.rs", "state": "queued", "at": 1}\n',
+                           '{"handle": "boyar.rs", "state": "written", "at": 2}\n',
+                           '{"handle": "pelmeni", "state": "failed", "at": 3, "reason": "HTTP 500"}\n',
+                           '{"handle": "kafana", "state": "fetched", "at": 4}\n',
+                           '{"handle": "kafana", "state": "par')
+        
+        # Resume, then record one more state after the torn line
+        journal = RunJournal(self.journal_path, resume=True)
+        journal.record('pelmeni', 'queued')
+        journal.close()
+        reloaded = RunJournal(self.journal_path, resume=True)
+        reloaded.close()
+        
+        # Assert expected outputs
+        self.assertTrue(journal.is_completed('boyar.rs'))
+        self.assertFalse(journal.is_completed('pelmeni'), "Failed handles should be retried")
+        self.assertFalse(journal.is_completed('kafana'), "Unfinished handles should be retried")
+        self.assertEqual(journal.retrying, {'pelmeni', 'kafana'})
+        self.assertEqual(reloaded.states['pelmeni'], ('queued', None), "The torn line should not swallow the next record")
+        self.assertEqual(reloaded.states['kafana'], ('fetched', None))
+    
+    def test_resume_retries_fresh_failed_place(self):
+        """Test that a resumed run fetches a failed handle even if its folder is fresh."""
+        make_place('pelmeni', self.output_folder, StubFetcher())
+        self.write_journal('{"handle": "pelmeni", "state": "failed", "at": 1, "reason": "HTTP 500"}\n',
+                           '{"handle": "boyar.rs", "state": "written", "at": 2}\n')
+        make_place('boyar.rs', self.output_folder, StubFetcher())
+        fetcher = StubFetcher()
+        
+        # Resume with a day of freshness
+        journal = RunJournal(self.journal_path, resume=True)
+        runner = staged_runner(self.output_folder, fetcher, max_age=86400, journal=journal,
+                               fetch_workers=1, parse_workers=1, output_workers=1)
+        result = runner.run(['pelmeni', 'boyar.rs'])
+        journal.close()
+        
+        # Assert expected outputs
+        self.assertEqual(result.succeeded, 2)
+        self.assertEqual(fetcher.fetches, {'pelmeni': 1}, "Only the failed handle should be fetched again")
+        self.assertEqual(journal.states['pelmeni'][0], 'written')
+        self.assertEqual(journal.states['boyar.rs'][0], 'skipped')
+
+
+class TestStagedRunner(unittest.TestCase):
+    """Test cases for the staged batch pipeline."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = self.temp_dir.name
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_stages_and_duplicates(self):
+        """Test that items pass the stages in order and duplicates share one run."""
+        seen = []
+        lock = threading.Lock()
+        
+        def visit(name, passed=True):
+            def process(item):
+                with lock:
+                    seen.append((name, item.input_string))
+                if item.input_string == 'boom':
+                    raise RuntimeError('exploded')
+                if item.input_string == 'short' and name == 'first':
+                    item.success, item.reason = False, 'stopped early'
+                    return False
+                return passed
+            return process
+        
+        # Run duplicates (while in flight and after finishing), a failing and a stopping input
+        runner = StagedRunner([Stage('first', visit('first'), 2), Stage('second', visit('second'), 3),
+                               Stage('last', visit('last', passed=False))],
+                              queue_size=1, key=lambda input_string: input_string.lstrip('@').lower())
+        result = runner.run(['a', '@A', 'b', 'boom', 'short', 'a'])
+        
+        # Assert expected outputs
+        self.assertEqual((result.total, result.succeeded, result.failed, result.coalesced), (6, 4, 2, 2))
+        self.assertEqual(sorted(result.failures), [('boom', 'exploded'), ('short', 'stopped early')])
+        for input_string in ('a', 'b'):
+            self.assertEqual([name for name, seen_input in seen if seen_input == input_string],
+                             ['first', 'second', 'last'], "Stages should run once per place, in order")
+    
+    def test_failed_place_not_written(self):
+        """Test that the output stage writes nothing for a failed place and journals the failure."""
+        journal = RunJournal(os.path.join(self.output_folder, '.run_journal.jsonl'))
+        runner = staged_runner(self.output_folder, StubFetcher(error='HTTP 500'), journal=journal)
+        
+        # Run one failing place
+        result = runner.run(['boyar.rs'])
+        journal.close()
+        
+        # Assert expected outputs
+        self.assertEqual(result.failed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.output_folder, 'boyar.rs')))
+        self.assertEqual(journal.states['boyar.rs'], ('failed', 'HTTP 500'))
+    
+    def test_place_timing_recorded(self):
+        """Test that every place of a staged run gets one 'place' timing sample."""
+        timings = get_default_timings()
+        enabled, timings.enabled = timings.enabled, True
+        try:
+            runner = staged_runner(self.output_folder, StubFetcher())
+            result = runner.run(['timed.place', '@timed.place'])
+        finally:
+            timings.enabled = enabled
+        
+        # Assert expected outputs
+        report = timings.report()['handles']['timed.place']
+        self.assertEqual(result.succeeded, 2)
+        self.assertEqual(report['place']['count'], 1, "Coalesced inputs should share one place sample")
+        self.assertEqual(report['output.JSON']['count'], 1)
+    
+    def test_timing_report_file(self):
+        """Test that --report writes the stage summaries and the run outcome as JSON."""
+        timings = get_default_timings()
+        enabled, timings.enabled = timings.enabled, True
+        try:
+            result = staged_runner(self.output_folder, StubFetcher()).run(['report.place', 'other.place'])
+        finally:
+            timings.enabled = enabled
+        report_path = os.path.join(self.temp_dir.name, 'report.json')
+        
+        # Write the report of the run
+        report_timings(SimpleNamespace(timings=False, report=report_path), result)
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        
+        # Assert expected outputs
+        self.assertEqual({key: report['run'][key] for key in ('total', 'succeeded', 'failed')},
+                         {'total': 2, 'succeeded': 2, 'failed': 0})
+        self.assertGreaterEqual(report['stages']['place']['count'], 2)
+        self.assertEqual(set(report['stages']['place']), {'count', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms'})
+        self.assertIn('report.place', report['handles'])
+
+
+class BrokenPipeRecords(io.StringIO):
+    """Record stream whose reader goes away after a number of lines."""
+    
+    def __init__(self, lines, fileno):
+        super().__init__()
+        self.lines = lines
+        self._fileno = fileno
+    
+    def write(self, text):
+        if self.getvalue().count('\n') >= self.lines:
+            raise BrokenPipeError()
+        return super().write(text)
+    
+    def fileno(self):
+        return self._fileno
+
+
+class TestJsonlMode(unittest.TestCase):
+    """Test cases for streaming places as JSON lines."""
+    
+    def setUp(self):
+        self.args = SimpleNamespace(workers=2, parse_workers=1, queue_size=None)
+    
+    def test_records_and_failure_reasons(self):
+        """Test that places are written as JSON lines and failures keep their real reason."""
+        records = io.StringIO()
+        fetcher = StubFetcher({'boyar.rs': stub_profile('Boyar')})
+        
+        # Stream a good place, a missing profile and an input without a handle
+        result = run_jsonl(iter(['boyar.rs', 'missing', 'not a handle!']), records, fetcher, self.args)
+        places = [json.loads(line) for line in records.getvalue().splitlines()]
+        
+        # Assert expected outputs
+        self.assertEqual([place['instagram_handle'] for place in places], ['boyar.rs'])
+        self.assertEqual(places[0]['place_name'], 'Boyar')
+        self.assertEqual((result.total, result.succeeded, result.failed), (3, 1, 2))
+        self.assertEqual(sorted(result.failures), [('missing', 'Profile not found: missing'),
+                                                   ('not a handle!', 'could not extract handle')])
+    
+    def test_stops_reading_when_output_closes(self):
+        """Test that a closed stdout stops reading the input instead of draining it."""
+        read = []
+        
+        def inputs():
+            for i in range(1000):
+                read.append(i)
+                yield f'place_{i}'
+        
+        # Close the output after two records
+        with tempfile.TemporaryFile() as devnull_target:
+            records = BrokenPipeRecords(2, os.dup(devnull_target.fileno()))
+            result = run_jsonl(inputs(), records, StubFetcher(), self.args)
+            os.close(records.fileno())
+        
+        # Assert expected outputs
+        self.assertEqual(records.getvalue().count('\n'), 2)
+        self.assertLess(len(read), 100, "Reading should stop soon after the output closes")
+        self.assertLessEqual(result.total, len(read))
+    
+    def test_failure_list_is_capped(self):
+        """Test that a run keeps counting failures but only lists the first ones."""
+        result = BatchResult(max_failures=2)
+        
+        # Record five failures and one success
+        for i in range(5):
+            result.record([f'place_{i}'], False, 'HTTP 500')
+        result.record(['good'], True, '')
+        
+        # Assert expected outputs
+        self.assertEqual((result.failed, result.succeeded), (5, 1))
+        self.assertEqual(result.failures, [('place_0', 'HTTP 500'), ('place_1', 'HTTP 500')])
+
+
+class BlockingFetcher(StubFetcher):
+    """Stub fetcher whose fetches wait until released."""
+    
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+    
+    def fetch_profile(self, username, tokens=None):
+        self.release.wait(5)
+        return super().fetch_profile(username, tokens)
+
+
+class TestPlaceService(unittest.TestCase):
+    """Test cases for the HTTP service, served on a free local port."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = os.path.join(self.temp_dir.name, 'places')
+    
+    def tearDown(self):
+        if getattr(self, 'server', None):
+            self.server.shutdown()
+            self.server.server_close()
+        self.temp_dir.cleanup()
+    
+    def start(self, fetcher):
+        self.service = PlaceService(self.output_folder, fetcher, max_age=86400)
+        self.server = make_server(self.service, '127.0.0.1', 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def request(self, method, path):
+        connection = HTTPConnection('127.0.0.1', self.server.server_port, timeout=10)
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+    
+    def test_path_traversal_rejected(self):
+        """Test that handles which are not usernames never reach the filesystem or the fetcher."""
+        fetcher = StubFetcher()
+        self.start(fetcher)
+        
+        # Post inputs resolving to '..' and '.'
+        statuses = [self.request('POST', path)[0] for path in (
+            '/places/https:%2F%2Fwww.instagram.com%2F..%2F',
+            '/places/%2E%2E',
+            '/places/@.',
+        )]
+        
+        # Assert expected outputs
+        self.assertEqual(statuses, [400, 400, 400])
+        self.assertEqual(fetcher.fetches, {})
+        self.assertEqual(os.listdir(self.temp_dir.name), [], "Nothing should be written next to the output folder")
+    
+    def test_failed_place_returns_502(self):
+        """Test that a failed place answers 502 every time, not a stale 200."""
+        self.start(StubFetcher(error='HTTP 500'))
+        
+        # Post the same failing handle twice
+        first, second = self.request('POST', '/places/boyar.rs'), self.request('POST', '/places/boyar.rs')
+        missing = self.request('GET', '/places/boyar.rs')
+        
+        # Assert expected outputs
+        self.assertEqual(first[0], 502)
+        self.assertEqual(second[0], 502, "A retried failure should not be served as a place")
+        self.assertIsNone(second[1]['place'])
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(self.service.stats['failed'], 2)
+    
+    def test_concurrent_requests_coalesced(self):
+        """Test that concurrent requests for one handle share one pipeline run."""
+        fetcher = BlockingFetcher()
+        self.start(fetcher)
+        responses = []
+        
+        # Post the same place three ways while the first fetch is blocked
+        threads = [threading.Thread(target=lambda path=path: responses.append(self.request('POST', path)))
+                   for path in ('/places/boyar.rs', '/places/@Boyar.RS', '/places/https:%2F%2Fwww.instagram.com%2Fboyar.rs%2F')]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while self.service.single_flight.stats['calls'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        fetcher.release.set()
+        for thread in threads:
+            thread.join()
+        
+        # Assert expected outputs
+        self.assertEqual(sorted(status for status, _ in responses), [200, 200, 200])
+        self.assertEqual({place['instagram_handle'] for _, place in responses}, {'boyar.rs'})
+        self.assertEqual(fetcher.fetches, {'boyar.rs': 1}, "Duplicate requests should share one fetch")
+        self.assertEqual(self.service.single_flight.stats['coalesced'], 2)
+
+
+class StubPopulator:
+    """Populator stand-in that fills fixed values and records the order of the runs."""
+    
+    def __init__(self, name, log, consumes=(), produces=(), cost=0, values=None, fail=False):
+        """
+        Args:
+            name: Populator name
+            log: List the populator appends its name to when it runs
+            consumes, produces, cost: Scheduler declarations
+            values: dict of PlaceData fields the populator sets (default: none)
+            fail: Whether populate() raises instead of setting the values
+        """
+        self.name = name
+        self.log = log
+        self.consumes = consumes
+        self.produces = produces
+        self.cost = cost
+        self.values = values or {}
+        self.fail = fail
+    
+    def can_populate(self, place_data):
+        return all(getattr(place_data, field) for field in self.consumes)
+    
+    def populate(self, place_data):
+        self.log.append(self.name)
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        for field, value in self.values.items():
+            setattr(place_data, field, value)
+        return True
+
+
+class TestPopulatorScheduler(unittest.TestCase):
+    """Test cases for PopulatorScheduler ordering, cycle detection and demand-driven skipping."""
+    
+    def setUp(self):
+        self.log = []
+    
+    def populator(self, name, **kwargs):
+        return StubPopulator(name, self.log, **kwargs)
+    
+    def test_consumers_run_after_producers(self):
+        """Test that a populator runs after every populator producing a field it consumes."""
+        populators = [
+            self.populator('address', consumes=('place_name',), produces=('address_text',), values={'address_text': 'Main St 1'}),
+            self.populator('name', consumes=('instagram_handle',), produces=('place_name',), values={'place_name': 'Boyar'}),
+            self.populator('maps', produces=('google_maps',), values={'google_maps': 'https://maps.app.goo.gl/x'}),
+        ]
+        place_data = PlaceData(instagram_handle='boyar.rs')
+        
+        # Run the populators, listed in reverse dependency order
+        success = PopulatorScheduler(populators).run(place_data)
+        
+        # Assert expected outputs
+        self.assertTrue(success)
+        self.assertEqual(sorted(self.log), ['address', 'maps', 'name'])
+        self.assertLess(self.log.index('name'), self.log.index('address'), "Producer should run before its consumer")
+        self.assertEqual((place_data.place_name, place_data.address_text), ('Boyar', 'Main St 1'))
+    
+    def test_cheaper_source_first(self):
+        """Test that a costly source is skipped when a cheaper one already filled its fields."""
+        populators = [
+            self.populator('api', produces=('wolt_url',), cost=5, values={'wolt_url': 'https://wolt.com/api'}),
+            self.populator('cache', produces=('wolt_url',), cost=0, values={'wolt_url': 'https://wolt.com/cache'}),
+        ]
+        place_data = PlaceData(instagram_handle='boyar.rs')
+        
+        # Run both sources of the same field
+        PopulatorScheduler(populators).run(place_data)
+        
+        # Assert expected outputs
+        self.assertEqual(self.log, ['cache'], "The costly source should be skipped")
+        self.assertEqual(place_data.wolt_url, 'https://wolt.com/cache')
+    
+    def test_costly_source_runs_when_still_needed(self):
+        """Test that a costly source runs when the cheaper one leaves its field empty."""
+        populators = [
+            self.populator('api', produces=('wolt_url',), cost=5, values={'wolt_url': 'https://wolt.com/api'}),
+            self.populator('cache', produces=('wolt_url',), cost=0),
+        ]
+        place_data = PlaceData(instagram_handle='boyar.rs')
+        
+        # Run both sources with an empty cache
+        PopulatorScheduler(populators).run(place_data)
+        
+        # Assert expected outputs
+        self.assertEqual(self.log, ['cache', 'api'])
+        self.assertEqual(place_data.wolt_url, 'https://wolt.com/api')
+    
+    def test_unwanted_fields_are_skipped(self):
+        """Test that populators are skipped when the outputters want none of their fields."""
+        populators = [
+            self.populator('maps', produces=('google_maps',)),
+            self.populator('name', produces=('place_name',)),
+            self.populator('undeclared'),
+        ]
+        
+        # Run with only the place name wanted
+        PopulatorScheduler(populators).run(PlaceData(instagram_handle='boyar.rs'), wanted={'place_name'})
+        
+        # Assert expected outputs
+        self.assertEqual(sorted(self.log), ['name', 'undeclared'])
+    
+    def test_costly_source_skipped_with_cli_outputters(self):
+        """Test that a source costlier than the profile request only runs for places the profile left incomplete."""
+        profiles = {'boyar.rs': stub_profile('Boyar'), 'pelmeni': stub_profile('Pelmeni')}
+        profiles['boyar.rs']['data']['user']['biography'] = 'Kafana Boyar, Belgrade'
+        
+        # Populate both places for the outputters make_place writes, with a scraper of address_text after Instagram
+        places = {}
+        for handle in profiles:
+            populators = [
+                InstagramPopulator(StubFetcher(profiles)),
+                self.populator(f'scraper:{handle}', produces=('address_text',), cost=5,
+                               values={'address_text': 'Scraped address'}),
+            ]
+            places[handle] = PlaceData(instagram_handle=handle)
+            populate_place(places[handle], populators, [JsonOutputter(), ReadmeOutputter()])
+        
+        # Assert expected outputs
+        self.assertEqual(self.log, ['scraper:pelmeni'], "The scraper should be skipped when the bio had the address")
+        self.assertEqual(places['boyar.rs'].address_text, 'Kafana Boyar, Belgrade')
+        self.assertEqual(places['pelmeni'].address_text, 'Scraped address')
+    
+    def test_is_needed(self):
+        """Test is_needed for declared, undeclared and already filled fields."""
+        place_data = PlaceData(instagram_handle='boyar.rs', place_name='Boyar')
+        name = self.populator('name', produces=('place_name', 'wolt_url'))
+        
+        # Assert expected outputs
+        self.assertTrue(PopulatorScheduler.is_needed(self.populator('undeclared'), place_data, {'place_name'}))
+        self.assertTrue(PopulatorScheduler.is_needed(name, place_data, None), "wolt_url is still empty")
+        self.assertFalse(PopulatorScheduler.is_needed(name, place_data, {'place_name', 'address_text'}))
+        self.assertTrue(PopulatorScheduler.is_needed(name, place_data, {'wolt_url'}))
+    
+    def test_failure_still_releases_dependents(self):
+        """Test that a failing populator makes the run fail without blocking the populators after it."""
+        populators = [
+            self.populator('broken', produces=('wolt_url',), fail=True),
+            self.populator('after', consumes=('wolt_url',), produces=('booking_url',)),
+            self.populator('name', produces=('place_name',), values={'place_name': 'Boyar'}),
+        ]
+        
+        # Run with a populator that raises
+        success = PopulatorScheduler(populators, max_workers=2).run(PlaceData(instagram_handle='boyar.rs'))
+        
+        # Assert expected outputs
+        self.assertFalse(success)
+        self.assertEqual(sorted(self.log), ['broken', 'name'], "'after' has no wolt_url to consume")
+    
+    def test_cycle_detected(self):
+        """Test that populators waiting for each other are rejected up front."""
+        populators = [
+            self.populator('first', consumes=('place_name',), produces=('address_text',)),
+            self.populator('second', consumes=('address_text',), produces=('place_name',)),
+            self.populator('free', produces=('wolt_url',)),
+        ]
+        
+        # Assert expected outputs
+        with self.assertRaises(ValueError) as raised:
+            PopulatorScheduler(populators)
+        self.assertEqual(str(raised.exception), 'Populator dependency cycle between: first, second')
+
+if __name__ == '__main__':
+    # Run the tests
+    unittest.main(verbosity=2)
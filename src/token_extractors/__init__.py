@@ -0,0 +1,3 @@
+"""
+Instagram token extraction from Firefox and Chrome, and the token cache.
+"""
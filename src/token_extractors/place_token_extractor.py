@@ -47,11 +47,24 @@ def find_firefox_profile():
     # Return the first profile (usually the default one)
     return profiles[0]
 
-def extract_instagram_tokens_from_firefox():
-    """Extract Instagram tokens from Firefox cookies."""
+def find_all_firefox_profiles():
+    """Find all Firefox profile directories that have a cookies database."""
+    firefox_path = get_firefox_profile_path()
+    
+    profiles = []
+    for item in sorted(os.listdir(firefox_path)):
+        item_path = os.path.join(firefox_path, item)
+        if os.path.isfile(os.path.join(item_path, 'cookies.sqlite')):
+            profiles.append(item_path)
+    
+    return profiles
+
+def extract_instagram_tokens_from_firefox(profile_path=None):
+    """Extract Instagram tokens from Firefox cookies (the active profile unless profile_path is given)."""
     try:
         # Find Firefox profile
-        profile_path = find_firefox_profile()
+        if profile_path is None:
+            profile_path = find_firefox_profile()
         
         # Copy cookies database
         cookies_path = os.path.join(profile_path, 'cookies.sqlite')
@@ -115,8 +128,8 @@ def get_chrome_profile_path():
     
     return chrome_path
 
-def find_chrome_profile():
-    """Find the active Chrome profile directory."""
+def get_chrome_base_path():
+    """Get the path to the Chrome user data directory that holds all profiles."""
     system = platform.system()
     
     if system == "Windows":
@@ -132,6 +145,12 @@ def find_chrome_profile():
     if not os.path.exists(chrome_base):
         raise FileNotFoundError(f"Chrome directory not found: {chrome_base}")
     
+    return chrome_base
+
+def find_chrome_profile():
+    """Find the active Chrome profile directory."""
+    chrome_base = get_chrome_base_path()
+    
     # Look for profile directories
     profiles = []
     for item in os.listdir(chrome_base):
@@ -149,11 +168,24 @@ def find_chrome_profile():
     else:
         return profiles[0]
 
-def extract_instagram_tokens_from_chrome():
-    """Extract Instagram tokens from Chrome cookies."""
+def find_all_chrome_profiles():
+    """Find all Chrome profile directories (Default and Profile N) that have a cookies database."""
+    chrome_base = get_chrome_base_path()
+    
+    profiles = []
+    for item in sorted(os.listdir(chrome_base)):
+        item_path = os.path.join(chrome_base, item)
+        if (item == 'Default' or item.startswith('Profile')) and os.path.isfile(os.path.join(item_path, 'Cookies')):
+            profiles.append(item_path)
+    
+    return profiles
+
+def extract_instagram_tokens_from_chrome(profile_path=None):
+    """Extract Instagram tokens from Chrome cookies (the Default profile unless profile_path is given)."""
     try:
         # Find Chrome profile
-        profile_path = find_chrome_profile()
+        if profile_path is None:
+            profile_path = find_chrome_profile()
         
         # Copy cookies database
         cookies_path = os.path.join(profile_path, 'Cookies')
@@ -211,4 +243,32 @@ def extract_instagram_tokens():
     
     return None
 
-
+def extract_all_instagram_tokens():
+    """
+    Extract Instagram tokens from every Firefox and Chrome profile.
+    Returns: list - (label, tokens) tuples, one per distinct logged-in session
+    """
+    sources = []
+    for browser, find_profiles, extract in (
+        ('firefox', find_all_firefox_profiles, extract_instagram_tokens_from_firefox),
+        ('chrome', find_all_chrome_profiles, extract_instagram_tokens_from_chrome),
+    ):
+        try:
+            profiles = find_profiles()
+        except FileNotFoundError:
+            continue
+        for profile_path in profiles:
+            sources.append((f"{browser}:{os.path.basename(profile_path)}", extract, profile_path))
+    
+    accounts = []
+    seen_sessions = set()
+    for label, extract, profile_path in sources:
+        tokens = extract(profile_path)
+        if not tokens or 'csrftoken' not in tokens or 'sessionid' not in tokens:
+            continue
+        if tokens['sessionid'] in seen_sessions:
+            continue
+        seen_sessions.add(tokens['sessionid'])
+        accounts.append((label, tokens))
+    
+    return accounts
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test suite for the token cache
+
+This module contains tests for TokenCache: memory and disk hits, expiry and the
+refresh after a 401. Browser reads are replaced by a counting stub extractor.
+"""
+
+import unittest
+import json
+import sys
+import os
+import stat
+import tempfile
+import threading
+
+# Add the src directory to the path so the test also runs as a plain script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from token_extractors.token_cache import TokenCache
+
+
+class CountingExtractor:
+    """Stub browser extractor returning numbered tokens and counting its calls."""
+    
+    def __init__(self, tokens=True):
+        self.tokens = tokens
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        if not self.tokens:
+            return None
+        return {'csrftoken': f'csrf{self.calls}', 'sessionid': f'session{self.calls}'}
+
+
+class TestTokenCache(unittest.TestCase):
+    """Test cases for TokenCache."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'tokens', 'instagram_tokens.json')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_memory_hits(self):
+        """Test that the browser is read once and later calls are served from memory."""
+        extractor = CountingExtractor()
+        cache = TokenCache(path=self.path, extractor=extractor)
+        
+        # Get tokens three times
+        results = [cache.get() for _ in range(3)]
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 1, "Browser should be read only on the cold cache")
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(results[0]['csrftoken'], 'csrf1')
+        self.assertEqual(cache.stats['memory_hits'], 2)
+        self.assertIs(cache.get_cached(), results[0])
+    
+    def test_disk_hits_across_instances(self):
+        """Test that a second cache picks up fresh tokens from disk without reading the browser."""
+        TokenCache(path=self.path, extractor=CountingExtractor()).get()
+        extractor = CountingExtractor()
+        cache = TokenCache(path=self.path, extractor=extractor)
+        
+        # Get tokens from a new cache instance
+        self.assertIsNone(cache.get_cached(), "get_cached should not touch the disk")
+        tokens = cache.get()
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 0, "Fresh tokens on disk should not trigger a browser read")
+        self.assertEqual(tokens['sessionid'], 'session1')
+        self.assertEqual(cache.stats['disk_hits'], 1)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600, "Token file should be private")
+    
+    def test_expired_tokens_are_reread(self):
+        """Test that tokens older than the TTL are re-read from the browser."""
+        with open(self.temp_path(), 'w', encoding='utf-8') as f:
+            json.dump({'tokens': {'csrftoken': 'old', 'sessionid': 'old'}, 'fetched_at': 0.0}, f)
+        extractor = CountingExtractor()
+        cache = TokenCache(path=self.path, ttl=60, extractor=extractor)
+        
+        # Get tokens with an expired disk entry
+        tokens = cache.get()
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 1)
+        self.assertEqual(tokens['csrftoken'], 'csrf1')
+        self.assertEqual(cache.stats['disk_hits'], 0)
+    
+    def test_unreadable_disk_entry(self):
+        """Test that a corrupt cache file falls back to the browser."""
+        with open(self.temp_path(), 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        extractor = CountingExtractor()
+        
+        # Get tokens with a corrupt disk entry
+        tokens = TokenCache(path=self.path, extractor=extractor).get()
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 1)
+        self.assertEqual(tokens['csrftoken'], 'csrf1')
+    
+    def test_missing_tokens(self):
+        """Test that no tokens are cached when the browsers have none."""
+        extractor = CountingExtractor(tokens=False)
+        cache = TokenCache(path=self.path, extractor=extractor)
+        
+        # Get tokens twice without browser tokens
+        first, second = cache.get(), cache.get()
+        
+        # Assert expected outputs
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(extractor.calls, 2, "Missing tokens should not be cached")
+        self.assertFalse(os.path.exists(self.path))
+    
+    def test_refresh_after_auth_failure(self):
+        """Test that refresh drops the stale tokens from memory and disk and re-reads the browser."""
+        extractor = CountingExtractor()
+        cache = TokenCache(path=self.path, extractor=extractor)
+        stale = cache.get()
+        
+        # Refresh the tokens after a 401
+        fresh = cache.refresh(stale)
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 2)
+        self.assertEqual(fresh['csrftoken'], 'csrf2')
+        self.assertEqual(cache.stats['invalidations'], 1)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['tokens'], fresh, "Disk cache should hold the fresh tokens")
+    
+    def test_concurrent_refresh_reads_browser_once(self):
+        """Test that threads refreshing the same stale tokens cause a single browser read."""
+        extractor = CountingExtractor()
+        cache = TokenCache(path=None, extractor=extractor)
+        stale = cache.get()
+        results = []
+        
+        # Refresh the same stale tokens from four threads
+        threads = [threading.Thread(target=lambda: results.append(cache.refresh(stale))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Assert expected outputs
+        self.assertEqual(extractor.calls, 2, "Only the first refresh should re-read the browser")
+        self.assertTrue(all(result['csrftoken'] == 'csrf2' for result in results))
+    
+    def temp_path(self):
+        """Create the cache directory and return the cache file path."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return self.path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Token cache for Instagram authentication.
+Keeps extracted browser tokens in memory and on disk so the browser cookie
+databases are only re-read when the cache is cold, expired or invalidated after a 401.
+"""
+
+import json
+import os
+import threading
+import time
+
+from instrumentation.metrics import get_default_metrics
+from instrumentation.stage_timings import get_default_timings
+
+# Default location of the on-disk cache
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), '.cache', 'mapcreator', 'instagram_tokens.json')
+
+# Default time-to-live of cached tokens in seconds (12 hours)
+DEFAULT_TTL = 12 * 60 * 60
+
+# Token reads from the browsers (cold cache, expiry or a 401)
+TOKEN_REFRESHES = get_default_metrics().counter('mapcreator_token_refreshes_total', 'Instagram token reads from the browsers')
+
+class TokenCache:
+    """
+    In-process plus on-disk cache of Instagram tokens with a TTL.
+    
+    Safe to share between threads. The stats dict records how often tokens were
+    served from memory or disk and how often the browser actually had to be re-read.
+    """
+    
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, extractor=None):
+        """
+        Args:
+            path: Path of the on-disk cache file, or None to keep tokens in memory only
+            ttl: Seconds after which cached tokens are re-read from the browser
+            extractor: Callable returning a token dict from the browsers
+                (default: extract_instagram_tokens, imported on first browser read)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.extractor = extractor
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'browser_reads': 0,
+            'invalidations': 0,
+        }
+        self._lock = threading.RLock()
+        self._tokens = None
+        self._fetched_at = 0.0
+    
+    def _is_fresh(self, fetched_at):
+        """Check whether tokens fetched at the given time are still within the TTL."""
+        return time.time() - fetched_at < self.ttl
+    
+    def _load_from_disk(self):
+        """
+        Load tokens from the on-disk cache.
+        Returns: tuple - (tokens, fetched_at) or (None, 0.0) if missing or unreadable
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None, 0.0
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['tokens'], float(entry['fetched_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, 0.0
+    
+    def _save_to_disk(self, tokens, fetched_at):
+        """Write tokens to the on-disk cache, readable by the current user only."""
+        if not self.path:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'tokens': tokens, 'fetched_at': fetched_at}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+    
+    def _remove_from_disk(self):
+        """Delete the on-disk cache file if it exists."""
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+    
+    def get_cached(self):
+        """
+        Get tokens from memory without any disk or browser I/O.
+        Returns: Optional[dict] - Fresh in-memory tokens, or None if a call to get() is needed
+        """
+        with self._lock:
+            if self._tokens and self._is_fresh(self._fetched_at):
+                self.stats['memory_hits'] += 1
+                return self._tokens
+            return None
+    
+    def get(self):
+        """
+        Get tokens, re-reading the browser only if the cache is cold or expired.
+        Returns: Optional[dict] - Tokens with csrftoken and sessionid, or None if none were found
+        """
+        with self._lock:
+            if self._tokens and self._is_fresh(self._fetched_at):
+                self.stats['memory_hits'] += 1
+                return self._tokens
+            
+            tokens, fetched_at = self._load_from_disk()
+            if tokens and self._is_fresh(fetched_at):
+                self.stats['disk_hits'] += 1
+                self._tokens, self._fetched_at = tokens, fetched_at
+                return tokens
+            
+            print("Reading Instagram tokens from browsers (token cache is cold or expired)...")
+            self.stats['browser_reads'] += 1
+            TOKEN_REFRESHES.inc()
+            if self.extractor is None:
+                # Importing the extractor loads sqlite3 and the browser profile lookup
+                from token_extractors.place_token_extractor import extract_instagram_tokens
+                self.extractor = extract_instagram_tokens
+            with get_default_timings().measure('tokens'):
+                tokens = self.extractor()
+            if not tokens or 'csrftoken' not in tokens or 'sessionid' not in tokens:
+                self._tokens = None
+                return None
+            
+            self._tokens, self._fetched_at = tokens, time.time()
+            self._save_to_disk(self._tokens, self._fetched_at)
+            return tokens
+    
+    def invalidate(self):
+        """Drop cached tokens from memory and disk (e.g. after a 401)."""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            self._tokens = None
+            self._fetched_at = 0.0
+            self._remove_from_disk()
+    
+    def refresh(self, stale_tokens=None):
+        """
+        Invalidate and re-read tokens after an authentication failure.
+        
+        If stale_tokens is given and another thread already replaced them, the
+        newer tokens are returned without another browser read.
+        Returns: Optional[dict] - Fresh tokens, or None if none were found
+        """
+        with self._lock:
+            if stale_tokens is not None and self._tokens and self._tokens is not stale_tokens:
+                return self._tokens
+            
+            self.invalidate()
+            return self.get()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_token_cache():
+    """
+    Get the process-wide TokenCache, creating it on first use.
+    Returns: TokenCache
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TokenCache()
+        return _default_cache